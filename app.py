@@ -1,13 +1,99 @@
 """Flask web application for StrmConvert."""
-from flask import Flask, render_template_string, request, jsonify
-from config_manager import ConfigManager
+from flask import Flask, Response, request, jsonify, make_response
+from config_manager import ConfigManager, SYNC_ORDERS
 from watchdog_monitor import WatchdogMonitor
+from sync_stats import merge_stats
+from sync_schedule import SyncScheduler
+import metrics
+import gzip
+import hashlib
+import hmac
+import os
 import threading
+import change_feed
+import profiling
+import scheduler
+import throttle
 
 app = Flask(__name__)
 config_manager = ConfigManager()
 monitor = WatchdogMonitor()
 
+# Full syncs of unmonitored records running in request threads, by record id,
+# so they can be cancelled
+running_syncs = {}
+running_syncs_lock = threading.Lock()
+
+
+def _apply_config(config, old_records=()):
+    """
+    Apply a saved configuration to the running monitors, and re-convert the
+    .strm files affected by rule changes of records that are not monitored.
+    """
+    from folder_sync import FolderSync
+    records = config.get('records', [])
+    throttle.configure(config)
+    scheduler.configure(config)
+    change_feed.configure(config)
+    sync_scheduler.configure(records)
+    applied = monitor.apply_config(
+        records, {record['id']: config_manager.state_dir(record['id']) for record in records})
+    old_by_id = {record['id']: record for record in old_records}
+    for record in records:
+        old = old_by_id.get(record['id'])
+        if old is None or monitor.is_monitoring(record['id']) or old['source_folder'] != record['source_folder']:
+            continue
+        try:
+            folder_sync = FolderSync.from_record(old, config_manager.state_dir(record['id']))
+            folder_sync.update_rules(record['target_folder'], record['search_string'],
+                                     record['replacement_string'])
+            folder_sync.update_targets(record.get('targets') or [])
+        except Exception as e:
+            print(f"Error applying rule change for record {record['id']}: {e}")
+    return applied
+
+
+def _run_sync(record, sweep=False, resume=True, order=None):
+    """Full sync of a record with a temporary FolderSync, registered in running_syncs."""
+    from folder_sync import FolderSync
+    folder_sync = FolderSync.from_record(record, config_manager.state_dir(record['id']))
+    with running_syncs_lock:
+        running_syncs[record['id']] = folder_sync
+    try:
+        return folder_sync.sync_all(sweep=sweep, resume=resume, order=order)
+    finally:
+        with running_syncs_lock:
+            if running_syncs.get(record['id']) is folder_sync:
+                del running_syncs[record['id']]
+
+
+def _sync_record(record, sweep=False, resume=True, order=None):
+    """
+    Full sync of a record, by its monitored FolderSync if it is monitored:
+    a temporary one would share its state_dir and could run alongside it.
+    """
+    stats = monitor.sync_record(record['id'], sweep=sweep, resume=resume, order=order)
+    if stats is None:
+        stats = _run_sync(record, sweep=sweep, resume=resume, order=order)
+    return stats
+
+
+def _scheduled_sync(record, sweep=False):
+    """Full sync of a record started by its schedule."""
+    return _sync_record(record, sweep=sweep)
+
+
+def _sync_in_progress(record_id):
+    """Whether a record has a full sync running, monitored or not."""
+    with running_syncs_lock:
+        if record_id in running_syncs:
+            return True
+    return monitor.is_syncing(record_id)
+
+
+# Periodic full syncs of records with a 'schedule'; started by main
+sync_scheduler = SyncScheduler(_scheduled_sync, _sync_in_progress)
+
 # HTML Templates
 DASHBOARD_TEMPLATE = """
 <!DOCTYPE html>
@@ -356,6 +442,33 @@ DASHBOARD_TEMPLATE = """
                                    placeholder="/new/path (留空表示仅同步，不转换)">
                             <small class="form-text text-muted">用于替换搜索字符串的字符串（留空表示仅同步，不转换）</small>
                         </div>
+                        <div class="mb-3 form-check">
+                            <input type="checkbox" class="form-check-input" id="configAutostart">
+                            <label for="configAutostart" class="form-check-label">启动时自动监控</label>
+                        </div>
+                        <div class="mb-3">
+                            <label for="configCatchUp" class="form-label">启动补同步</label>
+                            <select class="form-select" id="configCatchUp">
+                                <option value="incremental">增量（仅同步停止期间变化的目录）</option>
+                                <option value="full">全量（检查所有目录）</option>
+                                <option value="none">不补同步</option>
+                            </select>
+                            <small class="form-text text-muted">自动启动监控后在后台执行，多条记录依次错峰进行</small>
+                        </div>
+                        <div class="mb-3">
+                            <label for="configSyncOrder" class="form-label">同步顺序</label>
+                            <select class="form-select" id="configSyncOrder">
+                                <option value="name">按名称（中断后可从断点继续）</option>
+                                <option value="recent">最近修改优先（新内容最先同步）</option>
+                            </select>
+                            <small class="form-text text-muted">全量同步和启动补同步遍历目录的顺序</small>
+                        </div>
+                        <div class="mb-3">
+                            <label for="configSchedule" class="form-label">定时全量同步</label>
+                            <input type="text" class="form-control" id="configSchedule"
+                                   placeholder="60 或 0 * * * *（留空表示不定时）">
+                            <small class="form-text text-muted">间隔分钟数或 cron 表达式；多条记录的开始时间会自动错开</small>
+                        </div>
                     </form>
                 </div>
                 <div class="modal-footer">
@@ -420,6 +533,8 @@ DASHBOARD_TEMPLATE = """
                 .then(data => {
                     const recordsList = document.getElementById('recordsList');
                     const status = data.status || {};
+                    const catchUp = data.catch_up || {};
+                    const schedule = data.schedule || {};
                     allRecords = data.records || [];
                     allStatus = status;
                     
@@ -435,13 +550,23 @@ DASHBOARD_TEMPLATE = """
                             const statusBadge = isMonitoring 
                                 ? '<span class="badge bg-success">监控中</span>' 
                                 : '<span class="badge bg-secondary">已停止</span>';
+                            const catchUpBadge = {
+                                pending: ' <span class="badge bg-light text-dark">待补同步</span>',
+                                running: ' <span class="badge bg-info">补同步中</span>'
+                            }[catchUp[recordId]] || '';
+                            const scheduled = schedule[recordId];
+                            const scheduleBadge = scheduled
+                                ? (scheduled.running
+                                    ? ' <span class="badge bg-info">定时同步中</span>'
+                                    : ` <span class="badge bg-light text-dark" title="上次：${scheduled.last_run ? new Date(scheduled.last_run * 1000).toLocaleString() : '无'}">下次同步 ${new Date(scheduled.next_run * 1000).toLocaleTimeString()}</span>`)
+                                : '';
                             
                             // Table row for desktop
                             tableHtml += `<tr>
                                 <td>${idx}</td>
                                 <td><code>${escapeHtml(record.source_folder)}</code></td>
                                 <td><code>${escapeHtml(record.target_folder)}</code></td>
-                                <td>${statusBadge}</td>
+                                <td>${statusBadge}${catchUpBadge}${scheduleBadge}</td>
                                 <td>
                                     ${isMonitoring 
                                         ? `<button class="btn btn-sm btn-warning me-1" onclick="toggleWatch('${recordId}', false)">停止监控</button>`
@@ -462,7 +587,7 @@ DASHBOARD_TEMPLATE = """
                             // Card for mobile
                             cardHtml += `<div class="mobile-card">
                                 <div class="mobile-card-header">
-                                    <span><strong>记录 #${idx}</strong> ${statusBadge}</span>
+                                    <span><strong>记录 #${idx}</strong> ${statusBadge}${catchUpBadge}${scheduleBadge}</span>
                                 </div>
                                 <div class="mobile-card-body">
                                     <div class="mobile-card-body-item">
@@ -524,6 +649,11 @@ DASHBOARD_TEMPLATE = """
                 document.getElementById('configTargetFolder').value = record.target_folder || '';
                 document.getElementById('configSearchString').value = record.search_string || '';
                 document.getElementById('configReplacementString').value = record.replacement_string || '';
+                document.getElementById('configAutostart').checked = !!record.autostart;
+                document.getElementById('configCatchUp').value = record.catch_up || 'incremental';
+                document.getElementById('configSyncOrder').value = record.sync_order || 'name';
+                const schedule = record.schedule || {};
+                document.getElementById('configSchedule').value = schedule.cron || (schedule.interval ? schedule.interval / 60 : '');
                 const recordIndex = allRecords.findIndex(r => r.id === recordId);
                 document.getElementById('configModalLabel').textContent = `配置记录 #${recordIndex}`;
             } else {
@@ -532,6 +662,10 @@ DASHBOARD_TEMPLATE = """
                 document.getElementById('configTargetFolder').value = '';
                 document.getElementById('configSearchString').value = '';
                 document.getElementById('configReplacementString').value = '';
+                document.getElementById('configAutostart').checked = false;
+                document.getElementById('configCatchUp').value = 'incremental';
+                document.getElementById('configSyncOrder').value = 'name';
+                document.getElementById('configSchedule').value = '';
                 document.getElementById('configModalLabel').textContent = '添加新记录';
             }
             
@@ -550,9 +684,24 @@ DASHBOARD_TEMPLATE = """
                 source_folder: document.getElementById('configSourceFolder').value.trim(),
                 target_folder: document.getElementById('configTargetFolder').value.trim(),
                 search_string: document.getElementById('configSearchString').value.trim(),
-                replacement_string: document.getElementById('configReplacementString').value.trim()
+                replacement_string: document.getElementById('configReplacementString').value.trim(),
+                autostart: document.getElementById('configAutostart').checked,
+                catch_up: document.getElementById('configCatchUp').value,
+                sync_order: document.getElementById('configSyncOrder').value
             };
             
+            // Minutes or a cron expression; jitter and sweep set in the YAML are kept
+            const scheduleText = document.getElementById('configSchedule').value.trim();
+            const previous = allRecords.find(r => r.id === currentEditingRecordId);
+            const { interval, cron, ...scheduleOptions } = (previous && previous.schedule) || {};
+            if (!scheduleText) {
+                record.schedule = null;
+            } else if (!isNaN(Number(scheduleText))) {
+                record.schedule = { ...scheduleOptions, interval: Math.round(Number(scheduleText) * 60) };
+            } else {
+                record.schedule = { ...scheduleOptions, cron: scheduleText };
+            }
+            
             // Validate (only source_folder and target_folder are required)
             if (!record.source_folder || !record.target_folder) {
                 showMessage('源文件夹和目标文件夹是必填项', 'danger');
@@ -561,6 +710,37 @@ DASHBOARD_TEMPLATE = """
             // search_string and replacement_string can be empty (for sync without conversion)
             // They are always strings (even if empty) after trim(), so no additional validation needed
             
+            // For a changed folder or rule, show how many files will be rewritten before saving
+            const existing = allRecords.find(r => r.id === currentEditingRecordId);
+            if (existing && (existing.source_folder !== record.source_folder
+                    || existing.target_folder !== record.target_folder
+                    || (existing.search_string || '') !== record.search_string
+                    || (existing.replacement_string || '') !== record.replacement_string)) {
+                fetch(`/api/config/record/${currentEditingRecordId}/impact`, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ record: record })
+                })
+                    .then(r => r.json())
+                    .then(data => {
+                        if (data.success) {
+                            const impact = data.impact;
+                            const text = impact.full
+                                ? `修改源/目标文件夹后，下次全量同步将重新写入全部 ${impact.indexed} 个文件。确定要保存吗？`
+                                : `此修改将重新转换 ${impact.affected} 个 .strm 文件（共 ${impact.indexed} 个已同步文件）。确定要保存吗？`;
+                            if (!confirm(text)) {
+                                return;
+                            }
+                        }
+                        submitRecordConfig(record);
+                    })
+                    .catch(() => submitRecordConfig(record));
+                return;
+            }
+            submitRecordConfig(record);
+        }
+        
+        function submitRecordConfig(record) {
             // Save the record
             fetch(`/api/config/record/${currentEditingRecordId}`, {
                 method: 'POST',
@@ -650,7 +830,7 @@ DASHBOARD_TEMPLATE = """
                     if (data.success) {
                         if (data.stats) {
                             const stats = data.stats;
-                            showMessage(`同步完成：创建: ${stats.created || 0}, 更新: ${stats.updated || 0}, 删除: ${stats.deleted || 0}, 错误: ${stats.errors || 0}`, 'success');
+                            showMessage(`同步完成：创建: ${stats.created || 0}, 更新: ${stats.updated || 0}, 未变: ${stats.unchanged || 0}, 删除: ${stats.deleted || 0}, 错误: ${stats.errors || 0}`, 'success');
                         } else {
                             showMessage(data.message || '同步完成', 'success');
                         }
@@ -667,7 +847,7 @@ DASHBOARD_TEMPLATE = """
                     showMessage(data.message || '同步完成', data.success ? 'success' : 'danger');
                     if (data.stats) {
                         const stats = data.stats;
-                        showMessage(`同步: 创建: ${stats.created || 0}, 更新: ${stats.updated || 0}, 删除: ${stats.deleted || 0}, 错误: ${stats.errors || 0}`, 'info');
+                        showMessage(`同步: 创建: ${stats.created || 0}, 更新: ${stats.updated || 0}, 未变: ${stats.unchanged || 0}, 删除: ${stats.deleted || 0}, 错误: ${stats.errors || 0}`, 'info');
                     }
                     updateStatus();
                 });
@@ -739,10 +919,34 @@ DASHBOARD_TEMPLATE = """
 </html>
 """
 
+# The dashboard has no per-request state, so render and compress it once at
+# startup instead of going through Jinja on every page load
+DASHBOARD_HTML = app.jinja_env.from_string(DASHBOARD_TEMPLATE).render().encode('utf-8')
+DASHBOARD_HTML_GZIP = gzip.compress(DASHBOARD_HTML, compresslevel=9)
+DASHBOARD_ETAG = hashlib.sha1(DASHBOARD_HTML).hexdigest()
+
+
 @app.route('/')
 def dashboard():
     """Dashboard page."""
-    return render_template_string(DASHBOARD_TEMPLATE)
+    if 'gzip' in request.accept_encodings:
+        response = make_response(DASHBOARD_HTML_GZIP)
+        response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(DASHBOARD_ETAG + '-gzip')
+    else:
+        response = make_response(DASHBOARD_HTML)
+        response.set_etag(DASHBOARD_ETAG)
+    response.content_type = 'text/html; charset=utf-8'
+    # Let browsers keep the page but revalidate it with the ETag on each load
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response.make_conditional(request)
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics."""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
 
 
 @app.route('/api/config', methods=['GET'])
@@ -753,7 +957,11 @@ def get_config():
         # Also provide YAML string for easier editing
         import yaml
         yaml_str = yaml.dump(config, default_flow_style=False, sort_keys=False, allow_unicode=True)
-        return jsonify({'success': True, 'config': config, 'yaml': yaml_str})
+        response = jsonify({'success': True, 'config': config, 'yaml': yaml_str})
+        # The dashboard polls this endpoint, so answer unchanged configs with 304
+        response.add_etag()
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -776,20 +984,22 @@ def save_config():
         is_valid, error_msg = config_manager.validate(config)
         if not is_valid:
             return jsonify({'success': False, 'message': error_msg}), 400
-        
-        # Stop all current observers before updating config
-        # This prevents conflicts with old configuration
-        monitor.stop_all()
+        old_records = config_manager.load().get('records', [])
         
         # Save configuration
         config_manager.save(config)
         
         # Reload config to ensure it's fresh
-        config_manager.load()
+        config = config_manager.load()
         
+        # Only monitors whose record changed are touched; see apply_config()
+        applied = _apply_config(config, old_records)
         return jsonify({
             'success': True, 
-            'message': 'Configuration saved. All monitoring has been stopped. Please restart monitoring if needed.'
+            'message': (f"配置已保存：{len(applied['kept'])} 条监控未变，{len(applied['updated'])} 条已更新规则，"
+                        f"{len(applied['restarted'])} 条已重启，{len(applied['stopped'])} 条已停止"
+                        + (f"，{len(applied['failed'])} 条重启失败" if applied['failed'] else '')),
+            'applied': applied
         })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -825,7 +1035,7 @@ def delete_record(record_id):
         config_manager.save(config)
         
         # Reload config to ensure it's fresh
-        config_manager.load()
+        sync_scheduler.configure(config_manager.load().get('records', []))
         
         return jsonify({
             'success': True,
@@ -873,14 +1083,10 @@ def update_record(record_id):
             records.append(new_record)
             was_monitoring = False
         else:
-            # Update existing record - preserve UUID and check if monitoring was active
-            new_record['id'] = record_id
+            # Update existing record - preserve UUID and settings the form does not edit
+            new_record = {**existing_record, **new_record, 'id': record_id}
             was_monitoring = monitor.is_monitoring(record_id)
             
-            # Stop monitoring if it was running
-            if was_monitoring:
-                monitor.stop_monitoring(record_id)
-            
             # Update the record in the list
             record_idx = config_manager.get_record_index(record_id)
             if record_idx is not None:
@@ -896,18 +1102,52 @@ def update_record(record_id):
         config_manager.save(config)
         
         # Reload config to ensure it's fresh
-        config_manager.load()
+        config = config_manager.load()
+        sync_scheduler.configure(config.get('records', []))
+        
+        # A running monitor keeps going with the new rules, or is restarted
+        # if its source folder changed; affected .strm files are re-converted
+        # in the background
+        if existing_record is not None:
+            _apply_config(config, [existing_record])
         
         return jsonify({
             'success': True,
             'message': '记录已保存成功',
             'record_id': new_record['id'],
-            'was_monitoring': was_monitoring
+            # Tells the UI to start monitoring again if applying the change stopped it
+            'was_monitoring': was_monitoring and not monitor.is_monitoring(new_record['id'])
         })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+@app.route('/api/config/record/<record_id>/impact', methods=['POST'])
+def record_impact(record_id):
+    """Count the files a record edit would rewrite, before it is saved."""
+    try:
+        data = request.get_json(silent=True) or {}
+        new_record = data.get('record') or {}
+        record = config_manager.get_record_by_id(record_id)
+        if record is None:
+            return jsonify({'success': False, 'message': '记录不存在'}), 404
+        
+        folder_sync = monitor.folder_syncs.get(record_id)
+        if folder_sync is None:
+            from folder_sync import FolderSync
+            folder_sync = FolderSync.from_record(record, config_manager.state_dir(record_id))
+        impact = folder_sync.rule_impact(
+            new_record.get('target_folder', record['target_folder']),
+            new_record.get('search_string', record['search_string']),
+            new_record.get('replacement_string', record['replacement_string']))
+        if new_record.get('source_folder', record['source_folder']) != record['source_folder']:
+            impact['full'] = True
+            impact['affected'] = impact['indexed']
+        return jsonify({'success': True, 'impact': impact})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """Get monitoring status."""
@@ -917,32 +1157,103 @@ def get_status():
         return jsonify({
             'success': True,
             'records': config.get('records', []),
-            'status': status
+            'status': status,
+            'catch_up': monitor.get_catch_up_status(),
+            'schedule': sync_scheduler.status(),
+            'io': scheduler.SCHEDULER.status()
         })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+@app.route('/api/throttle', methods=['GET'])
+def get_throttle():
+    """Get the current I/O limits of background syncs."""
+    return jsonify({'success': True, 'throttle': throttle.status()})
+
+
+@app.route('/api/throttle', methods=['POST'])
+def set_throttle():
+    """
+    Change the I/O limits of background syncs at runtime. The request body
+    may hold bytes_per_sec and ops_per_sec (0 = unlimited), for one record
+    when record_id is given and globally otherwise, where live (throttle
+    watcher events too) may also be set. Omitted fields keep their value.
+    The limits are saved to the configuration and apply to running syncs
+    from their next file operation.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        config = config_manager.load()
+        record_id = data.get('record_id')
+        if record_id:
+            record = next((r for r in config.get('records', []) if r.get('id') == record_id), None)
+            if record is None:
+                return jsonify({'success': False, 'message': '无效的记录ID'}), 400
+            section = record.setdefault('throttle', {})
+        else:
+            section = config.setdefault('settings', {}).setdefault('throttle', {})
+            if 'live' in data:
+                section['live'] = data['live']
+        for field in throttle.LIMIT_FIELDS:
+            if field in data:
+                section[field] = data[field]
+        
+        is_valid, error_msg = config_manager.validate(config)
+        if not is_valid:
+            return jsonify({'success': False, 'message': error_msg}), 400
+        config_manager.save(config)
+        throttle.configure(config_manager.load())
+        
+        return jsonify({
+            'success': True,
+            'message': '限速已更新',
+            'throttle': throttle.status()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/changes', methods=['GET'])
+def get_changes():
+    """
+    Get the target paths changed after a cursor (?since=, default 0), oldest
+    first, at most ?limit= of them. Pass the returned cursor as since on the
+    next call; truncated means older changes were dropped and a full
+    refresh is needed.
+    """
+    feed = change_feed.get()
+    if feed is None:
+        return jsonify({'success': False, 'message': '变更记录未启用'}), 503
+    since = request.args.get('since', 0, type=int)
+    limit = request.args.get('limit', 1000, type=int)
+    try:
+        return jsonify({'success': True, **feed.since(since, limit)})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
 @app.route('/api/sync', methods=['POST'])
 def sync_all():
     """Perform full sync for all records."""
     try:
         config = config_manager.load()
         records = config.get('records', [])
+        options = request.get_json(silent=True) or {}
+        sweep = bool(options.get('sweep'))
+        resume = not options.get('restart')
+        order = options.get('order')
+        if order is not None and order not in SYNC_ORDERS:
+            return jsonify({'success': False, 'message': f"order 必须是 {', '.join(SYNC_ORDERS)} 之一"}), 400
         
-        total_stats = {'created': 0, 'updated': 0, 'deleted': 0, 'errors': 0}
+        total_stats = {'created': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0, 'errors': 0}
+        record_stats = {}
         
         for idx, record in enumerate(records):
-            from folder_sync import FolderSync
-            folder_sync = FolderSync(
-                record['source_folder'],
-                record['target_folder'],
-                record['search_string'],
-                record['replacement_string']
-            )
-            stats = folder_sync.sync_all()
-            for key in total_stats:
-                total_stats[key] += stats.get(key, 0)
+            stats = _sync_record(record, sweep=sweep, resume=resume, order=order)
+            merge_stats(total_stats, stats)
+            record_stats[record.get('id', str(idx))] = stats
+        total_stats['records'] = record_stats
         
         return jsonify({
             'success': True,
@@ -957,31 +1268,105 @@ def sync_all():
 def sync_record(record_id):
     """Perform full sync for a specific record."""
     try:
-        stats = monitor.sync_record(record_id)
+        options = request.get_json(silent=True) or {}
+        sweep = bool(options.get('sweep'))
+        resume = not options.get('restart')
+        order = options.get('order')
+        if order is not None and order not in SYNC_ORDERS:
+            return jsonify({'success': False, 'message': f"order 必须是 {', '.join(SYNC_ORDERS)} 之一"}), 400
+        stats = monitor.sync_record(record_id, sweep=sweep, resume=resume, order=order)
         if stats is None:
             # Record not in monitor, create temporary sync
             record = config_manager.get_record_by_id(record_id)
             if record is None:
                 return jsonify({'success': False, 'message': '无效的记录ID'}), 400
             
-            from folder_sync import FolderSync
-            folder_sync = FolderSync(
-                record['source_folder'],
-                record['target_folder'],
-                record['search_string'],
-                record['replacement_string']
-            )
-            stats = folder_sync.sync_all()
+            stats = _run_sync(record, sweep=sweep, resume=resume, order=order)
         
         return jsonify({
             'success': True,
-            'message': '同步完成',
+            'message': '同步已取消，下次同步将从断点继续' if stats.get('cancelled') else '同步完成',
             'stats': stats
         })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+@app.route('/api/sync/<record_id>/cancel', methods=['POST'])
+def cancel_sync(record_id):
+    """Stop a record's running full sync; the next sync resumes from its checkpoint."""
+    try:
+        cancelled = False
+        folder_sync = monitor.folder_syncs.get(record_id)
+        if folder_sync is not None:
+            cancelled = folder_sync.cancel()
+        with running_syncs_lock:
+            folder_sync = running_syncs.get(record_id)
+        if folder_sync is not None:
+            cancelled = folder_sync.cancel() or cancelled
+        if not cancelled:
+            return jsonify({'success': False, 'message': '该记录没有正在运行的同步'}), 400
+        return jsonify({'success': True, 'message': '正在取消同步'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/plan/<record_id>', methods=['GET'])
+def plan_record(record_id):
+    """Show what a full sync of a record would do, without writing anything."""
+    try:
+        record = config_manager.get_record_by_id(record_id)
+        if record is None:
+            return jsonify({'success': False, 'message': '无效的记录ID'}), 400
+        max_operations = request.args.get('operations', 0, type=int)
+        
+        folder_sync = monitor.folder_syncs.get(record_id)
+        if folder_sync is None:
+            from folder_sync import FolderSync
+            folder_sync = FolderSync.from_record(record, config_manager.state_dir(record_id))
+        plan = folder_sync.plan(max_operations=max(0, max_operations))
+        
+        return jsonify({
+            'success': True,
+            'message': f"将新建 {plan['create']} 个、更新 {plan['update']} 个、删除 {plan['delete']} 个文件",
+            'plan': plan
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/verify/<record_id>', methods=['POST'])
+def verify_record(record_id):
+    """Compare a record's source and target by directory digests; repair on request."""
+    try:
+        repair = bool((request.get_json(silent=True) or {}).get('repair'))
+        folder_sync = monitor.folder_syncs.get(record_id)
+        if folder_sync is None:
+            record = config_manager.get_record_by_id(record_id)
+            if record is None:
+                return jsonify({'success': False, 'message': '无效的记录ID'}), 400
+            
+            from folder_sync import FolderSync
+            folder_sync = FolderSync.from_record(record, config_manager.state_dir(record_id))
+        report = folder_sync.verify(repair=repair)
+        
+        if report['in_sync']:
+            message = '目标与源一致'
+        elif report.get('cancelled'):
+            message = f"修复已取消，已处理 {len(report['diverged'])} 个不一致的目录"
+        elif report['repaired']:
+            message = f"已修复 {len(report['diverged'])} 个不一致的目录"
+        else:
+            message = f"发现 {len(report['diverged'])} 个不一致的目录"
+        return jsonify({
+            'success': True,
+            'message': message,
+            'report': report
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
 @app.route('/api/watch/start', methods=['POST'])
 def start_watch():
     """Start monitoring."""
@@ -998,13 +1383,7 @@ def start_watch():
             if record is None:
                 return jsonify({'success': False, 'message': '无效的记录ID'}), 400
             
-            success = monitor.start_monitoring(
-                record_id,
-                record['source_folder'],
-                record['target_folder'],
-                record['search_string'],
-                record['replacement_string']
-            )
+            success = monitor.start_monitoring(record, config_manager.state_dir(record_id))
             if success:
                 return jsonify({'success': True, 'message': '已启动监控记录'})
             else:
@@ -1014,13 +1393,7 @@ def start_watch():
             started = 0
             for record in records:
                 record_id = record.get('id')
-                if record_id and monitor.start_monitoring(
-                    record_id,
-                    record['source_folder'],
-                    record['target_folder'],
-                    record['search_string'],
-                    record['replacement_string']
-                ):
+                if record_id and monitor.start_monitoring(record, config_manager.state_dir(record_id)):
                     started += 1
             
             return jsonify({
@@ -1053,6 +1426,112 @@ def stop_watch():
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+def _admin_authorized() -> bool:
+    """
+    Check the admin token for diagnostic endpoints.
+    Admin endpoints are disabled unless STRMCONVERT_ADMIN_TOKEN is set.
+    """
+    expected = os.environ.get('STRMCONVERT_ADMIN_TOKEN', '')
+    if not expected:
+        return False
+    supplied = request.headers.get('X-Admin-Token', '')
+    auth = request.headers.get('Authorization', '')
+    if not supplied and auth.startswith('Bearer '):
+        supplied = auth[len('Bearer '):]
+    return hmac.compare_digest(supplied.encode('utf-8'), expected.encode('utf-8'))
+
+
+@app.route('/api/admin/profile/cpu', methods=['POST'])
+def profile_cpu():
+    """Run cProfile across the watchdog and sync worker threads for N seconds."""
+    if not _admin_authorized():
+        return jsonify({'success': False, 'message': 'Forbidden'}), 403
+    try:
+        data = request.get_json(silent=True) or {}
+        result = profiling.capture_cpu(
+            seconds=data.get('seconds', 10),
+            top=int(data.get('top', 30)),
+            sort=data.get('sort', 'cumulative'),
+            dump=bool(data.get('dump', False))
+        )
+        return jsonify({'success': True, 'profile': result})
+    except profiling.CaptureBusyError as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/admin/profile/memory', methods=['POST'])
+def profile_memory():
+    """Diff two tracemalloc snapshots taken N seconds apart."""
+    if not _admin_authorized():
+        return jsonify({'success': False, 'message': 'Forbidden'}), 403
+    try:
+        data = request.get_json(silent=True) or {}
+        result = profiling.capture_memory(
+            seconds=data.get('seconds', 10),
+            top=int(data.get('top', 30)),
+            group_by=data.get('group_by', 'lineno'),
+            frames=int(data.get('frames', 10))
+        )
+        return jsonify({'success': True, 'profile': result})
+    except profiling.CaptureBusyError as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+def _trace_path(name):
+    """Path of a trace file in the traces directory, or None if name is not a plain file name."""
+    if not isinstance(name, str) or name in ('.', '..') or '/' in name or '\\' in name or '\0' in name:
+        return None
+    traces_dir = config_manager.traces_dir().resolve()
+    path = (traces_dir / name).resolve()
+    if path.parent != traces_dir:
+        return None
+    return path
+
+
+@app.route('/api/admin/trace/start', methods=['POST'])
+def start_trace():
+    """Start recording a monitored record's events to a trace file for later replay."""
+    if not _admin_authorized():
+        return jsonify({'success': False, 'message': 'Forbidden'}), 403
+    try:
+        data = request.get_json(silent=True) or {}
+        record_id = data.get('record_id')
+        if not isinstance(record_id, str) or config_manager.get_record_by_id(record_id) is None:
+            return jsonify({'success': False, 'message': 'Missing or unknown record_id'}), 400
+        trace_path = _trace_path(data.get('name') or f"{record_id}.jsonl")
+        if trace_path is None:
+            return jsonify({'success': False, 'message': 'name must be a plain file name'}), 400
+        trace_path = str(trace_path)
+        if not monitor.start_recording(record_id, trace_path):
+            return jsonify({'success': False, 'message': 'Record is not monitored or already recording'}), 400
+        return jsonify({'success': True, 'path': trace_path})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/admin/trace/stop', methods=['POST'])
+def stop_trace():
+    """Stop recording a record's events."""
+    if not _admin_authorized():
+        return jsonify({'success': False, 'message': 'Forbidden'}), 403
+    try:
+        data = request.get_json(silent=True) or {}
+        count = monitor.stop_recording(data.get('record_id'))
+        if count is None:
+            return jsonify({'success': False, 'message': 'Record is not recording'}), 400
+        return jsonify({'success': True, 'events': count})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=9115, debug=False)
 
@@ -0,0 +1,14 @@
+"""Benchmarks for StrmConvert.
+
+Run a benchmark module from the repository root, for example:
+    python -m benchmarks.startup
+    python -m benchmarks.sync_bench --files 100000 --output results.json
+    python -m benchmarks.compare results.json baseline.json
+
+Modules:
+    startup     CLI startup and import time
+    library     synthetic media library generator
+    sync_bench  full-sync scenarios (cold, warm, churn, orphans) and .strm conversion
+    compare     regression check of a result against a stored baseline
+    event_replay  event-storm replay into StrmFileHandler (latency, threads, memory, correctness)
+"""
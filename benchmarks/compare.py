@@ -0,0 +1,74 @@
+"""Compare a benchmark result against a stored baseline.
+
+Usage:
+    python -m benchmarks.compare results.json baseline.json [--threshold 0.10]
+
+Exits with status 1 if any scenario got slower, or used more peak memory
+or memory per tracked file, by more than the threshold.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Result fields compared per scenario; lower is better for all of them
+COMPARED_FIELDS = ('seconds', 'peak_rss_kb', 'bytes_per_file')
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Compare two benchmark results scenario by scenario.
+
+    Returns:
+        One row per compared value, with the relative change and whether it
+        is a regression
+    """
+    rows = []
+    for scenario, base in baseline.get('results', {}).items():
+        cur = current.get('results', {}).get(scenario)
+        if cur is None:
+            continue
+        for field in COMPARED_FIELDS:
+            if field not in base or field not in cur or not base[field]:
+                continue
+            change = (cur[field] - base[field]) / base[field]
+            rows.append({
+                'scenario': scenario,
+                'field': field,
+                'baseline': base[field],
+                'current': cur[field],
+                'change': round(change, 4),
+                'regression': change > threshold,
+            })
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Compare benchmark results against a baseline')
+    parser.add_argument('current', help='Result JSON from this run')
+    parser.add_argument('baseline', help='Stored baseline result JSON')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Allowed relative slowdown before failing (default: %(default)s)')
+    args = parser.parse_args()
+
+    current = json.loads(Path(args.current).read_text(encoding='utf-8'))
+    baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+    if current.get('params') != baseline.get('params'):
+        print("Warning: benchmark parameters differ from the baseline", file=sys.stderr)
+
+    rows = compare(current, baseline, args.threshold)
+    for row in rows:
+        flag = 'REGRESSION' if row['regression'] else 'ok'
+        print(f"{row['scenario']:<10} {row['field']:<14} {row['baseline']:>12} -> {row['current']:>12} "
+              f"({row['change']:+.1%}) {flag}")
+
+    regressions = [row for row in rows if row['regression']]
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
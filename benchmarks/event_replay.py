@@ -0,0 +1,360 @@
+"""Event-storm replay harness for the watchdog pipeline.
+
+Feeds recorded or synthetic file system events straight into a
+StrmFileHandler, without an Observer or inotify, and reports end-to-end
+latency percentiles, peak thread count, memory and whether the target ended
+up identical to what a correct sync would produce.
+
+Before each event is dispatched, the change it describes is applied to the
+source tree (files created/modified/deleted/moved), so the handler sees the
+same filesystem state as in production.
+
+Synthetic storms:
+    season_pack   a season extracted at once: create, several modifies and close per file
+    folder_move   one directory with N files moved into the library
+    rename_chain  downloader pattern: .part -> .tmp -> final name per file
+
+Usage:
+    python -m benchmarks.event_replay --storm season_pack --files 2000 --rate 5000
+    python -m benchmarks.event_replay --trace config/traces/<record>.jsonl --speed 10
+
+Record a trace from a running server with POST /api/admin/trace/start and
+/api/admin/trace/stop.
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks import library
+
+SEARCH_STRING = 'http://192.168.1.10:8096'
+REPLACEMENT_STRING = 'smb://nas'
+STORMS = ('season_pack', 'folder_move', 'rename_chain')
+
+
+def _strm_content(rel_path: str) -> str:
+    return f"{SEARCH_STRING}/media/{rel_path}.mkv"
+
+
+def _episode_names(count: int, prefix: str) -> List[str]:
+    names = []
+    for i in range(count):
+        kind = i % 3
+        stem = f"{prefix} - E{i:05d}"
+        names.append(stem + ('.strm' if kind == 0 else '.nfo' if kind == 1 else '.zh.srt'))
+    return names
+
+
+def season_pack(files: int) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """A season pack extracted in place: directory created, then every file written."""
+    season = 'Storm Show (2024)/Season 01'
+    events = [{'type': 'created', 'src': 'Storm Show (2024)', 'dir': True},
+              {'type': 'created', 'src': season, 'dir': True}]
+    for name in _episode_names(files, 'Storm Show'):
+        rel = f"{season}/{name}"
+        events.append({'type': 'created', 'src': rel, 'dir': False})
+        for _ in range(3):
+            events.append({'type': 'modified', 'src': rel, 'dir': False})
+        events.append({'type': 'closed', 'src': rel, 'dir': False})
+    return [], events
+
+
+def folder_move(files: int) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """A directory of files, already synced, moved to a new place in one event."""
+    setup = [f"Incoming/Batch/{name}" for name in _episode_names(files, 'Moved Show')]
+    events = [{'type': 'created', 'src': 'Moved Show (2023)', 'dir': True},
+              {'type': 'moved', 'src': 'Incoming/Batch', 'dest': 'Moved Show (2023)/Season 01', 'dir': True}]
+    return setup, events
+
+
+def rename_chain(files: int) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Downloader rename chains: write a .part file, rename to .tmp, then to the final name."""
+    folder = 'Renamed Show (2022)/Season 01'
+    events = [{'type': 'created', 'src': 'Renamed Show (2022)', 'dir': True},
+              {'type': 'created', 'src': folder, 'dir': True}]
+    for name in _episode_names(files, 'Renamed Show'):
+        final = f"{folder}/{name}"
+        part, tmp = final + '.part', final + '.tmp'
+        events.append({'type': 'created', 'src': part, 'dir': False, 'content_of': final})
+        events.append({'type': 'modified', 'src': part, 'dir': False, 'content_of': final})
+        events.append({'type': 'moved', 'src': part, 'dest': tmp, 'dir': False})
+        events.append({'type': 'moved', 'src': tmp, 'dest': final, 'dir': False})
+    return [], events
+
+
+def _write_file(path: Path, rel_path: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.name.endswith('.strm') or '.strm.' in path.name:
+        path.write_text(_strm_content(rel_path), encoding='utf-8')
+    else:
+        path.write_bytes(b'x' * 128)
+
+
+def apply_entry(source: Path, entry: Dict[str, Any]) -> None:
+    """Apply the filesystem change an event describes to the source tree."""
+    src = source / entry['src']
+    kind = entry['type']
+    if kind in ('created', 'modified'):
+        if entry.get('dir'):
+            src.mkdir(parents=True, exist_ok=True)
+        else:
+            _write_file(src, entry.get('content_of', entry['src']))
+    elif kind == 'deleted':
+        if src.is_dir():
+            shutil.rmtree(src, ignore_errors=True)
+        elif src.exists():
+            src.unlink()
+    elif kind == 'moved' and src.exists():
+        dest = source / entry['dest']
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(src, dest)
+
+
+def verify_tree(source: Path, target: Path) -> Dict[str, Any]:
+    """Check that target holds exactly the converted/copied source files."""
+    from strm_converter import StrmConverter
+
+    result = {'missing': [], 'extra': [], 'mismatched': []}
+    expected = set()
+    for path in library.list_files(source):
+        rel = path.relative_to(source)
+        expected.add(rel)
+        target_file = target / rel
+        if not target_file.exists():
+            result['missing'].append(str(rel))
+            continue
+        if path.suffix.lower() == '.strm':
+            want = StrmConverter.convert_file(path, SEARCH_STRING, REPLACEMENT_STRING).encode('utf-8')
+        else:
+            want = path.read_bytes()
+        if target_file.read_bytes() != want:
+            result['mismatched'].append(str(rel))
+    if target.exists():
+        for path in library.list_files(target):
+            if path.relative_to(target) not in expected:
+                result['extra'].append(str(path.relative_to(target)))
+    summary = {key: len(value) for key, value in result.items()}
+    summary['correct'] = not any(result.values())
+    summary['examples'] = {key: value[:5] for key, value in result.items() if value}
+    return summary
+
+
+def _current_rss_kb() -> Optional[int]:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _Sampler(threading.Thread):
+    """Samples thread count and RSS while the replay runs."""
+
+    def __init__(self, interval: float = 0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.max_threads = threading.active_count()
+        self.max_rss_kb = _current_rss_kb() or 0
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.max_threads = max(self.max_threads, threading.active_count())
+            rss = _current_rss_kb()
+            if rss:
+                self.max_rss_kb = max(self.max_rss_kb, rss)
+
+
+class _LatencyProbe:
+    """Wraps FolderSync methods to record when each path reached the target."""
+
+    def __init__(self, folder_sync, source: Path):
+        self.source = source
+        self.lock = threading.Lock()
+        self.dispatched: Dict[str, float] = {}
+        self.latencies: List[float] = []
+        for name in ('sync_file', 'delete_file', 'move_file'):
+            setattr(folder_sync, name, self._wrap(getattr(folder_sync, name)))
+
+    def mark(self, rel_path: str, when: float) -> None:
+        with self.lock:
+            self.dispatched[rel_path] = when
+
+    def _dispatch_time(self, rel_path: str) -> Optional[float]:
+        # Files synced because their directory moved inherit the directory's event time
+        path = Path(rel_path)
+        for candidate in [path] + list(path.parents):
+            when = self.dispatched.get(candidate.as_posix())
+            if when is not None:
+                return when
+        return None
+
+    def _wrap(self, method):
+        def wrapper(path, *args, **kwargs):
+            result = method(path, *args, **kwargs)
+            done = time.time()
+            rel = Path(path)
+            if rel.is_absolute():
+                try:
+                    rel = rel.relative_to(self.source)
+                except ValueError:
+                    return result
+            with self.lock:
+                when = self._dispatch_time(rel.as_posix())
+                if when is not None:
+                    self.latencies.append(done - when)
+            return result
+        return wrapper
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 4)
+
+
+def replay(entries: List[Dict[str, Any]], workdir: Path, setup: List[str] = (),
+           rate: float = 0.0, speed: float = 0.0, debounce: Optional[float] = None,
+           quiesce_timeout: float = 120.0) -> Dict[str, Any]:
+    """
+    Replay entries into a fresh StrmFileHandler and measure the outcome.
+
+    Args:
+        entries: Trace entries (recorded or synthetic)
+        workdir: Directory for the source and target trees
+        setup: Files to create and sync before the replay starts
+        rate: Events per second (0 = as fast as possible); ignored if speed is set
+        speed: Replay recorded timestamps at this multiple of real time
+        debounce: Override the handler debounce time in seconds
+        quiesce_timeout: Maximum time to wait for the handler to finish
+    """
+    from event_trace import to_event
+    from folder_sync import FolderSync
+    from watchdog_monitor import StrmFileHandler
+
+    source, target = workdir / 'source', workdir / 'target'
+    source.mkdir(parents=True, exist_ok=True)
+    for rel in setup:
+        _write_file(source / rel, rel)
+
+    folder_sync = FolderSync(str(source), str(target), SEARCH_STRING, REPLACEMENT_STRING,
+                             record_id='replay')
+    with contextlib.redirect_stdout(sys.stderr):
+        folder_sync.sync_all()
+
+    handler = StrmFileHandler(folder_sync, source)
+    if debounce is not None:
+        handler.debounce_time = debounce
+    probe = _LatencyProbe(folder_sync, source)
+    baseline_threads = threading.active_count()
+    sampler = _Sampler()
+    sampler.start()
+
+    dispatched = 0
+    start = time.time()
+    first_t = entries[0].get('t', 0.0) if entries else 0.0
+    with contextlib.redirect_stdout(sys.stderr):
+        for i, entry in enumerate(entries):
+            if speed > 0 and 't' in entry:
+                delay = start + (entry['t'] - first_t) / speed - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            elif rate > 0:
+                delay = start + i / rate - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+
+            apply_entry(source, entry)
+            event = to_event(entry, source)
+            if event is None:
+                continue
+            now = time.time()
+            probe.mark(entry['src'], now)
+            if entry.get('dest'):
+                probe.mark(entry['dest'], now)
+            handler.dispatch(event)
+            dispatched += 1
+        dispatch_seconds = time.time() - start
+
+        # Wait for debounced work to drain
+        deadline = time.time() + quiesce_timeout
+        while time.time() < deadline:
+            if not handler.pending_events and threading.active_count() <= baseline_threads + 1:
+                break
+            time.sleep(0.05)
+        quiesced = time.time() - start
+
+    sampler.stop_event.set()
+    sampler.join()
+    latencies = probe.latencies
+    return {
+        'events': dispatched,
+        'dispatch_seconds': round(dispatch_seconds, 4),
+        'events_per_sec': round(dispatched / dispatch_seconds, 1) if dispatch_seconds > 0 else 0.0,
+        'drain_seconds': round(quiesced, 4),
+        'writes': len(latencies),
+        'latency': {
+            'p50': _percentile(latencies, 50),
+            'p90': _percentile(latencies, 90),
+            'p99': _percentile(latencies, 99),
+            'max': round(max(latencies), 4) if latencies else 0.0,
+        },
+        'max_threads': sampler.max_threads,
+        'peak_rss_kb': sampler.max_rss_kb or resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'pending_after_drain': len(handler.pending_events),
+        'target': verify_tree(source, target),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Replay file system event storms into StrmFileHandler')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--storm', choices=STORMS, help='Synthetic storm to generate')
+    group.add_argument('--trace', help='Recorded JSON-lines trace to replay')
+    parser.add_argument('--files', type=int, default=1000, help='Files in a synthetic storm (default: %(default)s)')
+    parser.add_argument('--rate', type=float, default=0.0, help='Events per second, 0 = unthrottled')
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help='Replay a trace at this multiple of recorded time (default: unthrottled)')
+    parser.add_argument('--debounce', type=float, default=None, help='Override handler debounce seconds')
+    parser.add_argument('--workdir', help='Directory for the trees (default: a temp dir)')
+    parser.add_argument('--output', help='Also write the JSON result to this file')
+    args = parser.parse_args()
+
+    if args.trace:
+        from event_trace import load_trace
+        setup, entries = [], list(load_trace(args.trace))
+    else:
+        setup, entries = {'season_pack': season_pack, 'folder_move': folder_move,
+                          'rename_chain': rename_chain}[args.storm](args.files)
+
+    def run(workdir: Path) -> Dict[str, Any]:
+        return replay(entries, workdir, setup, rate=args.rate, speed=args.speed, debounce=args.debounce)
+
+    if args.workdir:
+        result = run(Path(args.workdir))
+    else:
+        with tempfile.TemporaryDirectory(prefix='strmconvert-replay-') as tmp:
+            result = run(Path(tmp))
+
+    result = dict({'benchmark': 'event_replay', 'storm': args.storm, 'trace': args.trace,
+                   'files': args.files, 'rate': args.rate}, **result)
+    output = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+    print(output)
+    return 0 if result['target']['correct'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
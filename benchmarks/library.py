@@ -0,0 +1,156 @@
+"""Synthetic media library generator for benchmarks.
+
+Builds a TV-library-shaped tree:
+
+    <root>/Show 0001 (2001)/tvshow.nfo, poster.jpg, fanart.jpg
+    <root>/Show 0001 (2001)/Season 01/season01-poster.jpg
+    <root>/Show 0001 (2001)/Season 01/Show 0001 (2001) - S01E01.strm, .nfo, .zh.srt
+"""
+import os
+import random
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Fraction of episodes that also get an .nfo / subtitle file
+DEFAULT_NFO_RATIO = 1.0
+DEFAULT_SUBTITLE_RATIO = 0.5
+
+
+def _show_name(index: int) -> str:
+    return f"Show {index:04d} ({2000 + index % 25})"
+
+
+def _write(path: Path, data: bytes) -> None:
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def generate_library(root: Path, files: int, seasons: int = 3, episodes: int = 10,
+                     url_prefix: str = 'http://192.168.1.10:8096/media',
+                     artwork_bytes: int = 2048, nfo_ratio: float = DEFAULT_NFO_RATIO,
+                     subtitle_ratio: float = DEFAULT_SUBTITLE_RATIO,
+                     seed: int = 42) -> Dict[str, Any]:
+    """
+    Generate a library of roughly ``files`` files under ``root``.
+
+    Args:
+        root: Directory to create the library in
+        files: Approximate total number of files to create
+        seasons: Seasons per show
+        episodes: Episodes per season
+        url_prefix: Prefix written into every .strm file
+        artwork_bytes: Size of each artwork file
+        nfo_ratio: Fraction of episodes with an .nfo file
+        subtitle_ratio: Fraction of episodes with a subtitle file
+        seed: Random seed, so the same arguments give the same tree
+
+    Returns:
+        Dictionary with counts of shows, directories and files by type
+    """
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    artwork = bytes(rng.getrandbits(8) for _ in range(min(artwork_bytes, 4096)))
+    artwork = (artwork * (artwork_bytes // max(len(artwork), 1) + 1))[:artwork_bytes]
+
+    per_episode = 1 + nfo_ratio + subtitle_ratio
+    per_show = 3 + seasons * (1 + episodes * per_episode)
+    shows = max(1, round(files / per_show))
+
+    counts = {'shows': shows, 'directories': 0, 'strm': 0, 'nfo': 0, 'subtitle': 0, 'artwork': 0}
+    created = 0
+    for show_index in range(1, shows + 1):
+        if created >= files:
+            break
+        show = _show_name(show_index)
+        show_dir = root / show
+        show_dir.mkdir(exist_ok=True)
+        counts['directories'] += 1
+        _write(show_dir / 'tvshow.nfo', f"<tvshow><title>{show}</title></tvshow>".encode('utf-8'))
+        _write(show_dir / 'poster.jpg', artwork)
+        _write(show_dir / 'fanart.jpg', artwork)
+        counts['nfo'] += 1
+        counts['artwork'] += 2
+        created += 3
+
+        for season in range(1, seasons + 1):
+            season_dir = show_dir / f"Season {season:02d}"
+            season_dir.mkdir(exist_ok=True)
+            counts['directories'] += 1
+            _write(season_dir / f"season{season:02d}-poster.jpg", artwork)
+            counts['artwork'] += 1
+            created += 1
+
+            for episode in range(1, episodes + 1):
+                if created >= files:
+                    break
+                stem = f"{show} - S{season:02d}E{episode:02d}"
+                url = f"{url_prefix}/{show}/Season {season:02d}/{stem}.mkv"
+                _write(season_dir / f"{stem}.strm", url.encode('utf-8'))
+                counts['strm'] += 1
+                created += 1
+                if rng.random() < nfo_ratio:
+                    _write(season_dir / f"{stem}.nfo",
+                           f"<episodedetails><title>{stem}</title></episodedetails>".encode('utf-8'))
+                    counts['nfo'] += 1
+                    created += 1
+                if rng.random() < subtitle_ratio:
+                    _write(season_dir / f"{stem}.zh.srt", b"1\n00:00:01,000 --> 00:00:02,000\n...\n")
+                    counts['subtitle'] += 1
+                    created += 1
+
+    counts['files'] = created
+    return counts
+
+
+def list_files(root: Path) -> List[Path]:
+    """List all files under root in a stable order."""
+    result = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            result.append(Path(dirpath) / name)
+    return result
+
+
+def apply_churn(root: Path, fraction: float, seed: int = 7) -> Dict[str, int]:
+    """
+    Modify, add and delete files so that about ``fraction`` of the library changes:
+    a third of the changes rewrite .strm files, a third add new episodes and
+    a third delete existing files.
+
+    Returns:
+        Dictionary with the number of files modified, added and deleted
+    """
+    rng = random.Random(seed)
+    files = list_files(root)
+    changes = max(3, int(len(files) * fraction))
+    strm_files = [f for f in files if f.suffix == '.strm']
+    result = {'modified': 0, 'added': 0, 'deleted': 0}
+
+    for path in rng.sample(strm_files, min(changes // 3, len(strm_files))):
+        _write(path, (path.read_text(encoding='utf-8') + '?v=2').encode('utf-8'))
+        result['modified'] += 1
+
+    for i in range(changes // 3):
+        parent = rng.choice(strm_files).parent
+        _write(parent / f"new-episode-{i:06d}.strm", f"http://192.168.1.10:8096/media/new/{i}.mkv".encode('utf-8'))
+        result['added'] += 1
+
+    remaining = [f for f in files if f.exists()]
+    for path in rng.sample(remaining, min(changes - 2 * (changes // 3), len(remaining))):
+        path.unlink()
+        result['deleted'] += 1
+
+    return result
+
+
+def remove_shows(root: Path, fraction: float, seed: int = 11) -> int:
+    """Delete whole show directories from the source, leaving orphans in the target."""
+    import shutil
+
+    rng = random.Random(seed)
+    shows = sorted(p for p in root.iterdir() if p.is_dir())
+    victims = rng.sample(shows, max(1, int(len(shows) * fraction)))
+    for show in victims:
+        shutil.rmtree(show)
+    return len(victims)
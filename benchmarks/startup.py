@@ -0,0 +1,106 @@
+"""Startup benchmark for the command line interface.
+
+Runs ``python -X importtime -m strmconvert <command>`` against a tiny
+temporary library and reports wall time, total import time and whether the
+heavy web/monitoring modules were imported.
+
+Usage:
+    python -m benchmarks.startup [--repeat N]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that a one-shot sync must never import
+HEAVY_MODULES = ('flask', 'watchdog', 'app')
+
+
+def _write_config(root: Path) -> Path:
+    """Create a one-record config pointing at a tiny source tree."""
+    source = root / 'source'
+    (source / 'Show' / 'Season 01').mkdir(parents=True)
+    (source / 'Show' / 'Season 01' / 'Show S01E01.strm').write_text(
+        'http://media/Show/Season 01/Show S01E01.mkv', encoding='utf-8')
+    config_path = root / 'config.yaml'
+    config_path.write_text(
+        'records:\n'
+        f"- source_folder: {source}\n"
+        f"  target_folder: {root / 'target'}\n"
+        "  search_string: 'http://'\n"
+        "  replacement_string: 'smb://'\n"
+        '  id: bench\n',
+        encoding='utf-8'
+    )
+    return config_path
+
+
+def _parse_importtime(stderr: str) -> Dict[str, int]:
+    """
+    Parse ``-X importtime`` output into {module: cumulative microseconds}.
+    Nested imports keep their leading indentation in the module name.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        modules[parts[2][1:].rstrip()] = int(parts[1])
+    return modules
+
+
+def measure(command: List[str], repeat: int) -> Dict[str, Any]:
+    """Measure startup of one CLI invocation, keeping the fastest run."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-m', 'strmconvert'] + command,
+            cwd=REPO_ROOT, capture_output=True, text=True,
+            env=dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+        )
+        wall = time.perf_counter() - start
+        modules = _parse_importtime(proc.stderr)
+        top_level = {name: us for name, us in modules.items() if not name.startswith(' ')}
+        result = {
+            'command': command,
+            'exit_code': proc.returncode,
+            'wall_seconds': round(wall, 4),
+            'import_seconds': round(sum(top_level.values()) / 1e6, 4),
+            'heavy_modules': sorted(m for m in HEAVY_MODULES
+                                   if any(name.strip() == m for name in modules)),
+        }
+        if best is None or result['wall_seconds'] < best['wall_seconds']:
+            best = result
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Runs per command; the fastest is reported (default: %(default)s)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = str(_write_config(Path(tmp)))
+        results = [
+            measure(['--config', config_path, 'sync', '--record', 'bench'], args.repeat),
+            measure(['--config', config_path, 'plan', '--record', 'bench'], args.repeat),
+        ]
+
+    print(json.dumps({'benchmark': 'startup', 'results': results}, indent=2))
+    # A one-shot command that drags in the web stack is a regression
+    return 1 if any(r['heavy_modules'] for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
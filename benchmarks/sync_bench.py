@@ -0,0 +1,201 @@
+"""FolderSync / StrmConverter benchmark on a synthetic library.
+
+Scenarios, run in order against the same generated tree:
+    cold      full sync into an empty target
+    warm      full sync with nothing changed
+    churn     full sync after ~1% of the source changed; directories whose
+              mtime did not change are pruned, so in-place edits wait for a sweep
+    sweep     full sync listing every directory (picks up the rest of churn)
+    orphans   full sync after whole shows were removed from the source
+    convert   StrmConverter read + convert of every .strm file, no writes
+    index     memory per tracked file in a PathIndex (size/mtime columns)
+
+Each scenario runs in a fresh process so its peak RSS can be reported.
+Syncs share a state directory, so warm and churn use the persisted manifest.
+
+Usage:
+    python -m benchmarks.sync_bench --files 10000 [--output results.json]
+    python -m benchmarks.compare results.json baseline.json
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict
+
+from benchmarks import library
+
+SCENARIOS = ('cold', 'warm', 'churn', 'sweep', 'orphans', 'convert', 'index')
+
+SEARCH_STRING = 'http://192.168.1.10:8096'
+REPLACEMENT_STRING = 'smb://nas'
+
+
+def _peak_rss_kb() -> int:
+    """Peak resident set size of this process in KB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _run_sync(source: Path, target: Path, sweep: bool = False) -> Dict[str, Any]:
+    from folder_sync import FolderSync
+
+    folder_sync = FolderSync(str(source), str(target), SEARCH_STRING, REPLACEMENT_STRING,
+                             record_id='bench', state_dir=str(target.parent / 'state'))
+    # Keep stdout clean for the JSON result
+    with contextlib.redirect_stdout(sys.stderr):
+        start = time.perf_counter()
+        stats = folder_sync.sync_all(sweep=sweep)
+        seconds = time.perf_counter() - start
+    return {'seconds': round(seconds, 4), 'stats': stats}
+
+
+def _run_convert(source: Path) -> Dict[str, Any]:
+    from strm_converter import StrmConverter
+
+    converter = StrmConverter()
+    files = [p for p in library.list_files(source) if p.suffix == '.strm']
+    start = time.perf_counter()
+    for path in files:
+        converter.convert_file(path, SEARCH_STRING, REPLACEMENT_STRING)
+    seconds = time.perf_counter() - start
+    return {'seconds': round(seconds, 4), 'stats': {'files': len(files)}}
+
+
+def _run_index(source: Path) -> Dict[str, Any]:
+    from folder_sync import MANIFEST_COLUMNS
+    from path_index import PathIndex
+
+    paths = []
+    for path in library.list_files(source):
+        st = path.stat()
+        paths.append((str(path.relative_to(source)), st.st_size, st.st_mtime_ns))
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    index = PathIndex(MANIFEST_COLUMNS)
+    for rel_path, size, mtime in paths:
+        index.add(rel_path, size=size, mtime=mtime)
+    seconds = time.perf_counter() - start
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return {
+        'seconds': round(seconds, 4),
+        'bytes_per_file': round(used / max(len(index), 1), 1),
+        'stats': {'files': len(index), 'nbytes': index.nbytes()},
+    }
+
+
+def _scenario_worker(name: str, source: str, target: str, queue) -> None:
+    """Run one scenario in a child process and report its result."""
+    try:
+        source_path, target_path = Path(source), Path(target)
+        prepare: Dict[str, Any] = {}
+        if name == 'churn':
+            prepare = library.apply_churn(source_path, 0.01)
+        elif name == 'orphans':
+            prepare = {'shows_removed': library.remove_shows(source_path, 0.05)}
+
+        if name == 'convert':
+            result = _run_convert(source_path)
+        elif name == 'index':
+            result = _run_index(source_path)
+        else:
+            result = _run_sync(source_path, target_path, sweep=(name == 'sweep'))
+        if prepare:
+            result['prepare'] = prepare
+        result['peak_rss_kb'] = _peak_rss_kb()
+        queue.put((name, result))
+    except Exception as e:
+        queue.put((name, {'error': repr(e)}))
+
+
+def run_scenario(name: str, source: Path, target: Path) -> Dict[str, Any]:
+    """Run a scenario in a fresh process and return its result."""
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_scenario_worker, args=(name, str(source), str(target), queue))
+    process.start()
+    _, result = queue.get()
+    process.join()
+    stats = result.get('stats', {})
+    files = stats.get('files', stats.get('created', 0) + stats.get('updated', 0) + stats.get('deleted', 0))
+    if result.get('seconds'):
+        result['files_per_sec'] = round(files / result['seconds'], 1)
+    return result
+
+
+def run(files: int, workdir: Path, scenarios=SCENARIOS, **library_args: Any) -> Dict[str, Any]:
+    """Generate a library under workdir and run the given scenarios."""
+    source = workdir / 'source'
+    target = workdir / 'target'
+
+    start = time.perf_counter()
+    counts = library.generate_library(source, files, **library_args)
+    generate_seconds = time.perf_counter() - start
+    print(f"Generated {counts['files']} files in {generate_seconds:.1f}s", file=sys.stderr)
+
+    results = {}
+    for name in scenarios:
+        print(f"Running scenario: {name}", file=sys.stderr)
+        results[name] = run_scenario(name, source, target)
+
+    return {
+        'benchmark': 'sync',
+        'params': dict(library_args, files=files),
+        'library': counts,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='FolderSync benchmark on a synthetic library')
+    parser.add_argument('--files', type=int, default=10000,
+                        help='Approximate number of files to generate (default: %(default)s)')
+    parser.add_argument('--seasons', type=int, default=3)
+    parser.add_argument('--episodes', type=int, default=10)
+    parser.add_argument('--artwork-bytes', type=int, default=2048)
+    parser.add_argument('--subtitle-ratio', type=float, default=library.DEFAULT_SUBTITLE_RATIO)
+    parser.add_argument('--nfo-ratio', type=float, default=library.DEFAULT_NFO_RATIO)
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                        help='Scenario to run (repeatable, default: all)')
+    parser.add_argument('--workdir', help='Directory for the generated trees (default: a temp dir)')
+    parser.add_argument('--output', help='Also write the JSON result to this file')
+    args = parser.parse_args()
+
+    library_args = {
+        'seasons': args.seasons,
+        'episodes': args.episodes,
+        'artwork_bytes': args.artwork_bytes,
+        'subtitle_ratio': args.subtitle_ratio,
+        'nfo_ratio': args.nfo_ratio,
+    }
+    scenarios = args.scenario or SCENARIOS
+
+    if args.workdir:
+        workdir = Path(args.workdir)
+        workdir.mkdir(parents=True, exist_ok=True)
+        result = run(args.files, workdir, scenarios, **library_args)
+    else:
+        with tempfile.TemporaryDirectory(prefix='strmconvert-bench-') as tmp:
+            result = run(args.files, Path(tmp), scenarios, **library_args)
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+    print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""Feed of target paths changed by syncs, for targeted media-server refreshes.
+
+Every file or directory a FolderSync writes or deletes in a target is
+appended to the feed with an increasing id. Recent entries are kept in a
+bounded in-memory ring buffer; all of them go to a JSON-lines log on disk
+(rotated once it grows past ``max_log_bytes``), so a reader that fell behind
+the buffer can still catch up:
+
+    {"id": 42, "time": 1700000000.0, "record": "<id>", "op": "write", "path": "/mnt/emby/Show/S01/E01.strm"}
+
+Readers poll ``since(cursor)`` (``GET /api/changes?since=``) with the last id
+they saw. Optionally, the directories changed since the last batch are
+POSTed to a webhook every ``webhook_interval`` seconds:
+
+    {"cursor": 42, "records": {"<id>": ["/mnt/emby/Show/S01", ...]}}
+"""
+import json
+import os
+import threading
+import time
+import urllib.request
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Set
+
+import metrics
+
+# Defaults for the 'settings.change_feed' keys
+DEFAULT_BUFFER_SIZE = 10000
+DEFAULT_MAX_LOG_BYTES = 64 * 1024 * 1024
+DEFAULT_WEBHOOK_INTERVAL = 10.0
+# Seconds between flushes of the on-disk log
+FLUSH_INTERVAL = 1.0
+# Most entries returned by one since() call
+MAX_LIMIT = 10000
+# Seconds to wait for the webhook to answer
+WEBHOOK_TIMEOUT = 10.0
+
+
+class ChangeFeed:
+    """Ring buffer plus on-disk log of changed target paths, with an optional batched webhook."""
+
+    def __init__(self, path: str, buffer_size: int = DEFAULT_BUFFER_SIZE,
+                 max_log_bytes: int = DEFAULT_MAX_LOG_BYTES,
+                 webhook_url: Optional[str] = None,
+                 webhook_interval: float = DEFAULT_WEBHOOK_INTERVAL):
+        self.path = Path(path)
+        self.max_log_bytes = max_log_bytes
+        self.webhook_url = webhook_url
+        self.webhook_interval = webhook_interval
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._buffer: Deque[Dict[str, Any]] = deque(maxlen=buffer_size)
+        self._next_id = self._last_logged_id() + 1
+        self._file = open(self.path, 'a', encoding='utf-8')
+        # record id -> target directories changed since the last webhook batch
+        self._pending_dirs: Dict[str, Set[str]] = {}
+        self._stop = threading.Event()
+        self._last_webhook = time.monotonic()
+
+        self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+        self._thread.start()
+
+    def _last_logged_id(self) -> int:
+        """Id of the last entry in the on-disk log (0 if none), so ids keep increasing across restarts."""
+        for path in (self.path, self._rotated_path()):
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(0, os.SEEK_END)
+                    f.seek(max(0, f.tell() - 65536))
+                    lines = f.read().splitlines()
+            except FileNotFoundError:
+                continue
+            for line in reversed(lines):
+                try:
+                    return int(json.loads(line)['id'])
+                except (ValueError, KeyError, TypeError):
+                    continue
+        return 0
+
+    def _rotated_path(self) -> Path:
+        return self.path.with_name(self.path.name + '.1')
+
+    def configure(self, webhook_url: Optional[str], webhook_interval: float) -> None:
+        """Change the webhook at runtime; buffer and log sizes apply from the next start."""
+        with self._lock:
+            self.webhook_url = webhook_url
+            self.webhook_interval = webhook_interval
+            if not webhook_url:
+                self._pending_dirs = {}
+
+    def record(self, record_id: str, op: str, path: Path) -> None:
+        """
+        Add a changed target path to the feed.
+
+        Args:
+            record_id: Record that changed it
+            op: 'write' or 'delete'
+            path: Absolute path in the target folder
+        """
+        path = str(path)
+        with self._lock:
+            if self._file is None:
+                return
+            entry = {'id': self._next_id, 'time': round(time.time(), 3),
+                     'record': record_id, 'op': op, 'path': path}
+            self._next_id += 1
+            self._buffer.append(entry)
+            self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            if self.webhook_url:
+                self._pending_dirs.setdefault(record_id, set()).add(os.path.dirname(path))
+
+    def last_id(self) -> int:
+        """Id of the most recent entry (0 if none)."""
+        with self._lock:
+            return self._next_id - 1
+
+    def since(self, cursor: int, limit: int = 1000) -> Dict[str, Any]:
+        """
+        Entries with ids after cursor, oldest first.
+
+        Returns:
+            Dictionary with 'changes', 'cursor' (pass it to the next call)
+            and 'truncated', set when entries after cursor are no longer
+            kept (the log was rotated past them)
+        """
+        limit = max(1, min(limit, MAX_LIMIT))
+        with self._lock:
+            last_id = self._next_id - 1
+            oldest = self._buffer[0]['id'] if self._buffer else last_id + 1
+            if cursor + 1 >= oldest:
+                changes = [entry for entry in self._buffer if entry['id'] > cursor][:limit]
+                return self._page(changes, cursor, last_id, truncated=False)
+            if self._file is not None:
+                self._file.flush()
+        # Fell behind the buffer: read the log on disk
+        changes: List[Dict[str, Any]] = []
+        first_id = None
+        for path in (self._rotated_path(), self.path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        if first_id is None:
+                            first_id = entry['id']
+                        if entry['id'] > cursor:
+                            changes.append(entry)
+                            if len(changes) >= limit:
+                                break
+            except FileNotFoundError:
+                continue
+            if len(changes) >= limit:
+                break
+        truncated = first_id is not None and first_id > cursor + 1
+        return self._page(changes, cursor, last_id, truncated)
+
+    @staticmethod
+    def _page(changes: List[Dict[str, Any]], cursor: int, last_id: int,
+              truncated: bool) -> Dict[str, Any]:
+        # A cursor past the last id (e.g. the log was deleted) is pulled back so the reader resyncs
+        return {
+            'changes': changes,
+            'cursor': changes[-1]['id'] if changes else min(max(cursor, 0), last_id),
+            'truncated': truncated,
+        }
+
+    def flush(self) -> None:
+        """Write buffered log lines, rotating the log once it is too large."""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            if self._file.tell() < self.max_log_bytes:
+                return
+            self._file.close()
+            os.replace(self.path, self._rotated_path())
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+    def send_webhook(self) -> bool:
+        """
+        POST the directories changed since the last batch to the webhook.
+        On failure they are kept and sent with the next batch.
+
+        Returns:
+            True if there was nothing to send or it was accepted
+        """
+        with self._lock:
+            pending, self._pending_dirs = self._pending_dirs, {}
+            cursor = self._next_id - 1
+        self._last_webhook = time.monotonic()
+        if not pending or not self.webhook_url:
+            return True
+        body = json.dumps({
+            'cursor': cursor,
+            'records': {record_id: sorted(dirs) for record_id, dirs in pending.items()},
+        }, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(self.webhook_url, data=body, method='POST',
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=WEBHOOK_TIMEOUT):
+                pass
+        except Exception as e:
+            print(f"Error posting change feed to {self.webhook_url}: {e}")
+            metrics.WEBHOOK_POSTS.inc(result='error')
+            with self._lock:
+                for record_id, dirs in pending.items():
+                    self._pending_dirs.setdefault(record_id, set()).update(dirs)
+            return False
+        metrics.WEBHOOK_POSTS.inc(result='ok')
+        return True
+
+    def _run(self) -> None:
+        """Background thread: periodic log flushes and webhook batches."""
+        while not self._stop.wait(FLUSH_INTERVAL):
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Error writing change feed {self.path}: {e}")
+            if self.webhook_url and time.monotonic() - self._last_webhook >= self.webhook_interval:
+                self.send_webhook()
+
+    def close(self) -> None:
+        """Send the last webhook batch, flush the log and stop the background thread."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        if self.webhook_url:
+            self.send_webhook()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# Feed of this process; syncs run without one (e.g. one-shot CLI syncs) are not recorded
+_feed: Optional[ChangeFeed] = None
+
+
+def attach(feed: Optional[ChangeFeed]) -> None:
+    """Record the changes of every FolderSync in this process to feed (None stops recording)."""
+    global _feed
+    _feed = feed
+
+
+def get() -> Optional[ChangeFeed]:
+    """The attached feed, if any."""
+    return _feed
+
+
+def record(record_id: str, op: str, path: Path) -> None:
+    """Add a changed target path to the attached feed, if any."""
+    feed = _feed
+    if feed is not None:
+        feed.record(record_id, op, path)
+
+
+def configure(config: Dict[str, Any]) -> None:
+    """Apply the webhook of settings.change_feed to the attached feed, if any."""
+    feed = _feed
+    if feed is not None:
+        section = (config.get('settings') or {}).get('change_feed') or {}
+        feed.configure(section.get('webhook_url') or None,
+                       section.get('webhook_interval', DEFAULT_WEBHOOK_INTERVAL))
+
+
+def from_config(path: str, config: Dict[str, Any]) -> ChangeFeed:
+    """Create a feed from the 'settings.change_feed' section of a configuration."""
+    section = (config.get('settings') or {}).get('change_feed') or {}
+    return ChangeFeed(
+        path,
+        buffer_size=section.get('buffer_size', DEFAULT_BUFFER_SIZE),
+        max_log_bytes=section.get('max_log_bytes', DEFAULT_MAX_LOG_BYTES),
+        webhook_url=section.get('webhook_url') or None,
+        webhook_interval=section.get('webhook_interval', DEFAULT_WEBHOOK_INTERVAL),
+    )
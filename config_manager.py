@@ -4,6 +4,23 @@ import os
 import uuid
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
+from sync_schedule import schedule_error
+
+# Per-record catch-up modes when monitoring starts: skip it, sync only what
+# changed while stopped, or sync every directory
+CATCH_UP_MODES = ('none', 'incremental', 'full')
+DEFAULT_CATCH_UP = 'incremental'
+
+# Order in which a full sync visits directories: by name (resumable from a
+# checkpoint), or subtrees with the newest directory mtime first
+SYNC_ORDERS = ('name', 'recent')
+DEFAULT_SYNC_ORDER = 'name'
+
+# Defaults for the optional top-level 'settings' section
+DEFAULT_SETTINGS = {
+    # Seconds between the background catch-up syncs of auto-started records
+    'catch_up_stagger': 30,
+}
 
 
 class ConfigManager:
@@ -37,6 +54,7 @@ class ConfigManager:
                     record['source_folder'] = self._normalize_path_separator(record['source_folder'])
                 if 'target_folder' in record:
                     record['target_folder'] = self._normalize_path_separator(record['target_folder'])
+                self._normalize_targets(record)
                 # Ensure each record has a UUID
                 if 'id' not in record:
                     record['id'] = str(uuid.uuid4())
@@ -63,6 +81,7 @@ class ConfigManager:
                 record['source_folder'] = self._normalize_path_separator(record['source_folder'])
             if 'target_folder' in record:
                 record['target_folder'] = self._normalize_path_separator(record['target_folder'])
+            self._normalize_targets(record)
             # Ensure each record has a UUID
             if 'id' not in record:
                 record['id'] = str(uuid.uuid4())
@@ -107,15 +126,112 @@ class ConfigManager:
                 # Allow empty strings for search_string and replacement_string (for sync without conversion)
                 if field in ['source_folder', 'target_folder'] and not record[field].strip():
                     return False, f"Record {i} field '{field}' cannot be empty"
+            
+            targets = record.get('targets', [])
+            if not isinstance(targets, list):
+                return False, f"Record {i} field 'targets' must be a list"
+            for j, target in enumerate(targets):
+                if (not isinstance(target, dict) or not isinstance(target.get('target_folder'), str)
+                        or not target['target_folder'].strip()):
+                    return False, f"Record {i} target {j} must have a non-empty 'target_folder'"
+                for field in ('search_string', 'replacement_string'):
+                    if not isinstance(target.get(field, ''), str):
+                        return False, f"Record {i} target {j} field '{field}' must be a string"
+            
+            if 'autostart' in record and not isinstance(record['autostart'], bool):
+                return False, f"Record {i} field 'autostart' must be true or false"
+            if record.get('catch_up', DEFAULT_CATCH_UP) not in CATCH_UP_MODES:
+                return False, f"Record {i} field 'catch_up' must be one of: {', '.join(CATCH_UP_MODES)}"
+            if record.get('schedule') is not None:
+                error = schedule_error(record['schedule'], f"Record {i} field 'schedule'")
+                if error:
+                    return False, error
+            if record.get('sync_order', DEFAULT_SYNC_ORDER) not in SYNC_ORDERS:
+                return False, f"Record {i} field 'sync_order' must be one of: {', '.join(SYNC_ORDERS)}"
+            
+            seed_workers = record.get('seed_workers')
+            if seed_workers is not None and (isinstance(seed_workers, bool) or not isinstance(seed_workers, int) or seed_workers < 0):
+                return False, f"Record {i} field 'seed_workers' must be a non-negative integer"
+            
+            for field in ('stat_sweep_interval', 'checkpoint_interval'):
+                interval = record.get(field)
+                if interval is not None and (isinstance(interval, bool) or not isinstance(interval, (int, float)) or interval < 0):
+                    return False, f"Record {i} field '{field}' must be a non-negative number"
+            
+            error = self._throttle_error(record.get('throttle'), f"Record {i} field 'throttle'")
+            if error:
+                return False, error
+        
+        settings = config.get('settings', {})
+        if not isinstance(settings, dict):
+            return False, "'settings' must be a mapping"
+        stagger = settings.get('catch_up_stagger', DEFAULT_SETTINGS['catch_up_stagger'])
+        if isinstance(stagger, bool) or not isinstance(stagger, (int, float)) or stagger < 0:
+            return False, "Setting 'catch_up_stagger' must be a non-negative number"
+        slots = settings.get('io_slots')
+        if slots is not None and (isinstance(slots, bool) or not isinstance(slots, int) or slots < 1):
+            return False, "Setting 'io_slots' must be a positive integer"
+        starvation = settings.get('io_starvation_seconds')
+        if starvation is not None and (isinstance(starvation, bool) or not isinstance(starvation, (int, float)) or starvation < 0):
+            return False, "Setting 'io_starvation_seconds' must be a non-negative number"
+        throttle = settings.get('throttle')
+        error = self._throttle_error(throttle, "Setting 'throttle'")
+        if error:
+            return False, error
+        if throttle and not isinstance(throttle.get('live', False), bool):
+            return False, "Setting 'throttle' field 'live' must be true or false"
+        error = self._change_feed_error(settings.get('change_feed'))
+        if error:
+            return False, error
         
         return True, None
     
+    @staticmethod
+    def _throttle_error(throttle: Any, name: str) -> Optional[str]:
+        """Validation error of an optional I/O limit section, or None if it is valid."""
+        if throttle is None:
+            return None
+        if not isinstance(throttle, dict):
+            return f"{name} must be a mapping"
+        for field in ('bytes_per_sec', 'ops_per_sec'):
+            limit = throttle.get(field)
+            if limit is not None and (isinstance(limit, bool) or not isinstance(limit, (int, float)) or limit < 0):
+                return f"{name} field '{field}' must be a non-negative number"
+        return None
+    
+    @staticmethod
+    def _change_feed_error(feed: Any) -> Optional[str]:
+        """Validation error of the optional change feed section, or None if it is valid."""
+        if feed is None:
+            return None
+        if not isinstance(feed, dict):
+            return "Setting 'change_feed' must be a mapping"
+        url = feed.get('webhook_url')
+        if url is not None and (not isinstance(url, str) or (url and not url.startswith(('http://', 'https://')))):
+            return "Setting 'change_feed' field 'webhook_url' must be an http(s) URL"
+        interval = feed.get('webhook_interval')
+        if interval is not None and (isinstance(interval, bool) or not isinstance(interval, (int, float)) or interval <= 0):
+            return "Setting 'change_feed' field 'webhook_interval' must be a positive number"
+        for field in ('buffer_size', 'max_log_bytes'):
+            value = feed.get(field)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 1):
+                return f"Setting 'change_feed' field '{field}' must be a positive integer"
+        return None
+    
     def get_records(self) -> List[Dict[str, Any]]:
         """Get all configuration records."""
         if self.config is None:
             self.load()
         return self.config.get('records', [])
     
+    def get_settings(self) -> Dict[str, Any]:
+        """Get the top-level settings, with defaults filled in."""
+        if self.config is None:
+            self.load()
+        settings = dict(DEFAULT_SETTINGS)
+        settings.update(self.config.get('settings') or {})
+        return settings
+    
     def get_record_by_id(self, record_id: str) -> Optional[Dict[str, Any]]:
         """Get a record by its UUID."""
         records = self.get_records()
@@ -132,6 +248,28 @@ class ConfigManager:
                 return idx
         return None
     
+    def state_dir(self, record_id: str) -> str:
+        """Directory for a record's persisted sync state, next to the config file."""
+        return str(self.config_path.parent / 'state' / record_id)
+    
+    def journal_path(self) -> str:
+        """Path of the event journal shared by all records."""
+        return str(self.config_path.parent / 'state' / 'journal.db')
+    
+    def traces_dir(self) -> Path:
+        """Directory event traces are recorded to."""
+        return self.config_path.parent / 'traces'
+    
+    def changes_path(self) -> str:
+        """Path of the change feed log shared by all records."""
+        return str(self.config_path.parent / 'state' / 'changes.log')
+    
+    def _normalize_targets(self, record: Dict[str, Any]) -> None:
+        """Normalize the target folders of a record's extra targets."""
+        for target in record.get('targets') or []:
+            if isinstance(target, dict) and isinstance(target.get('target_folder'), str):
+                target['target_folder'] = self._normalize_path_separator(target['target_folder'])
+    
     def _normalize_path_separator(self, path: str) -> str:
         """
         Normalize path separators based on the operating system.
@@ -0,0 +1,239 @@
+"""Crash-safe journal of accepted file system events.
+
+Every event the watcher accepts is appended to a SQLite database (WAL mode)
+and marked done once it has been applied to the target. Events that were
+still pending when the process stopped, debounced or mid-flight, are
+replayed on the next start instead of requiring a full sync.
+
+Appends and completions are buffered in memory and written in batches by a
+background thread, so the event hot path never waits on disk. An event is
+durable once its batch is flushed (within ``flush_interval`` seconds, and
+immediately on close); done entries are compacted away periodically.
+"""
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+
+# Seconds between batch flushes
+DEFAULT_FLUSH_INTERVAL = 0.2
+# Flush early once this many appends/completions are buffered
+DEFAULT_BATCH_SIZE = 500
+# Seconds between compactions
+DEFAULT_COMPACT_INTERVAL = 300.0
+# Pending entries older than this are dropped at compaction; a full sync covers them
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    record_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    created REAL NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS events_pending ON events (record_id, id) WHERE done = 0;
+"""
+
+
+class EventJournal:
+    """Append-only event journal backed by SQLite in WAL mode."""
+
+    def __init__(self, path: str, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 compact_interval: float = DEFAULT_COMPACT_INTERVAL,
+                 max_age: float = DEFAULT_MAX_AGE):
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.compact_interval = compact_interval
+        self.max_age = max_age
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        # WAL + NORMAL: a commit survives a process crash; only power loss can drop the last batch
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+        self._db_lock = threading.Lock()
+
+        # Ids are assigned here rather than by SQLite, so append() never touches the database
+        row = self._db.execute('SELECT MAX(id) FROM events').fetchone()
+        self._next_id = (row[0] or 0) + 1
+        self._appended: List[Tuple[int, str, str, str, int, float]] = []
+        self._completed: List[int] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._closed = False
+        self._last_compact = time.monotonic()
+
+        self._thread = threading.Thread(target=self._run, name='event-journal', daemon=True)
+        self._thread.start()
+
+    def append(self, record_id: str, kind: str, path: str, is_dir: bool = False) -> int:
+        """
+        Journal an accepted event.
+
+        Args:
+            record_id: Record the event belongs to
+            kind: Event type ('created', 'modified', 'deleted', 'moved')
+            path: Path relative to the record's source folder
+            is_dir: Whether the path is a directory
+
+        Returns:
+            The entry id, to pass to complete()
+        """
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            if self._closed:
+                return entry_id
+            self._appended.append((entry_id, record_id, kind, path, int(is_dir), time.time()))
+            full = len(self._appended) + len(self._completed) >= self.batch_size
+        if full:
+            self._wake.set()
+        return entry_id
+
+    def complete(self, entry_id: int) -> None:
+        """Mark an entry as applied to the target."""
+        with self._lock:
+            if self._closed:
+                return
+            self._completed.append(entry_id)
+            full = len(self._appended) + len(self._completed) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def flush(self) -> None:
+        """Write all buffered appends and completions."""
+        with self._lock:
+            appended, self._appended = self._appended, []
+            completed, self._completed = self._completed, []
+        if not appended and not completed:
+            return
+        start = time.perf_counter()
+        with self._db_lock:
+            with self._db:
+                self._db.executemany(
+                    'INSERT INTO events (id, record_id, kind, path, is_dir, created) VALUES (?, ?, ?, ?, ?, ?)',
+                    appended)
+                self._db.executemany('UPDATE events SET done = 1 WHERE id = ?',
+                                     ((entry_id,) for entry_id in completed))
+        metrics.JOURNAL_FLUSH_SECONDS.observe(time.perf_counter() - start)
+
+    def last_id(self) -> int:
+        """Id of the most recent entry (0 if none)."""
+        with self._lock:
+            return self._next_id - 1
+
+    def pending(self, record_id: str, up_to: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Unfinished entries of a record, oldest first, optionally only those with id <= up_to."""
+        self.flush()
+        with self._db_lock:
+            rows = self._db.execute(
+                'SELECT id, kind, path, is_dir, created FROM events '
+                'WHERE record_id = ? AND done = 0 AND id <= ? ORDER BY id',
+                (record_id, self.last_id() if up_to is None else up_to)).fetchall()
+        return [
+            {'id': row[0], 'kind': row[1], 'path': row[2], 'is_dir': bool(row[3]), 'created': row[4]}
+            for row in rows
+        ]
+
+    def compact(self) -> int:
+        """
+        Delete done entries and pending ones older than max_age, then
+        checkpoint the WAL back into the database file.
+
+        Returns:
+            Number of entries removed
+        """
+        self.flush()
+        with self._db_lock:
+            with self._db:
+                removed = self._db.execute(
+                    'DELETE FROM events WHERE done = 1 OR created < ?',
+                    (time.time() - self.max_age,)).rowcount
+            self._db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        self._last_compact = time.monotonic()
+        return removed
+
+    def _run(self) -> None:
+        """Background flusher: batch writes and periodic compaction."""
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.flush()
+                if time.monotonic() - self._last_compact >= self.compact_interval:
+                    self.compact()
+            except sqlite3.Error as e:
+                print(f"Error writing event journal {self.path}: {e}")
+
+    def close(self) -> None:
+        """Flush everything buffered and close the database."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        # Anything accepted from here on is dropped; completions that miss the
+        # final flush just mean their (idempotent) entries replay on the next start
+        with self._lock:
+            self._closed = True
+        try:
+            self.flush()
+        finally:
+            with self._db_lock:
+                self._db.close()
+
+
+def replay(journal: EventJournal, record_id: str, folder_sync, up_to: Optional[int] = None) -> int:
+    """
+    Re-apply a record's unfinished journal entries to its target.
+
+    Each path is brought in line with the source as it is now (synced if it
+    exists, deleted from the target if not), so entries are idempotent and
+    only the latest entry per path needs applying.
+
+    Args:
+        journal: Event journal
+        record_id: Record whose entries to replay
+        folder_sync: FolderSync for the record
+        up_to: Only replay entries with ids up to this one, leaving newer
+               events to the handler that accepted them
+
+    Returns:
+        Number of paths re-applied
+    """
+    entries = journal.pending(record_id, up_to)
+    if not entries:
+        return 0
+    latest: Dict[str, Dict[str, Any]] = {}
+    for entry in entries:
+        latest[entry['path']] = entry
+
+    for rel_path, entry in latest.items():
+        source_path = folder_sync.source_folder / rel_path
+        if source_path.is_dir():
+            for root, _, files in os.walk(source_path):
+                for name in files:
+                    folder_sync.sync_file(Path(root, name))
+        elif source_path.exists():
+            folder_sync.sync_file(source_path)
+        else:
+            folder_sync.delete_file(Path(rel_path))
+    for entry in entries:
+        journal.complete(entry['id'])
+    metrics.JOURNAL_REPLAYED.inc(len(latest), record=record_id)
+    print(f"Replayed {len(latest)} journaled event(s) for record {record_id}")
+    return len(latest)
@@ -0,0 +1,96 @@
+"""Recording and loading of file system event traces.
+
+A trace is a JSON-lines file with one event per line:
+
+    {"t": 0.0123, "type": "created", "src": "Show/Season 01/E01.strm", "dest": null, "dir": false}
+
+``t`` is seconds since recording started. Paths are relative to the source
+folder, so a trace recorded on one machine can be replayed against another tree.
+"""
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from watchdog.events import (
+    DirCreatedEvent, DirDeletedEvent, DirModifiedEvent, DirMovedEvent,
+    FileClosedEvent, FileCreatedEvent, FileDeletedEvent, FileModifiedEvent,
+    FileMovedEvent, FileSystemEvent,
+)
+
+# (event type, is directory) -> watchdog event class
+EVENT_CLASSES = {
+    ('created', False): FileCreatedEvent,
+    ('created', True): DirCreatedEvent,
+    ('modified', False): FileModifiedEvent,
+    ('modified', True): DirModifiedEvent,
+    ('deleted', False): FileDeletedEvent,
+    ('deleted', True): DirDeletedEvent,
+    ('moved', False): FileMovedEvent,
+    ('moved', True): DirMovedEvent,
+    ('closed', False): FileClosedEvent,
+}
+
+
+def _relative(path: str, root: Path) -> str:
+    try:
+        return Path(path).relative_to(root).as_posix()
+    except ValueError:
+        return path
+
+
+class EventRecorder:
+    """Appends events seen by a handler to a trace file."""
+
+    def __init__(self, trace_path: str, source_folder: Path):
+        self.trace_path = Path(trace_path)
+        self.source_folder = Path(source_folder)
+        self.trace_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.trace_path, 'w', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self.count = 0
+
+    def record(self, event: FileSystemEvent) -> None:
+        """Write one event to the trace."""
+        entry = {
+            't': round(time.monotonic() - self._start, 6),
+            'type': event.event_type,
+            'src': _relative(event.src_path, self.source_folder),
+            'dest': _relative(event.dest_path, self.source_folder) if getattr(event, 'dest_path', '') else None,
+            'dir': event.is_directory,
+        }
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line)
+                self.count += 1
+
+    def close(self) -> int:
+        """Close the trace file and return the number of events recorded."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        return self.count
+
+
+def load_trace(trace_path: str) -> Iterator[Dict[str, Any]]:
+    """Yield trace entries from a JSON-lines trace file."""
+    with open(trace_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def to_event(entry: Dict[str, Any], source_folder: Path) -> Optional[FileSystemEvent]:
+    """Build the watchdog event for a trace entry, with paths under source_folder."""
+    event_class = EVENT_CLASSES.get((entry['type'], bool(entry.get('dir'))))
+    if event_class is None:
+        return None
+    src = str(source_folder / entry['src'])
+    if entry['type'] == 'moved':
+        return event_class(src, str(source_folder / entry['dest']))
+    return event_class(src)
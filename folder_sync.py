@@ -1,106 +1,1704 @@
 """Full folder synchronization logic."""
+import hashlib
+import json
 import os
 import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from config_manager import DEFAULT_SYNC_ORDER
+from path_index import PathIndex
 from strm_converter import StrmConverter
+from sync_stats import SyncTimer, format_summary
+import change_feed
+import metrics
+import profiling
+import scheduler
+import throttle
+
+# Default seconds between full listings of a directory whose mtime is unchanged
+DEFAULT_SWEEP_INTERVAL = 24 * 3600
+
+# Directory state columns: mtime (0 = must be listed), source file count, last listing time
+DIR_STATE_COLUMNS = {'mtime': 'q', 'entries': 'l', 'swept': 'q'}
+
+# Each directory's own state row; NUL never appears in a real file name
+_DIR_ROW = '\0'
+
+# A directory modified this close to the start of a sync may change again
+# without its mtime moving (coarse timestamps), so it is not trusted
+_MTIME_SETTLE_NS = 2 * 10**9
+
+# Digest cache columns: the size/mtime a file's hash was computed for, and the
+# 64-bit hash. Directory rows hold the directory digest (0: no files below)
+DIGEST_COLUMNS = {'size': 'q', 'mtime': 'q', 'hash': 'q'}
+
+# Manifest columns: size/mtime of each source file as of its last write, and
+# for .strm files the id (1-based, 0 = none) of its URL prefix in
+# meta['prefixes'], which rule changes are matched against
+MANIFEST_COLUMNS = {'size': 'q', 'mtime': 'q', 'prefix': 'i'}
+
+# Operations a directory's differences are applied with, see _diff_ops
+OP_KINDS = ('delete', 'rmdir', 'mkdir', 'convert', 'copy')
+# One planned operation: (kind, name, source entry, target existed, source stat)
+_Op = Tuple[str, str, Optional[os.DirEntry], bool, Optional[os.stat_result]]
+
+# File names listed per diverged directory in a verify report
+MAX_REPORT_NAMES = 20
+
+# Default seconds between checkpoints of a running full sync
+DEFAULT_CHECKPOINT_INTERVAL = 60
+
+# Default worker threads writing files when seeding an empty target (0: no seeding)
+DEFAULT_SEED_WORKERS = 8
+# Seeding files queued per worker before the walk waits for writes to finish
+_SEED_QUEUE_PER_WORKER = 64
+# Outcome of seeding one file into one target: (phase, seconds, bytes read,
+# bytes written), phase None if it failed
+_SeedResult = Tuple[Optional[str], float, int, int]
+
+# A checkpoint older than this is not resumed; the sync starts over
+CHECKPOINT_MAX_AGE = 7 * 24 * 3600
+
+# Seconds a file written by an upstream record is remembered, so this
+# record's watcher can recognise the events caused by that write
+UPSTREAM_WRITE_WINDOW = 60
+
+# Sync counters carried over from a checkpoint into the resumed sync
+CHECKPOINT_COUNTERS = ('created', 'updated', 'unchanged', 'deleted', 'errors', 'dirs_pruned')
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little', signed=True)
+
+
+def _strm_prefix(content: str) -> str:
+    """A .strm file's URL prefix: its content up to and including the last '/'."""
+    return content[:content.rfind('/') + 1]
+
+
+def _prefix_may_contain(prefix: str, search: str) -> bool:
+    """
+    Whether .strm content with the given URL prefix may contain search.
+    An occurrence not inside the prefix runs into the file name after the
+    last '/', which has no '/', so the part of search up to its own last
+    '/' must end the prefix. Exact for search strings ending in '/' or
+    found in the prefix; otherwise the file is a candidate to be read.
+    """
+    return search in prefix or prefix.endswith(search[:search.rfind('/') + 1])
+
+
+class _DirDiff:
+    """Differences between one source directory and its target counterpart."""
+    
+    __slots__ = ('rel_dir', 'target_exists', 'writes', 'deletes', 'orphan_dirs', 'subdirs',
+                 'linked_dirs', 'pruned', 'failed')
+    
+    def __init__(self, rel_dir: str, target_exists: bool):
+        self.rel_dir = rel_dir  # '' for the root
+        self.target_exists = target_exists
+        self.writes: List[Tuple[os.DirEntry, bool]] = []  # (source entry, target existed)
+        self.deletes: List[str] = []  # target file names missing from source
+        self.orphan_dirs: List[str] = []  # target dir names missing from source
+        self.subdirs: List[str] = []  # source subdirectory names, sorted
+        self.linked_dirs: List[str] = []  # source symlinked directory names
+        self.pruned = -1  # source file count if listing was skipped, else -1
+        self.failed = False  # set by _apply_diff when any operation failed
 
 
 class FolderSync:
     """Handles full synchronization of source and target folders."""
     
     def __init__(self, source_folder: str, target_folder: str, 
-                 search_string: str, replacement_string: str):
+                 search_string: str, replacement_string: str,
+                 record_id: str = '', state_dir: Optional[str] = None,
+                 sweep_interval: float = DEFAULT_SWEEP_INTERVAL,
+                 checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+                 targets: Optional[List[Dict[str, str]]] = None,
+                 seed_workers: int = DEFAULT_SEED_WORKERS,
+                 sync_order: str = DEFAULT_SYNC_ORDER):
         self.source_folder = Path(source_folder)
         self.target_folder = Path(target_folder)
         self.search_string = search_string
         self.replacement_string = replacement_string
+        self.record_id = record_id
+        self.state_dir = Path(state_dir) if state_dir else None
         self.converter = StrmConverter()
+        # Size/mtime of each source file as of its last successful write,
+        # keyed by path relative to the source folder
+        self._manifest: Optional[PathIndex] = None
+        # Per source directory: mtime and file count as of its last listing.
+        # Directories whose mtime is unchanged are not listed again until
+        # sweep_interval seconds have passed (0 lists every directory every time)
+        self._dir_state: Optional[PathIndex] = None
+        # URL prefix -> its id in the manifest's prefix column
+        self._prefix_ids: Dict[str, int] = {}
+        self.sweep_interval = sweep_interval
+        self._manifest_lock = threading.Lock()
+        # Full syncs of one record (manual, catch-up) run one at a time
+        self._sync_lock = threading.Lock()
+        # A running full sync saves its state and walk position this often,
+        # so a restarted or cancelled sync continues where it stopped
+        self.checkpoint_interval = checkpoint_interval
+        self._cancel = threading.Event()
+        # Full syncs into empty targets take the parallel seeding path, see _seed
+        self.seed_workers = seed_workers
+        # Directory order of full syncs: 'name' or 'recent', see _recency_keys
+        self.sync_order = sync_order
+        # Extra target+rule sets fed from the same source: the source is
+        # walked, read and watched once and each file written to every target.
+        # Each keeps its own manifest in a subdirectory of state_dir
+        self.extra_targets = self._make_extra_targets(targets or [])
+        # Monitored records whose source folder contains this target folder
+        # (set by WatchdogMonitor): each file written here is passed on to
+        # them directly, content included, instead of via their watchers
+        self.downstream: List['FolderSync'] = []
+        # Source files written by an upstream record: path -> (size, mtime, expiry)
+        self._upstream_writes: Dict[str, Tuple[int, int, float]] = {}
+        self._upstream_lock = threading.Lock()
+    
+    @classmethod
+    def from_record(cls, record: Dict[str, Any], state_dir: Optional[str] = None) -> 'FolderSync':
+        """Create a FolderSync instance from a configuration record."""
+        return cls(
+            record['source_folder'],
+            record['target_folder'],
+            record['search_string'],
+            record['replacement_string'],
+            record_id=record.get('id', ''),
+            state_dir=state_dir,
+            sweep_interval=record.get('stat_sweep_interval', DEFAULT_SWEEP_INTERVAL),
+            checkpoint_interval=record.get('checkpoint_interval', DEFAULT_CHECKPOINT_INTERVAL),
+            targets=record.get('targets'),
+            seed_workers=record.get('seed_workers', DEFAULT_SEED_WORKERS),
+            sync_order=record.get('sync_order', DEFAULT_SYNC_ORDER)
+        )
+    
+    def update_settings(self, record: Dict[str, Any]) -> None:
+        """Apply a record's sweep, checkpoint, seeding and order options in place."""
+        self.sweep_interval = record.get('stat_sweep_interval', DEFAULT_SWEEP_INTERVAL)
+        self.checkpoint_interval = record.get('checkpoint_interval', DEFAULT_CHECKPOINT_INTERVAL)
+        self.seed_workers = record.get('seed_workers', DEFAULT_SEED_WORKERS)
+        self.sync_order = record.get('sync_order', DEFAULT_SYNC_ORDER)
+        for extra in self.extra_targets:
+            extra.sweep_interval = self.sweep_interval
+    
+    def _make_extra_targets(self, targets: List[Dict[str, str]], first: int = 1) -> List['FolderSync']:
+        """Create the FolderSync of each extra target, numbered from first."""
+        return [
+            FolderSync(
+                str(self.source_folder),
+                target['target_folder'],
+                target.get('search_string', ''),
+                target.get('replacement_string', ''),
+                record_id=self.record_id,
+                state_dir=str(self.state_dir / f'target-{i}') if self.state_dir else None,
+                sweep_interval=self.sweep_interval
+            )
+            for i, target in enumerate(targets, first)
+        ]
+    
+    def _targets(self) -> List['FolderSync']:
+        """This target followed by the extra targets."""
+        return [self] + self.extra_targets
+    
+    def _rules_fingerprint(self) -> str:
+        """Fingerprint of everything that decides a target file's content."""
+        key = '\0'.join((str(self.source_folder), str(self.target_folder),
+                         self.search_string, self.replacement_string))
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+    
+    def _load_index(self, name: str) -> Optional[PathIndex]:
+        if self.state_dir is None:
+            return None
+        path = self.state_dir / f'{name}.idx'
+        if not path.exists():
+            return None
+        try:
+            return PathIndex.load(str(path))
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable sync state {path}: {e}")
+            return None
+    
+    def _load_state(self) -> None:
+        """
+        Load the manifest and directory state from state_dir.
+        State written under different rules is discarded; the two are
+        only used together, so if either is discarded both are.
+        """
+        fingerprint = self._rules_fingerprint()
+        manifest = self._load_index('manifest')
+        dir_state = self._load_index('dirs')
+        if (manifest is None or dir_state is None
+                or manifest.column_types != MANIFEST_COLUMNS
+                or manifest.meta.get('rules') != fingerprint
+                or dir_state.meta.get('rules') != fingerprint):
+            manifest, dir_state = self._new_state(fingerprint)
+        self._manifest = manifest
+        self._dir_state = dir_state
+        self._prefix_ids = {prefix: i for i, prefix in enumerate(manifest.meta.setdefault('prefixes', []), 1)}
+    
+    @staticmethod
+    def _new_state(fingerprint: str) -> Tuple[PathIndex, PathIndex]:
+        """An empty manifest and directory state for the given rules."""
+        manifest = PathIndex(MANIFEST_COLUMNS)
+        dir_state = PathIndex(DIR_STATE_COLUMNS)
+        manifest.meta['rules'] = dir_state.meta['rules'] = fingerprint
+        manifest.meta['prefixes'] = []
+        return manifest, dir_state
+    
+    @property
+    def manifest(self) -> PathIndex:
+        """Index of synced source files, loaded from state_dir on first use."""
+        if self._manifest is None:
+            self._load_state()
+        return self._manifest
+    
+    @property
+    def dir_state(self) -> PathIndex:
+        """Index of listed source directories, loaded from state_dir on first use."""
+        if self._dir_state is None:
+            self._load_state()
+        return self._dir_state
+    
+    def save_state(self) -> None:
+        """Write the manifest and directory state to state_dir, if one is configured."""
+        for extra in self.extra_targets:
+            extra.save_state()
+        if self.state_dir is None or self._manifest is None:
+            return
+        try:
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+            with self._manifest_lock:
+                self._manifest.save(str(self.state_dir / 'manifest.idx'))
+                self._dir_state.save(str(self.state_dir / 'dirs.idx'))
+        except OSError as e:
+            print(f"Error saving sync state for {self.record_id or self.source_folder}: {e}")
+    
+    def _load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        """
+        Load the checkpoint of an unfinished full sync. A checkpoint written
+        for other rules or folders, or too old, is deleted and None returned.
+        """
+        if self.state_dir is None:
+            return None
+        path = self.state_dir / 'checkpoint.json'
+        try:
+            checkpoint = json.loads(path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable sync checkpoint {path}: {e}")
+            self._clear_checkpoint()
+            return None
+        if (checkpoint.get('rules') != self._checkpoint_fingerprint()
+                or checkpoint.get('source') != str(self.source_folder)
+                or time.time() - checkpoint.get('saved', 0) > CHECKPOINT_MAX_AGE):
+            self._clear_checkpoint()
+            return None
+        return checkpoint
+    
+    def _save_checkpoint(self, cursor: Optional[Tuple[str, ...]], stats: Dict[str, Any],
+                         sweep: bool, rules: str) -> None:
+        """
+        Save the sync state, then the walk position: every directory up to
+        cursor (in walk order) has been applied. The state goes first, so a
+        crash in between only makes the resumed sync redo some directories.
+        rules is the checkpoint fingerprint the sync started under, so a
+        sync whose rules were changed while it ran is not resumed.
+        """
+        if self.state_dir is None or cursor is None:
+            return
+        self.save_state()
+        checkpoint = {
+            'rules': rules,
+            'source': str(self.source_folder),
+            'cursor': list(cursor),
+            'sweep': sweep,
+            'stats': {key: stats.get(key, 0) for key in CHECKPOINT_COUNTERS},
+            'saved': time.time(),
+        }
+        path = self.state_dir / 'checkpoint.json'
+        tmp_path = self.state_dir / 'checkpoint.json.tmp'
+        try:
+            tmp_path.write_text(json.dumps(checkpoint, ensure_ascii=False), encoding='utf-8')
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error saving sync checkpoint {path}: {e}")
+    
+    def _checkpoint_fingerprint(self) -> str:
+        """Rules of every target; a checkpoint is only valid for the same set."""
+        return '+'.join(target._rules_fingerprint() for target in self._targets())
+    
+    def _clear_checkpoint(self) -> None:
+        if self.state_dir is None:
+            return
+        try:
+            (self.state_dir / 'checkpoint.json').unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing sync checkpoint for {self.record_id or self.source_folder}: {e}")
+    
+    def cancel(self) -> bool:
+        """
+        Stop a running full sync after the directory it is on. Its
+        checkpoint is kept, so the next sync continues from there.
+        A running verify repair stops before its next diverged directory.
+        
+        Returns:
+            True if a sync or repair was running
+        """
+        if not self.is_syncing():
+            return False
+        self._cancel.set()
+        return True
+    
+    def is_syncing(self) -> bool:
+        """Whether a full sync is in progress."""
+        return self._sync_lock.locked()
+    
+    def _feed_downstream(self, target_file: Path, content: Optional[str] = None) -> None:
+        """
+        Pass a file just written to this target on to the downstream records,
+        so they apply their own rules to it without re-reading it or waiting
+        for their watchers.
+        
+        Args:
+            target_file: File written in this target folder
+            content: Converted content of a .strm file, None for copied files
+        """
+        for downstream in self.downstream:
+            downstream.sync_from_upstream(target_file, content)
+    
+    def sync_from_upstream(self, source_file: Path, original: Optional[str] = None) -> bool:
+        """
+        Sync a file an upstream record has just written into the source
+        folder, remembering its size/mtime so the events the write causes
+        are recognised by is_upstream_write() and not synced a second time.
+        
+        Args:
+            source_file: Absolute path of the file in this source folder
+            original: Content of a .strm file, as written by the upstream record
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            st = source_file.stat()
+        except OSError:
+            return False
+        now = time.monotonic()
+        with self._upstream_lock:
+            if len(self._upstream_writes) >= 1024:
+                self._upstream_writes = {
+                    path: entry for path, entry in self._upstream_writes.items() if entry[2] > now
+                }
+            self._upstream_writes[os.path.normpath(str(source_file))] = (
+                st.st_size, st.st_mtime_ns, now + UPSTREAM_WRITE_WINDOW)
+        return self.sync_file(source_file, original)
+    
+    def is_upstream_write(self, source_file: Path) -> bool:
+        """
+        Whether a source file is, unchanged, one an upstream record wrote and
+        already passed to sync_from_upstream() within UPSTREAM_WRITE_WINDOW.
+        """
+        key = os.path.normpath(str(source_file))
+        with self._upstream_lock:
+            entry = self._upstream_writes.get(key)
+        if entry is None:
+            return False
+        if entry[2] <= time.monotonic():
+            with self._upstream_lock:
+                self._upstream_writes.pop(key, None)
+            return False
+        try:
+            st = source_file.stat()
+        except OSError:
+            return False
+        return (st.st_size, st.st_mtime_ns) == entry[:2]
+    
+    def _rule_patterns(self, search_string: str, replacement_string: str) -> List[str]:
+        """Search strings whose matching .strm files convert differently under the new rules."""
+        if (search_string, replacement_string) == (self.search_string, self.replacement_string):
+            return []
+        return sorted({self.search_string, search_string} - {''})
+    
+    def _affected_files(self, patterns: List[str]) -> List[str]:
+        """Indexed .strm files whose URL prefix may contain any of patterns. Caller holds _manifest_lock."""
+        if not patterns:
+            return []
+        manifest = self._manifest
+        prefix_ids = {
+            i for i, prefix in enumerate(manifest.meta['prefixes'], 1)
+            if any(_prefix_may_contain(prefix, pattern) for pattern in patterns)
+        }
+        return [manifest.path_of(file_id) for file_id in manifest
+                if manifest.get(file_id, 'prefix') in prefix_ids]
+    
+    def rule_impact(self, target_folder: str, search_string: str,
+                    replacement_string: str) -> Dict[str, Any]:
+        """
+        Estimate what switching to new rules would rewrite, from the manifest.
+        
+        Returns:
+            Dictionary with 'full' (target changed: every file is rewritten),
+            'affected' (files update_rules would re-convert, or all files if
+            full) and 'indexed' (files in the manifest)
+        """
+        manifest = self.manifest
+        with self._manifest_lock:
+            indexed = len(manifest)
+            if Path(target_folder) != self.target_folder:
+                return {'full': True, 'affected': indexed, 'indexed': indexed}
+            affected = self._affected_files(self._rule_patterns(search_string, replacement_string))
+        return {'full': False, 'affected': len(affected), 'indexed': indexed}
+    
+    def update_rules(self, target_folder: str, search_string: str, replacement_string: str) -> bool:
+        """
+        Switch this instance to new target/replacement rules in place, so a
+        running observer keeps its watches. A running full sync or repair is
+        cancelled; the rules are swapped without waiting for it to stop.
+        
+        If only the search/replacement strings changed, the .strm files
+        whose content matches the old or new search string are re-converted
+        in the background once the cancelled sync has stopped, found through
+        the manifest's URL prefixes; everything else in the target is
+        already correct. If the target changed, the sync state is reset and
+        the next full sync rewrites every file.
+        
+        Returns:
+            True if anything changed
+        """
+        if (Path(target_folder) == self.target_folder and search_string == self.search_string
+                and replacement_string == self.replacement_string):
+            return False
+        self.cancel()
+        manifest = self.manifest
+        with self._manifest_lock:
+            patterns = self._rule_patterns(search_string, replacement_string)
+            target_changed = Path(target_folder) != self.target_folder
+            self.target_folder = Path(target_folder)
+            self.search_string = search_string
+            self.replacement_string = replacement_string
+            fingerprint = self._rules_fingerprint()
+            if target_changed:
+                self._manifest, self._dir_state = self._new_state(fingerprint)
+                self._prefix_ids = {}
+            else:
+                manifest.meta['rules'] = self._dir_state.meta['rules'] = fingerprint
+        # A checkpoint the cancelled sync saves still carries the old rules,
+        # so it is not resumed either
+        self._clear_checkpoint()
+        if target_changed:
+            self.save_state()
+        else:
+            threading.Thread(target=self._reconvert_after_sync, args=(patterns,),
+                             name=f'reconvert-{self.record_id}', daemon=True).start()
+        return True
+    
+    def _reconvert_after_sync(self, patterns: List[str]) -> None:
+        """
+        Background part of update_rules: once no full sync or repair is
+        running, re-convert the indexed .strm files affected by the rule
+        change, as throttled bulk work.
+        """
+        try:
+            with self._sync_lock:
+                try:
+                    with throttle.background(), scheduler.work_class('bulk', override=False):
+                        with self._manifest_lock:
+                            affected = self._affected_files(patterns)
+                        if affected:
+                            self._reconvert(affected, patterns)
+                    self.save_state()
+                finally:
+                    # Not cancellable: a cancel meant for this must not stop the next full sync
+                    self._cancel.clear()
+        except Exception as e:
+            print(f"Error re-converting files for {self.record_id or self.source_folder}: {e}")
+            metrics.ERRORS.inc(record=self.record_id, operation='write')
+    
+    def update_targets(self, targets: List[Dict[str, str]]) -> bool:
+        """
+        Switch to a new list of extra targets in place. Targets are matched
+        by position: kept ones take their new rules through update_rules,
+        added ones start empty (the next full sync lists every directory to
+        fill them) and removed ones are dropped, leaving their folders alone.
+        
+        Returns:
+            True if anything changed
+        """
+        current = [
+            {'target_folder': str(extra.target_folder), 'search_string': extra.search_string,
+             'replacement_string': extra.replacement_string}
+            for extra in self.extra_targets
+        ]
+        wanted = [
+            {'target_folder': str(Path(target['target_folder'])),
+             'search_string': target.get('search_string', ''),
+             'replacement_string': target.get('replacement_string', '')}
+            for target in targets
+        ]
+        if current == wanted:
+            return False
+        self.cancel()
+        kept = self.extra_targets[:len(wanted)]
+        for extra, target in zip(kept, wanted):
+            extra.update_rules(target['target_folder'], target['search_string'],
+                               target['replacement_string'])
+        self.extra_targets = kept + self._make_extra_targets(wanted[len(kept):], len(kept) + 1)
+        # As in update_rules, a checkpoint saved by the cancelled sync names the old targets
+        self._clear_checkpoint()
+        return True
+    
+    def _reconvert(self, rel_paths: List[str], patterns: List[str]) -> int:
+        """
+        Re-convert the given .strm files under the current rules, skipping
+        candidates whose content turns out not to contain any of patterns.
+        
+        Returns:
+            Number of files rewritten
+        """
+        rewritten = 0
+        for rel_path in rel_paths:
+            source_file = self.source_folder / rel_path
+            try:
+                st = source_file.stat()
+                original = self.converter.read_file(source_file)
+                if not any(pattern in original for pattern in patterns):
+                    continue
+                content = self.converter.convert_text(original, self.search_string, self.replacement_string)
+                with scheduler.slot():
+                    self.converter.write_converted_file(self.target_folder / rel_path, content)
+                throttle.charge(self.record_id, ops=1,
+                                nbytes=len(original.encode('utf-8')) + len(content.encode('utf-8')))
+                metrics.FILES_CONVERTED.inc(record=self.record_id)
+                change_feed.record(self.record_id, 'write', self.target_folder / rel_path)
+                self._feed_downstream(self.target_folder / rel_path, content)
+                self._remember(rel_path, st, _strm_prefix(original))
+                rewritten += 1
+            except Exception as e:
+                # Left out of the manifest, so the next full sync rewrites it
+                print(f"Error re-converting {source_file}: {e}")
+                metrics.ERRORS.inc(record=self.record_id, operation='write')
+                self._forget(rel_path)
+        print(f"Re-converted {rewritten} of {len(rel_paths)} indexed .strm file(s) "
+              f"affected by the rule change for {self.record_id or self.source_folder}")
+        return rewritten
+    
+    def _unchanged(self, rel_path: str, st: os.stat_result) -> bool:
+        """Whether a source file matches its manifest entry."""
+        manifest = self.manifest
+        with self._manifest_lock:
+            file_id = manifest.find(rel_path)
+            return (file_id >= 0
+                    and manifest.get(file_id, 'size') == st.st_size
+                    and manifest.get(file_id, 'mtime') == st.st_mtime_ns)
+    
+    def _remember(self, rel_path: str, st: os.stat_result, prefix: Optional[str] = None) -> None:
+        """Record a source file's size/mtime (and .strm URL prefix) after a successful write."""
+        manifest = self.manifest
+        with self._manifest_lock:
+            prefix_id = 0
+            if prefix is not None:
+                prefix_id = self._prefix_ids.get(prefix, 0)
+                if not prefix_id:
+                    manifest.meta['prefixes'].append(prefix)
+                    prefix_id = self._prefix_ids[prefix] = len(manifest.meta['prefixes'])
+            manifest.add(rel_path, size=st.st_size, mtime=st.st_mtime_ns, prefix=prefix_id)
+    
+    def _forget(self, rel_path: str, is_dir: bool = False) -> None:
+        """Drop a file, or a whole directory, from the manifest."""
+        manifest = self.manifest
+        with self._manifest_lock:
+            if is_dir:
+                manifest.remove_trees([rel_path])
+                self._dir_state.remove_trees([rel_path])
+            else:
+                manifest.remove(rel_path)
+    
+    def _sync_one(self, source_file: Path, target_file: Path, create_parents: bool = True,
+                  original: Optional[str] = None) -> Tuple[str, int, int, Optional[str]]:
+        """
+        Write one source file to its target path.
+        .strm files are converted, other files are copied as-is.
+        Raises on failure; callers count the error.
+        
+        Args:
+            source_file: Source file
+            target_file: Target file
+            create_parents: Create the target's parent directories first;
+                            full syncs create each directory once instead
+            original: Content of a .strm source already read for another
+                      target; it is not read again (and counts 0 bytes read)
+        
+        Returns:
+            Tuple of (phase, bytes read, bytes written, URL prefix) where
+            phase is 'convert' or 'copy' and the prefix is None for copies
+        """
+        if source_file.suffix.lower() == '.strm':
+            # Convert and write .strm file
+            start = time.perf_counter()
+            bytes_read = 0
+            if original is None:
+                original = self.converter.read_file(source_file)
+                bytes_read = len(original.encode('utf-8'))
+            content = self.converter.convert_text(
+                original,
+                self.search_string,
+                self.replacement_string
+            )
+            converted = time.perf_counter()
+            self.converter.write_converted_file(target_file, content, create_parents=create_parents)
+            bytes_written = len(content.encode('utf-8'))
+            throttle.charge(self.record_id, ops=1, nbytes=bytes_read + bytes_written)
+            metrics.CONVERT_SECONDS.observe(converted - start, record=self.record_id)
+            metrics.WRITE_SECONDS.observe(time.perf_counter() - converted, record=self.record_id)
+            metrics.FILES_CONVERTED.inc(record=self.record_id)
+            change_feed.record(self.record_id, 'write', target_file)
+            self._feed_downstream(target_file, content)
+            return 'convert', bytes_read, bytes_written, _strm_prefix(original)
+        else:
+            # Copy other files as-is
+            start = time.perf_counter()
+            size = source_file.stat().st_size
+            if create_parents:
+                target_file.parent.mkdir(parents=True, exist_ok=True)
+            if throttle.limited(self.record_id):
+                # Charged chunk by chunk so a large file cannot burst past the limit
+                throttle.copy_file(self.record_id, source_file, target_file)
+            else:
+                shutil.copy2(source_file, target_file)
+            metrics.WRITE_SECONDS.observe(time.perf_counter() - start, record=self.record_id)
+            metrics.FILES_COPIED.inc(record=self.record_id)
+            change_feed.record(self.record_id, 'write', target_file)
+            self._feed_downstream(target_file)
+            return 'copy', size, size, None
+    
+    def _count_error(self, stats: Dict[str, int], operation: str) -> None:
+        stats['errors'] += 1
+        metrics.ERRORS.inc(record=self.record_id, operation=operation)
     
-    def sync_all(self) -> Dict[str, int]:
+    def sync_all(self, sweep: bool = False, resume: bool = True,
+                 order: Optional[str] = None) -> Dict[str, Any]:
         """
         Perform full synchronization of source to target folder.
         All files are synced, but only .strm files are converted.
         
+        Directories whose mtime has not changed since they were last listed
+        are skipped (their files counted as unchanged), except once every
+        sweep_interval seconds, which catches files edited in place.
+        
+        Progress is checkpointed every checkpoint_interval seconds. If a
+        sync was interrupted (process restart, cancel()), the next one skips
+        the directories it had already applied and carries over its counters;
+        changes made meanwhile in those directories are left to the sync after.
+        
+        With order 'recent', subtrees holding the newest directories are
+        synced first, so recently added content reaches the target early.
+        Such a sync does not resume from a checkpoint (there is no stable
+        walk order to resume in); an interrupted one starts over, skipping
+        the files already written.
+        
+        Args:
+            sweep: List and stat every directory regardless of its mtime
+            resume: Continue an interrupted sync from its checkpoint;
+                    False discards the checkpoint and starts over
+            order: 'name' or 'recent' (default: sync_order)
+        
         Returns:
-            Dictionary with sync statistics
+            Dictionary with sync statistics, including the duration, bytes
+            read/written, files/sec and a per-phase breakdown under 'phases'.
+            'resumed_from' is set when a checkpoint was resumed, 'cancelled'
+            when the sync was stopped by cancel(), 'seeded' when the targets
+            were empty and filled by _seed
         """
         stats = {
             'created': 0,
             'updated': 0,
+            'unchanged': 0,
             'deleted': 0,
-            'errors': 0
+            'errors': 0,
+            'dirs_pruned': 0
         }
-        
+        with self._sync_lock:
+            timer = SyncTimer()
+            try:
+                # Background work: charged to the record's and the global I/O
+                # limits, and scheduled after live events (and catch-up, if this
+                # is not one)
+                with throttle.background(), scheduler.work_class('bulk', override=False):
+                    self._sync_all(stats, timer, sweep, resume, order or self.sync_order)
+            finally:
+                self._cancel.clear()
+                self.save_state()
+                timer.finish(stats)
+                metrics.SYNC_DURATION.observe(stats['duration'], record=self.record_id)
+                print(format_summary(self.record_id, stats))
+        return stats
+    
+    def _sync_all(self, stats: Dict[str, Any], timer: SyncTimer, sweep: bool = False,
+                  resume: bool = True, order: str = DEFAULT_SYNC_ORDER) -> None:
+        """Full synchronization body; fills in stats."""
         if not self.source_folder.exists():
-            # If source folder doesn't exist, delete entire target folder structure
-            if self.target_folder.exists():
-                try:
-                    # Count all files before deletion
-                    deleted_count = sum(1 for _ in self.target_folder.rglob("*") if _.is_file())
-                    shutil.rmtree(self.target_folder)
-                    stats['deleted'] = deleted_count
-                except Exception as e:
-                    print(f"Error deleting target folder: {e}")
-                    stats['errors'] += 1
-            return stats
-        
-        # Get all files in source folder (recursive, excluding directories)
-        source_files = [f for f in self.source_folder.rglob("*") if f.is_file()]
-        source_relative_paths = {
-            str(f.relative_to(self.source_folder)): f 
-            for f in source_files
-        }
+            self._clear_checkpoint()
+            for target in self._targets():
+                target._delete_target(stats, timer)
+            return
         
-        # Get all files in target folder (recursive, excluding directories)
-        target_files = []
-        if self.target_folder.exists():
-            target_files = [f for f in self.target_folder.rglob("*") if f.is_file()]
-        target_relative_paths = {
-            str(f.relative_to(self.target_folder)): f 
-            for f in target_files
-        }
+        # Nothing to compare against or delete: fill empty targets in bulk
+        if self.seed_workers > 0 and all(target._target_empty() for target in self._targets()):
+            self._clear_checkpoint()
+            self._seed(stats, timer, self._recency_keys(timer, True) if order == 'recent' else None)
+            return
         
-        # Process source files (create/update)
-        for rel_path, source_file in source_relative_paths.items():
-            target_file = self.target_folder / rel_path
+        # Recency order has no stable position to resume from
+        recent = order == 'recent'
+        rules = self._checkpoint_fingerprint()
+        cursor = None
+        checkpoint = self._load_checkpoint() if resume and not recent else None
+        if checkpoint is not None:
+            cursor = tuple(checkpoint['cursor'])
+            sweep = sweep or checkpoint.get('sweep', False)
+            for key in CHECKPOINT_COUNTERS:
+                stats[key] += checkpoint['stats'].get(key, 0)
+            stats['resumed_from'] = os.path.join(*cursor) if cursor else ''
+            print(f"Resuming sync of {self.record_id or self.source_folder} "
+                  f"after '{stats['resumed_from']}'")
+        elif not resume:
+            self._clear_checkpoint()
+        
+        # The walk is pruned by this target's directory state; an extra target
+        # added since the last sync has nothing yet, so every directory is listed
+        if any(len(extra.manifest) == 0 for extra in self.extra_targets) and len(self.manifest):
+            sweep = True
+        
+        recency = self._recency_keys(timer, sweep) if recent else None
+        
+        # The cursor only advances while every directory so far succeeded,
+        # so a resumed sync retries failed directories
+        advancing = not recent
+        completed = False
+        last_checkpoint = time.monotonic()
+        try:
+            # Each directory is diffed and applied before the walk moves on,
+            # so memory stays bounded by tree depth and writes start immediately
+            for diff in self._iter_diffs(timer, sweep=sweep, record=True, resume_after=cursor,
+                                         recency=recency):
+                # Extra targets reuse this directory's source listing and .strm contents
+                contents: Optional[Dict[str, str]] = {} if self.extra_targets else None
+                with profiling.profiled():
+                    self._apply_diff(diff, stats, timer, contents)
+                    for extra in self.extra_targets:
+                        extra_diff = extra._target_diff(diff, timer)
+                        extra._apply_diff(extra_diff, stats, timer, contents)
+                        # Keeps the directory unpruned and the cursor in place until all targets succeed
+                        diff.failed = diff.failed or extra_diff.failed
+                if diff.failed:
+                    advancing = False
+                elif advancing:
+                    cursor = tuple(diff.rel_dir.split(os.sep)) if diff.rel_dir else ()
+                if self._cancel.is_set():
+                    stats['cancelled'] = True
+                    print(f"Sync of {self.record_id or self.source_folder} cancelled")
+                    break
+                if time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+                    if recent:
+                        # No position to save, but what was written is not redone
+                        self.save_state()
+                    else:
+                        self._save_checkpoint(cursor, stats, sweep, rules)
+                    last_checkpoint = time.monotonic()
+            else:
+                completed = True
+        finally:
+            if completed:
+                self._clear_checkpoint()
+            else:
+                self._save_checkpoint(cursor, stats, sweep, rules)
+    
+    def _delete_target(self, stats: Dict[str, Any], timer: SyncTimer) -> None:
+        """Delete the whole target folder and forget its state (the source is gone)."""
+        with self._manifest_lock:
+            self.manifest.clear()
+            self.dir_state.clear()
+        # If source folder doesn't exist, delete entire target folder structure
+        if self.target_folder.exists():
             try:
-                # Check if it's a .strm file - convert it
-                if source_file.suffix.lower() == '.strm':
-                    # Convert and write .strm file
-                    content = self.converter.convert_file(
-                        source_file, 
-                        self.search_string, 
-                        self.replacement_string
-                    )
-                    self.converter.write_converted_file(target_file, content)
-                else:
-                    # Copy other files as-is
-                    target_file.parent.mkdir(parents=True, exist_ok=True)
-                    shutil.copy2(source_file, target_file)
-                
-                if target_file.exists():
-                    stats['updated'] += 1
-                else:
+                # Count all files before deletion
+                with timer.phase('delete'):
+                    deleted_count = self._count_files(str(self.target_folder))
+                    throttle.charge(self.record_id, ops=deleted_count)
+                    with scheduler.slot():
+                        shutil.rmtree(self.target_folder)
+                change_feed.record(self.record_id, 'delete', self.target_folder)
+                timer.add_items('delete', deleted_count)
+                stats['deleted'] += deleted_count
+                metrics.FILES_DELETED.inc(deleted_count, record=self.record_id)
+            except Exception as e:
+                print(f"Error deleting target folder: {e}")
+                self._count_error(stats, 'delete')
+    
+    def _target_empty(self) -> bool:
+        """Whether the target folder is missing or has no entries."""
+        try:
+            with os.scandir(self.target_folder) as it:
+                return next(it, None) is None
+        except FileNotFoundError:
+            return True
+        except OSError:
+            return False
+    
+    def _seed(self, stats: Dict[str, Any], timer: SyncTimer,
+              recency: Optional[Dict[str, int]] = None) -> None:
+        """
+        Fill empty targets: walk the source once, creating each target
+        directory as it is reached (parents come first in pre-order), and
+        hand the files to seed_workers threads that convert/copy them with
+        no target listing, existence checks or delete phase.
+        
+        Directory state is recorded with mtime 0 and the mtimes are only
+        stored once every file was written, so a seed that fails or is
+        cancelled part-way leaves nothing pruned; the next sync (the target
+        is no longer empty) lists everything and skips what was written.
+        """
+        targets = self._targets()
+        started = time.time_ns()
+        for target in targets:
+            with target._manifest_lock:
+                target.manifest.clear()
+                target.dir_state.clear()
+        print(f"Seeding empty target(s) of {self.record_id or self.source_folder} "
+              f"with {self.seed_workers} worker(s)")
+        stats['seeded'] = True
+        
+        dir_mtimes: List[Tuple[str, int]] = []
+        pending: Set[Future] = set()
+        failed = False
+        
+        def collect(done: Iterable[Future]) -> None:
+            nonlocal failed
+            for future in done:
+                bytes_read, results = future.result()
+                timer.bytes_read += bytes_read
+                for phase, seconds, file_read, file_written in results:
+                    if phase is None:
+                        self._count_error(stats, 'write')
+                        failed = True
+                        continue
+                    timer.add(phase, seconds, 1)
+                    timer.bytes_read += file_read
+                    timer.bytes_written += file_written
                     stats['created'] += 1
+        
+        work_class = scheduler.current_class()
+        
+        def init_worker() -> None:
+            throttle.mark_background()
+            scheduler.set_class(work_class)
+        
+        executor = ThreadPoolExecutor(max_workers=self.seed_workers, thread_name_prefix='seed',
+                                      initializer=init_worker)
+        try:
+            stack = ['']
+            while stack:
+                if self._cancel.is_set():
+                    stats['cancelled'] = True
+                    print(f"Sync of {self.record_id or self.source_folder} cancelled")
+                    break
+                rel_dir = stack.pop()
+                source_dir = os.path.join(str(self.source_folder), rel_dir) if rel_dir else str(self.source_folder)
+                with timer.phase('source_scan'):
+                    try:
+                        mtime = os.stat(source_dir).st_mtime_ns
+                    except OSError:
+                        mtime = 0
+                    files, dirs, _ = self._scan_dir(source_dir)
+                timer.add_items('source_scan', len(files))
+                
+                with timer.phase('mkdir'):
+                    for target in targets:
+                        target_dir = os.path.join(str(target.target_folder), rel_dir)
+                        try:
+                            os.makedirs(target_dir, exist_ok=True)
+                        except OSError as e:
+                            print(f"Error creating directory {target_dir}: {e}")
+                            self._count_error(stats, 'write')
+                            failed = True
+                timer.add_items('mkdir', len(targets))
+                with self._manifest_lock:
+                    self.dir_state.add(os.path.join(rel_dir, _DIR_ROW), mtime=0,
+                                       entries=len(files), swept=started)
+                dir_mtimes.append((rel_dir, mtime))
+                
+                for entry in files:
+                    pending.add(executor.submit(self._seed_file, entry, os.path.join(rel_dir, entry.name)))
+                    if len(pending) >= self.seed_workers * _SEED_QUEUE_PER_WORKER:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+                # Push in reverse so subdirectories are visited in sorted (or recency) order
+                for name in reversed(self._child_order(rel_dir, [entry.name for entry in dirs], recency)):
+                    stack.append(os.path.join(rel_dir, name) if rel_dir else name)
+        finally:
+            # A cancelled seed drops the files not started yet
+            executor.shutdown(wait=True, cancel_futures=bool(stats.get('cancelled')))
+            collect(future for future in pending if not future.cancelled())
+        
+        if failed or stats.get('cancelled'):
+            return
+        with self._manifest_lock:
+            for rel_dir, mtime in dir_mtimes:
+                if mtime and mtime <= started - _MTIME_SETTLE_NS:
+                    row = self.dir_state.find(os.path.join(rel_dir, _DIR_ROW))
+                    self.dir_state.set(row, 'mtime', mtime)
+    
+    def _seed_file(self, entry: os.DirEntry, rel_path: str) -> Tuple[int, List[_SeedResult]]:
+        """
+        Write one source file to every target; runs on a seeding worker.
+        
+        Returns:
+            Tuple of (bytes read once for all targets, one result per target)
+        """
+        source_file = Path(entry.path)
+        results: List[_SeedResult] = []
+        try:
+            st = entry.stat()
+            original = None
+            if self.extra_targets and entry.name.lower().endswith('.strm'):
+                original = self.converter.read_file(source_file)
+        except Exception as e:
+            print(f"Error processing {source_file}: {e}")
+            return 0, [(None, 0.0, 0, 0)]
+        for target in self._targets():
+            start = time.perf_counter()
+            try:
+                # Per-file, so a CPU capture started mid-sync still sees the work
+                with profiling.profiled(), scheduler.slot():
+                    phase, bytes_read, bytes_written, prefix = target._sync_one(
+                        source_file, target.target_folder / rel_path, create_parents=False,
+                        original=original)
+                target._remember(rel_path, st, prefix)
+                results.append((phase, time.perf_counter() - start, bytes_read, bytes_written))
             except Exception as e:
                 print(f"Error processing {source_file}: {e}")
-                stats['errors'] += 1
+                results.append((None, 0.0, 0, 0))
+        return (len(original.encode('utf-8')) if original is not None else 0), results
+    
+    @staticmethod
+    def _scan_dir(path: str) -> Tuple[List[os.DirEntry], List[os.DirEntry], List[str]]:
+        """
+        List one directory.
+        
+        Returns:
+            Tuple of (files, subdirectories, names of symlinked directories),
+            files and subdirectories sorted by name. A missing directory
+            yields empty lists.
+        """
+        files = []
+        dirs = []
+        linked_dirs = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            dirs.append(entry)
+                        elif entry.is_file():
+                            files.append(entry)
+                        elif entry.is_dir():
+                            # Symlinked directories are kept but not descended into
+                            linked_dirs.append(entry.name)
+                    except OSError:
+                        continue
+        except (FileNotFoundError, NotADirectoryError):
+            return files, dirs, linked_dirs
+        files.sort(key=lambda e: e.name)
+        dirs.sort(key=lambda e: e.name)
+        return files, dirs, linked_dirs
+    
+    def _recency_keys(self, timer: SyncTimer, sweep: bool) -> Dict[str, int]:
+        """
+        Walk the source directories (not files) and return, for each, the
+        newest mtime in its subtree. A directory's mtime changes when an
+        entry is added, removed or renamed in it, so ordering siblings by
+        this key puts the subtrees with new content first.
+        
+        Directories whose recorded state is current are not listed, their
+        subdirectories come from the state as in an incremental sync; each
+        directory is still stat'ed.
+        """
+        source_root = str(self.source_folder)
+        prune = not sweep and self.sweep_interval > 0
+        swept_after = time.time_ns() - int(self.sweep_interval * 10**9)
+        keys: Dict[str, int] = {}
+        # (directory, parent) in pre-order; reversed, children come before their parents
+        parents: List[Tuple[str, str]] = []
+        stack: List[Tuple[str, Optional[str]]] = [('', None)]
+        with timer.phase('order_scan'):
+            while stack:
+                rel_dir, parent = stack.pop()
+                source_dir = os.path.join(source_root, rel_dir) if rel_dir else source_root
+                try:
+                    mtime = os.stat(source_dir).st_mtime_ns
+                except OSError:
+                    continue
+                keys[rel_dir] = mtime
+                if parent is not None:
+                    parents.append((rel_dir, parent))
+                pruned = self._pruned_diff(rel_dir, mtime, swept_after) if prune else None
+                if pruned is not None:
+                    names = pruned.subdirs
+                else:
+                    names = [entry.name for entry in self._scan_dir(source_dir)[1]]
+                for name in names:
+                    stack.append((os.path.join(rel_dir, name) if rel_dir else name, rel_dir))
+            for rel_dir, parent in reversed(parents):
+                if keys[rel_dir] > keys[parent]:
+                    keys[parent] = keys[rel_dir]
+        timer.add_items('order_scan', len(keys))
+        return keys
+    
+    @staticmethod
+    def _count_files(path: str) -> int:
+        """Count all files below a directory."""
+        return sum(len(filenames) for _, _, filenames in os.walk(path))
+    
+    def _iter_diffs(self, timer: Optional[SyncTimer] = None, sweep: bool = True,
+                    record: bool = False,
+                    resume_after: Optional[Tuple[str, ...]] = None,
+                    recency: Optional[Dict[str, int]] = None) -> Iterator['_DirDiff']:
+        """
+        Walk source and target together in sorted pre-order and yield the
+        differences one directory at a time.
         
-        # Delete files that no longer exist in source
-        for rel_path, target_file in target_relative_paths.items():
-            if rel_path not in source_relative_paths:
+        The sorted file listings of each directory pair are merge-joined, so
+        nothing beyond the directories on the current path (and their
+        not-yet-visited siblings) is held in memory. Subdirectories are only
+        listed after the caller has finished with the current diff.
+        
+        Args:
+            timer: Timer to record scan phases in
+            sweep: List every directory. Otherwise a directory whose mtime
+                   matches its recorded state is yielded with pruned set and
+                   no entries, and its subdirectories come from the state
+            record: Record each listed directory's state once the caller
+                    has applied its diff
+            resume_after: Path components of the last directory already
+                          applied; it and everything before it in walk
+                          order is skipped. Pre-order over sorted names is
+                          tuple order, so only the directories on the path
+                          down to it are listed, to find what follows
+            recency: Newest mtime per subtree (see _recency_keys); siblings
+                     are then visited newest first instead of by name.
+                     Still a pre-order walk, so parents come before children
+        """
+        if timer is None:
+            timer = SyncTimer()
+        source_root = str(self.source_folder)
+        target_root = str(self.target_folder)
+        prune = not sweep and self.sweep_interval > 0
+        started = time.time_ns()
+        swept_after = started - int(self.sweep_interval * 10**9)
+        # Listed directories whose subtree is still being walked: (rel_dir, mtime, diff)
+        open_dirs: List[Tuple[str, int, _DirDiff]] = []
+        stack = ['']
+        while stack:
+            rel_dir = stack.pop()
+            source_dir = os.path.join(source_root, rel_dir) if rel_dir else source_root
+            target_dir = os.path.join(target_root, rel_dir) if rel_dir else target_root
+            if resume_after is not None:
+                key = tuple(rel_dir.split(os.sep)) if rel_dir else ()
+                if key <= resume_after:
+                    if resume_after[:len(key)] == key:
+                        with timer.phase('source_scan'):
+                            _, source_dirs, _ = self._scan_dir(source_dir)
+                        for entry in reversed(source_dirs):
+                            if key + (entry.name,) >= resume_after[:len(key) + 1]:
+                                stack.append(os.path.join(rel_dir, entry.name) if rel_dir else entry.name)
+                    continue
+            if record:
+                self._close_dirs(open_dirs, rel_dir, started)
+            
+            with timer.phase('source_scan'):
                 try:
-                    target_file.unlink()
-                    stats['deleted'] += 1
+                    mtime = os.stat(source_dir).st_mtime_ns
+                except OSError:
+                    mtime = 0
+                pruned = self._pruned_diff(rel_dir, mtime, swept_after) if prune else None
+                if pruned is None:
+                    source_files, source_dirs, linked_dirs = self._scan_dir(source_dir)
+            if pruned is not None:
+                yield pruned
+                for name in reversed(self._child_order(rel_dir, pruned.subdirs, recency)):
+                    stack.append(os.path.join(rel_dir, name) if rel_dir else name)
+                continue
+            timer.add_items('source_scan', len(source_files))
+            diff = self._build_diff(rel_dir, target_dir, source_files,
+                                    [entry.name for entry in source_dirs], linked_dirs, timer)
+            
+            yield diff
+            
+            if record:
+                self._record_dir(diff, started)
+                open_dirs.append((rel_dir, mtime, diff))
+            # Push in reverse so subdirectories are visited in sorted order
+            for name in reversed(self._child_order(rel_dir, diff.subdirs, recency)):
+                stack.append(os.path.join(rel_dir, name) if rel_dir else name)
+        if record:
+            self._close_dirs(open_dirs, None, started)
+    
+    @staticmethod
+    def _child_order(rel_dir: str, names: List[str], recency: Optional[Dict[str, int]]) -> List[str]:
+        """Subdirectory names in visiting order: sorted, or newest subtree first."""
+        if recency is None:
+            return names
+        # Directories created since the recency walk sort first
+        return sorted(names, key=lambda name: -recency.get(
+            os.path.join(rel_dir, name) if rel_dir else name, time.time_ns()))
+    
+    def _build_diff(self, rel_dir: str, target_dir: str, source_files: List[os.DirEntry],
+                    subdirs: List[str], linked_dirs: List[str], timer: SyncTimer) -> '_DirDiff':
+        """List one target directory and diff it against its source listing."""
+        with timer.phase('target_scan'):
+            target_exists = os.path.isdir(target_dir)
+            target_files, target_dirs, _ = self._scan_dir(target_dir) if target_exists else ([], [], [])
+        timer.add_items('target_scan', len(target_files))
+        
+        diff = _DirDiff(rel_dir, target_exists)
+        
+        # Merge-join the sorted file listings
+        i = j = 0
+        while i < len(source_files) or j < len(target_files):
+            if j >= len(target_files) or (i < len(source_files) and source_files[i].name < target_files[j].name):
+                diff.writes.append((source_files[i], False))
+                i += 1
+            elif i >= len(source_files) or target_files[j].name < source_files[i].name:
+                diff.deletes.append(target_files[j].name)
+                j += 1
+            else:
+                diff.writes.append((source_files[i], True))
+                i += 1
+                j += 1
+        
+        # Target directories with no source counterpart (this handles empty dirs too)
+        keep = set(subdirs)
+        keep.update(linked_dirs)
+        diff.orphan_dirs = [entry.name for entry in target_dirs if entry.name not in keep]
+        diff.subdirs = subdirs
+        diff.linked_dirs = linked_dirs
+        return diff
+    
+    def _target_diff(self, source_diff: '_DirDiff', timer: SyncTimer) -> '_DirDiff':
+        """
+        Diff of an extra target for a directory another target's walk just
+        yielded, reusing its source listing; only this target is listed.
+        """
+        rel_dir = source_diff.rel_dir
+        if source_diff.pruned >= 0:
+            diff = _DirDiff(rel_dir, True)
+            diff.pruned = source_diff.pruned
+            diff.subdirs = source_diff.subdirs
+            return diff
+        target_root = str(self.target_folder)
+        target_dir = os.path.join(target_root, rel_dir) if rel_dir else target_root
+        return self._build_diff(rel_dir, target_dir, [entry for entry, _ in source_diff.writes],
+                                source_diff.subdirs, source_diff.linked_dirs, timer)
+    
+    def _pruned_diff(self, rel_dir: str, mtime: int, swept_after: int) -> Optional['_DirDiff']:
+        """A pruned diff for rel_dir if its recorded state is still current, else None."""
+        if not mtime:
+            return None
+        dir_state = self.dir_state
+        with self._manifest_lock:
+            row = dir_state.find(os.path.join(rel_dir, _DIR_ROW))
+            if (row < 0 or dir_state.get(row, 'mtime') != mtime
+                    or dir_state.get(row, 'swept') < swept_after):
+                return None
+            diff = _DirDiff(rel_dir, True)
+            diff.pruned = dir_state.get(row, 'entries')
+            diff.subdirs = sorted(
+                name for name in dir_state.subdirs(rel_dir)
+                if os.path.join(rel_dir, name, _DIR_ROW) in dir_state
+            )
+        return diff
+    
+    def _record_dir(self, diff: '_DirDiff', swept: int) -> None:
+        """
+        Record a just-listed directory. Its mtime is left at 0 (always list)
+        until its whole subtree has been walked, see _close_dirs.
+        """
+        rel_dir = diff.rel_dir
+        dir_state = self.dir_state
+        manifest = self.manifest
+        with self._manifest_lock:
+            # Forget subdirectories that are gone from the source
+            keep = set(diff.subdirs)
+            gone = [
+                os.path.join(rel_dir, name) for name in dir_state.subdirs(rel_dir)
+                if name not in keep and os.path.join(rel_dir, name, _DIR_ROW) in dir_state
+            ]
+            if gone:
+                dir_state.remove_trees(gone)
+                manifest.remove_trees(gone)
+            dir_state.add(os.path.join(rel_dir, _DIR_ROW), mtime=0,
+                          entries=len(diff.writes), swept=swept)
+    
+    def _close_dirs(self, open_dirs: List[Tuple[str, int, '_DirDiff']],
+                    next_dir: Optional[str], started: int) -> None:
+        """
+        Store the mtime of every open directory whose subtree is complete,
+        i.e. that is not an ancestor of next_dir (None closes all). A sync
+        interrupted part-way leaves the unfinished directories at mtime 0,
+        so none of their unvisited subdirectories can be pruned away.
+        """
+        while open_dirs:
+            rel_dir, mtime, diff = open_dirs[-1]
+            if next_dir is not None and (rel_dir == '' or next_dir.startswith(rel_dir + os.sep)):
+                return
+            open_dirs.pop()
+            if diff.failed or not mtime or mtime > started - _MTIME_SETTLE_NS:
+                continue
+            with self._manifest_lock:
+                row = self.dir_state.find(os.path.join(rel_dir, _DIR_ROW))
+                if row >= 0:
+                    self.dir_state.set(row, 'mtime', mtime)
+    
+    def _diff_ops(self, diff: '_DirDiff') -> Tuple[List[_Op], int]:
+        """
+        Turn one directory's differences into the operations that apply
+        them, in execution order: deletes and orphan tree removals first (a
+        name freed here may be taken by a new directory further on), then
+        the directory itself, then the file writes in source inode order,
+        which on most file systems is close to on-disk order and keeps reads
+        sequential. Walking directories in pre-order puts every mkdir before
+        the writes below it. Only stats source files; nothing is written.
+        
+        Returns:
+            Tuple of (operations, number of files unchanged); an operation's
+            name is '' for the directory's own mkdir
+        """
+        ops: List[_Op] = []
+        if diff.pruned >= 0:
+            return ops, diff.pruned
+        ops.extend(('delete', name, None, True, None) for name in diff.deletes)
+        ops.extend(('rmdir', name, None, True, None) for name in diff.orphan_dirs)
+        if diff.writes and not diff.target_exists:
+            ops.append(('mkdir', '', None, False, None))
+        
+        unchanged = 0
+        writes = []
+        for entry, existed in diff.writes:
+            try:
+                st = entry.stat()
+            except OSError:
+                st = None  # Vanished since the listing; the write reports the error
+            # Target already written from this exact source file
+            if existed and st is not None and self._unchanged(os.path.join(diff.rel_dir, entry.name), st):
+                unchanged += 1
+                continue
+            kind = 'convert' if entry.name.lower().endswith('.strm') else 'copy'
+            writes.append((kind, entry.name, entry, existed, st))
+        writes.sort(key=lambda op: op[2].inode())
+        ops.extend(writes)
+        return ops, unchanged
+    
+    def _apply_diff(self, diff: '_DirDiff', stats: Dict[str, Any], timer: SyncTimer,
+                    contents: Optional[Dict[str, str]] = None) -> None:
+        """
+        Apply one directory's differences to the target by executing the
+        operations _diff_ops() plans for it.
+        
+        Args:
+            contents: .strm file name -> content, shared by the targets a
+                      directory is applied to so each file is read once
+        """
+        if diff.pruned >= 0:
+            stats['unchanged'] += diff.pruned
+            stats['dirs_pruned'] += 1
+            return
+        target_dir = os.path.join(str(self.target_folder), diff.rel_dir) if diff.rel_dir else str(self.target_folder)
+        
+        manifest = self.manifest
+        ops, unchanged = self._diff_ops(diff)
+        stats['unchanged'] += unchanged
+        
+        for kind, name, entry, existed, st in ops:
+            if kind == 'delete':
+                # Delete files that no longer exist in source
+                target_file = os.path.join(target_dir, name)
+                with self._manifest_lock:
+                    manifest.remove(os.path.join(diff.rel_dir, name))
+                with timer.phase('delete'):
+                    try:
+                        throttle.charge(self.record_id, ops=1)
+                        with scheduler.slot():
+                            os.unlink(target_file)
+                        change_feed.record(self.record_id, 'delete', target_file)
+                        stats['deleted'] += 1
+                        timer.add_items('delete', 1)
+                        metrics.FILES_DELETED.inc(record=self.record_id)
+                    except Exception as e:
+                        print(f"Error deleting {target_file}: {e}")
+                        self._count_error(stats, 'delete')
+                        diff.failed = True
+            elif kind == 'rmdir':
+                # Remove folders that no longer exist in source
+                orphan = os.path.join(target_dir, name)
+                with self._manifest_lock:
+                    manifest.remove_trees([os.path.join(diff.rel_dir, name)])
+                with timer.phase('orphan_cleanup'):
+                    try:
+                        deleted_count = self._count_files(orphan)
+                        throttle.charge(self.record_id, ops=deleted_count + 1)
+                        with scheduler.slot():
+                            shutil.rmtree(orphan, ignore_errors=True)
+                        change_feed.record(self.record_id, 'delete', orphan)
+                        stats['deleted'] += deleted_count
+                        timer.add_items('orphan_cleanup', 1)
+                        metrics.FILES_DELETED.inc(deleted_count, record=self.record_id)
+                    except Exception as e:
+                        print(f"Error removing orphaned directory {orphan}: {e}")
+                        self._count_error(stats, 'delete')
+                        diff.failed = True
+            elif kind == 'mkdir':
+                # Create the target directory once instead of once per file
+                try:
+                    os.makedirs(target_dir, exist_ok=True)
+                except Exception as e:
+                    print(f"Error creating directory {target_dir}: {e}")
+                    self._count_error(stats, 'write')
+                    diff.failed = True
+                    return
+            else:
+                # Process source files (create/update)
+                source_file = Path(entry.path)
+                target_file = Path(target_dir, name)
+                try:
+                    if st is None:
+                        st = entry.stat()
+                    start = time.perf_counter()
+                    original = None
+                    if contents is not None and kind == 'convert':
+                        original = contents.get(name)
+                        if original is None:
+                            original = contents[name] = self.converter.read_file(source_file)
+                            timer.bytes_read += len(original.encode('utf-8'))
+                    # Per-file, so a CPU capture started mid-sync still sees the work
+                    with profiling.profiled(), scheduler.slot():
+                        phase, bytes_read, bytes_written, prefix = self._sync_one(
+                            source_file, target_file, create_parents=False, original=original)
+                    timer.add(phase, time.perf_counter() - start, 1)
+                    timer.bytes_read += bytes_read
+                    timer.bytes_written += bytes_written
+                    self._remember(os.path.join(diff.rel_dir, name), st, prefix)
+                    
+                    if existed:
+                        stats['updated'] += 1
+                    else:
+                        stats['created'] += 1
                 except Exception as e:
-                    print(f"Error deleting {target_file}: {e}")
-                    stats['errors'] += 1
+                    print(f"Error processing {source_file}: {e}")
+                    self._count_error(stats, 'write')
+                    diff.failed = True
+    
+    def plan(self, max_operations: int = 0) -> Dict[str, Any]:
+        """
+        Report what sync_all would do without touching the target folder:
+        the operations are planned exactly as a sync would plan them, but
+        not executed.
         
-        # Remove folders that no longer exist in source (this handles empty dirs too)
-        self._remove_orphaned_folders(stats)
+        Args:
+            max_operations: Also list up to this many operations, in
+                            execution order
         
-        return stats
+        Returns:
+            Dictionary with the number of files that would be created,
+            updated, skipped as unchanged and deleted, over all targets;
+            'operations' counts by kind; 'bytes_read'/'bytes_written'
+            estimated from source sizes; and with max_operations, an
+            'operation_list' of {'op', 'path', 'target', 'bytes'}
+        """
+        plan: Dict[str, Any] = {
+            'create': 0,
+            'update': 0,
+            'unchanged': 0,
+            'delete': 0,
+            'operations': {kind: 0 for kind in OP_KINDS},
+            'bytes_read': 0,
+            'bytes_written': 0,
+        }
+        if max_operations > 0:
+            plan['operation_list'] = []
+        
+        if not self.source_folder.exists():
+            for target in self._targets():
+                if target.target_folder.exists():
+                    plan['delete'] += self._count_files(str(target.target_folder))
+                    target._plan_op(plan, 'rmdir', '', 0, max_operations)
+            return plan
+        
+        timer = SyncTimer()
+        for source_diff in self._iter_diffs(timer, sweep=False):
+            for target in self._targets():
+                diff = source_diff if target is self else target._target_diff(source_diff, timer)
+                target._plan_diff(diff, plan, max_operations)
+        return plan
+    
+    def _plan_diff(self, diff: '_DirDiff', plan: Dict[str, Any], max_operations: int = 0) -> None:
+        """Add what applying one directory's diff would do to plan."""
+        ops, unchanged = self._diff_ops(diff)
+        plan['unchanged'] += unchanged
+        target_dir = self.target_folder / diff.rel_dir
+        for kind, name, entry, existed, st in ops:
+            size = st.st_size if st is not None else 0
+            if kind == 'delete':
+                plan['delete'] += 1
+            elif kind == 'rmdir':
+                plan['delete'] += self._count_files(str(target_dir / name))
+            elif kind != 'mkdir':
+                plan['update' if existed else 'create'] += 1
+                # Converted .strm files are about their source size
+                plan['bytes_read'] += size
+                plan['bytes_written'] += size
+            self._plan_op(plan, kind, os.path.join(diff.rel_dir, name) if name else diff.rel_dir, size,
+                          max_operations)
+    
+    def _plan_op(self, plan: Dict[str, Any], kind: str, rel_path: str, size: int,
+                 max_operations: int) -> None:
+        """Count one planned operation, and list it while the list has room."""
+        plan['operations'][kind] += 1
+        operation_list = plan.get('operation_list')
+        if operation_list is not None and len(operation_list) < max_operations:
+            operation_list.append({'op': kind, 'path': rel_path, 'target': str(self.target_folder),
+                                   'bytes': size if kind in ('convert', 'copy') else 0})
+    
+    def verify(self, repair: bool = False) -> Dict[str, Any]:
+        """
+        Check that the target matches the source using per-directory digests.
+        
+        Both trees are digested bottom-up over the (name, content hash) of
+        their files and the digests of their subdirectories. File hashes are
+        cached in state_dir and reused while size and mtime are unchanged.
+        The root digests are compared first and only subtrees whose digests
+        differ are descended into. Without repair nothing in the target is
+        written.
+        
+        Args:
+            repair: Bring each diverged directory back in sync
+            
+        Returns:
+            Report with 'in_sync', the root digests, the diverged directories
+            (missing, extra and mismatched files and extra subdirectories),
+            duration and per-phase timings, and with repair the
+            created/updated/deleted/errors counts of the repair. Extra
+            targets' reports are listed under 'targets'. 'cancelled' is
+            set when cancel() stopped the repair part way
+        """
+        if not repair:
+            return self._verify(repair)
+        # A repair writes the target like a full sync: never alongside one,
+        # and as throttled background work scheduled after live events
+        with self._sync_lock:
+            try:
+                with throttle.background(), scheduler.work_class('bulk', override=False):
+                    return self._verify(repair)
+            finally:
+                # A cancel meant for this repair must not stop the next full sync
+                self._cancel.clear()
+    
+    def _verify(self, repair: bool) -> Dict[str, Any]:
+        """Verification body; see verify."""
+        timer = SyncTimer()
+        report: Dict[str, Any] = {'files': 0, 'hashed': 0, 'read_errors': 0}
+        digests = {}
+        for side, root in (('source', self.source_folder), ('target', self.target_folder)):
+            previous = self._load_digests(side)
+            current = PathIndex(DIGEST_COLUMNS)
+            current.meta['rules'] = self._rules_fingerprint()
+            files_before = report['files']
+            with timer.phase(f'{side}_digest'):
+                digest = self._digest_tree(str(root), '', previous, current, side == 'source', report)
+            timer.add_items(f'{side}_digest', report['files'] - files_before)
+            report[f'{side}_digest'] = f'{digest & 0xFFFFFFFFFFFFFFFF:016x}'
+            digests[side] = current
+            del previous
+        
+        diverged: List[Dict[str, Any]] = []
+        stats = {'created': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0, 'errors': 0} if repair else None
+        if report['source_digest'] != report['target_digest']:
+            self._compare_tree('', digests['source'], digests['target'], diverged, stats, timer)
+        
+        if self.state_dir is not None:
+            try:
+                self.state_dir.mkdir(parents=True, exist_ok=True)
+                for side, index in digests.items():
+                    index.save(str(self.state_dir / f'digests_{side}.idx'))
+            except OSError as e:
+                print(f"Error saving digests for {self.record_id or self.source_folder}: {e}")
+        if repair:
+            self.save_state()
+            report.update(stats)
+            if self._cancel.is_set():
+                report['cancelled'] = True
+        
+        # Subtrees left unvisited by a cancelled repair may still differ
+        report['in_sync'] = not diverged and not report.get('cancelled')
+        report['repaired'] = repair and bool(diverged)
+        report['diverged'] = diverged
+        timer.finish(report)
+        print(f"[verify {self.record_id or '-'}] {report['duration']:.2f}s "
+              f"{'in sync' if not diverged else f'{len(diverged)} diverged dir(s)'}"
+              f"{' (repaired)' if report['repaired'] else ''}"
+              f"{' (cancelled)' if report.get('cancelled') else ''} "
+              f"files={report['files']} hashed={report['hashed']}")
+        if self.extra_targets:
+            # Extra targets are digested and compared one by one
+            report['targets'] = [extra.verify(repair=repair and not self._cancel.is_set())
+                                 for extra in self.extra_targets]
+            report['in_sync'] = report['in_sync'] and all(r['in_sync'] for r in report['targets'])
+        return report
+    
+    def _load_digests(self, side: str) -> PathIndex:
+        """Cached file hashes for one side; discarded when the rules changed."""
+        index = self._load_index(f'digests_{side}')
+        if index is None or index.meta.get('rules') != self._rules_fingerprint():
+            index = PathIndex(DIGEST_COLUMNS)
+        return index
+    
+    def _file_digest(self, path: str, name: str, st: os.stat_result, source: bool) -> int:
+        """
+        Hash of what a file's target copy should contain. .strm files hash
+        their text, converted first on the source side; other files are
+        copied with copy2, which keeps size and mtime, so those stand in
+        for the content.
+        """
+        if name.lower().endswith('.strm'):
+            content = self.converter.read_file(Path(path))
+            if source:
+                content = self.converter.convert_text(content, self.search_string, self.replacement_string)
+            return _hash64(b'strm\0' + content.encode('utf-8', 'surrogateescape'))
+        return _hash64(f'file\0{st.st_size}\0{st.st_mtime_ns // 10**9}'.encode('ascii'))
+    
+    def _digest_tree(self, root: str, rel_dir: str, previous: PathIndex, current: PathIndex,
+                     source: bool, counts: Dict[str, int]) -> int:
+        """
+        Digest one directory and everything below it.
+        
+        Returns:
+            The directory digest, or 0 if there are no files below it (the
+            sync never creates target directories for those)
+        """
+        path = os.path.join(root, rel_dir) if rel_dir else root
+        with profiling.profiled():
+            files, dirs, _ = self._scan_dir(path)
+            digest = hashlib.blake2b(digest_size=8)
+            empty = True
+            for entry in files:
+                rel_path = os.path.join(rel_dir, entry.name)
+                try:
+                    st = entry.stat()
+                    file_id = previous.find(rel_path)
+                    if (file_id >= 0 and previous.get(file_id, 'size') == st.st_size
+                            and previous.get(file_id, 'mtime') == st.st_mtime_ns):
+                        file_hash = previous.get(file_id, 'hash')
+                    else:
+                        file_hash = self._file_digest(entry.path, entry.name, st, source)
+                        counts['hashed'] += 1
+                except (OSError, ValueError) as e:
+                    # Left out of the digest, so the directory shows up as diverged
+                    print(f"Error hashing {entry.path}: {e}")
+                    counts['read_errors'] += 1
+                    continue
+                current.add(rel_path, size=st.st_size, mtime=st.st_mtime_ns, hash=file_hash)
+                digest.update(b'f' + entry.name.encode('utf-8', 'surrogateescape') + b'\0'
+                              + file_hash.to_bytes(8, 'little', signed=True))
+                counts['files'] += 1
+                empty = False
+        for entry in dirs:
+            child = self._digest_tree(root, os.path.join(rel_dir, entry.name), previous, current,
+                                      source, counts)
+            if child:
+                digest.update(b'd' + entry.name.encode('utf-8', 'surrogateescape') + b'\0'
+                              + child.to_bytes(8, 'little', signed=True))
+                empty = False
+        result = 0 if empty else int.from_bytes(digest.digest(), 'little', signed=True)
+        current.add(os.path.join(rel_dir, _DIR_ROW), hash=result)
+        return result
+    
+    @staticmethod
+    def _indexed_hash(index: PathIndex, rel_path: str) -> Optional[int]:
+        file_id = index.find(rel_path)
+        return index.get(file_id, 'hash') if file_id >= 0 else None
+    
+    def _compare_tree(self, rel_dir: str, source_digests: PathIndex, target_digests: PathIndex,
+                      diverged: List[Dict[str, Any]], stats: Optional[Dict[str, Any]],
+                      timer: SyncTimer) -> None:
+        """
+        Report (and with stats given, repair) the differences in a directory
+        whose digests differ, then descend into its mismatched subdirectories.
+        A cancelled repair stops here.
+        """
+        if stats is not None and self._cancel.is_set():
+            return
+        source_dir = os.path.join(str(self.source_folder), rel_dir) if rel_dir else str(self.source_folder)
+        target_dir = os.path.join(str(self.target_folder), rel_dir) if rel_dir else str(self.target_folder)
+        source_files, source_dirs, linked_dirs = self._scan_dir(source_dir)
+        target_files, target_dirs, _ = self._scan_dir(target_dir)
+        target_names = {entry.name for entry in target_files}
+        source_names = {entry.name for entry in source_files}
+        
+        writes = []
+        missing, mismatched = [], []
+        for entry in source_files:
+            rel_path = os.path.join(rel_dir, entry.name)
+            if entry.name not in target_names:
+                missing.append(entry.name)
+                writes.append((entry, False))
+            elif (self._indexed_hash(source_digests, rel_path) is None
+                    or self._indexed_hash(source_digests, rel_path) != self._indexed_hash(target_digests, rel_path)):
+                mismatched.append(entry.name)
+                writes.append((entry, True))
+        extra = [entry.name for entry in target_files if entry.name not in source_names]
+        
+        def dir_digest(index: PathIndex, name: str) -> int:
+            row = index.find(os.path.join(rel_dir, name, _DIR_ROW))
+            return index.get(row, 'hash') if row >= 0 else 0
+        
+        keep = {entry.name for entry in source_dirs}
+        keep.update(linked_dirs)
+        extra_dirs = [entry.name for entry in target_dirs
+                      if entry.name not in keep and dir_digest(target_digests, entry.name)]
+        
+        if missing or mismatched or extra or extra_dirs:
+            diverged.append({
+                'path': rel_dir or '.',
+                'counts': {'missing': len(missing), 'mismatched': len(mismatched),
+                           'extra': len(extra), 'extra_dirs': len(extra_dirs)},
+                'missing': missing[:MAX_REPORT_NAMES],
+                'mismatched': mismatched[:MAX_REPORT_NAMES],
+                'extra': extra[:MAX_REPORT_NAMES],
+                'extra_dirs': extra_dirs[:MAX_REPORT_NAMES],
+            })
+            if stats is not None:
+                diff = _DirDiff(rel_dir, os.path.isdir(target_dir))
+                diff.writes = writes
+                diff.deletes = extra
+                diff.orphan_dirs = extra_dirs
+                # The manifest was wrong about these, so they must not be skipped
+                for name in mismatched:
+                    self._forget(os.path.join(rel_dir, name))
+                self._apply_diff(diff, stats, timer)
+        
+        target_dir_names = {entry.name for entry in target_dirs}
+        for entry in source_dirs:
+            source_digest = dir_digest(source_digests, entry.name)
+            target_digest = dir_digest(target_digests, entry.name) if entry.name in target_dir_names else 0
+            if source_digest != target_digest:
+                self._compare_tree(os.path.join(rel_dir, entry.name), source_digests, target_digests,
+                                   diverged, stats, timer)
     
     def _remove_empty_dirs(self, dir_path: Path) -> None:
         """Recursively remove empty directories."""
@@ -114,64 +1712,14 @@ class FolderSync:
         except Exception:
             pass  # Ignore errors when removing directories
     
-    def _remove_orphaned_folders(self, stats: Dict[str, int]) -> None:
-        """Remove folders from target that don't exist in source."""
-        if not self.target_folder.exists():
-            return
-        
-        # Get ALL directories in source (including empty ones)
-        source_dirs = set()
-        if self.source_folder.exists():
-            # Walk through all directories in source
-            for item in self.source_folder.rglob("*"):
-                if item.is_dir():
-                    rel_path = str(item.relative_to(self.source_folder))
-                    source_dirs.add(rel_path)
-            # Also add the root (empty string represents the source folder itself)
-            source_dirs.add("")
-        
-        # Get all directories in target
-        target_dirs = set()
-        if self.target_folder.exists():
-            for item in self.target_folder.rglob("*"):
-                if item.is_dir():
-                    target_dirs.add(str(item.relative_to(self.target_folder)))
-            # Also add the root
-            target_dirs.add("")
-        
-        # Find directories in target that don't exist in source
-        orphaned_dirs = target_dirs - source_dirs
-        
-        # Remove orphaned directories (process deepest first)
-        sorted_orphaned = sorted(orphaned_dirs, key=lambda x: x.count('/') + x.count('\\'), reverse=True)
-        
-        for rel_dir in sorted_orphaned:
-            # Skip root directory
-            if rel_dir == "":
-                continue
-                
-            target_dir = self.target_folder / rel_dir
-            if target_dir.exists():
-                try:
-                    # Count all files in the orphaned directory before deletion
-                    all_files = [f for f in target_dir.rglob("*") if f.is_file()]
-                    deleted_count = len(all_files)
-                    
-                    # Remove the directory (only if it's orphaned, meaning it doesn't exist in source)
-                    # Use rmtree to handle any remaining files/subdirs
-                    shutil.rmtree(target_dir, ignore_errors=True)
-                    stats['deleted'] += deleted_count
-                except Exception as e:
-                    print(f"Error removing orphaned directory {target_dir}: {e}")
-                    stats['errors'] += 1
-    
-    def sync_file(self, source_file: Path) -> bool:
+    def sync_file(self, source_file: Path, original: Optional[str] = None) -> bool:
         """
-        Sync a single file from source to target.
+        Sync a single file from source to target and every extra target.
         .strm files are converted, other files are copied as-is.
         
         Args:
             source_file: Path to source file (can be absolute or relative to source_folder)
+            original: Content of a .strm source file, if already read
             
         Returns:
             True if successful, False otherwise
@@ -192,41 +1740,47 @@ class FolderSync:
             # Calculate relative path
             rel_path = source_file.relative_to(self.source_folder)
             target_file = self.target_folder / rel_path
-            
-            # Check if it's a .strm file - convert it
-            if source_file.suffix.lower() == '.strm':
-                # Convert and write .strm file
-                content = self.converter.convert_file(
-                    source_file,
-                    self.search_string,
-                    self.replacement_string
-                )
-                self.converter.write_converted_file(target_file, content)
-            else:
-                # Copy other files as-is
-                target_file.parent.mkdir(parents=True, exist_ok=True)
-                shutil.copy2(source_file, target_file)
-            
-            return True
+            st = source_file.stat()
+            # Read once for all targets
+            if original is None and self.extra_targets and source_file.suffix.lower() == '.strm':
+                original = self.converter.read_file(source_file)
+            with scheduler.slot():
+                prefix = self._sync_one(source_file, target_file, original=original)[3]
+            self._remember(str(rel_path), st, prefix)
+            ok = True
         except Exception as e:
             print(f"Error syncing file {source_file}: {e}")
-            return False
+            metrics.ERRORS.inc(record=self.record_id, operation='write')
+            ok = False
+        for extra in self.extra_targets:
+            ok = extra.sync_file(source_file, original) and ok
+        return ok
     
-    def delete_file(self, target_file: Path) -> bool:
+    def delete_file(self, target_file: Path, prune_parents: bool = False) -> bool:
         """
-        Delete a file from target folder.
+        Delete a file or directory from target folder and every extra target.
         
         Args:
             target_file: Path to target file (can be absolute or relative to target_folder)
+            prune_parents: Also remove parent directories left empty
             
         Returns:
             True if successful, False otherwise
         """
+        # Relative, so it applies to the extra targets as well
+        if target_file.is_absolute():
+            try:
+                target_file = target_file.relative_to(self.target_folder)
+            except ValueError:
+                return False
+        ok = self._delete_one(self.target_folder / target_file, prune_parents)
+        for extra in self.extra_targets:
+            ok = extra.delete_file(target_file, prune_parents) and ok
+        return ok
+    
+    def _delete_one(self, target_file: Path, prune_parents: bool) -> bool:
+        """Delete an absolute path from this target folder."""
         try:
-            # Convert to absolute path if relative
-            if not target_file.is_absolute():
-                target_file = self.target_folder / target_file
-            
             # Check if file is within target folder
             if not str(target_file).startswith(str(self.target_folder)):
                 return False
@@ -234,21 +1788,32 @@ class FolderSync:
             if target_file.exists():
                 # Check if it's a directory - use rmtree instead
                 if target_file.is_dir():
-                    shutil.rmtree(target_file, ignore_errors=True)
+                    self._forget(str(target_file.relative_to(self.target_folder)), is_dir=True)
+                    with scheduler.slot():
+                        shutil.rmtree(target_file, ignore_errors=True)
+                    change_feed.record(self.record_id, 'delete', target_file)
                 else:
-                    target_file.unlink()
+                    self._forget(str(target_file.relative_to(self.target_folder)))
+                    throttle.charge(self.record_id, ops=1)
+                    with scheduler.slot():
+                        target_file.unlink()
+                    change_feed.record(self.record_id, 'delete', target_file)
+                    metrics.FILES_DELETED.inc(record=self.record_id)
                     # Note: We don't remove empty directories here anymore
-                    # Empty directories are handled by _remove_orphaned_folders()
+                    # Empty directories are handled by the orphan cleanup in sync_all()
                     # which checks if they exist in source before removing
+            if prune_parents:
+                self._remove_empty_dirs(target_file.parent)
             
             return True
         except Exception as e:
             print(f"Error deleting file {target_file}: {e}")
+            metrics.ERRORS.inc(record=self.record_id, operation='delete')
             return False
     
     def move_file(self, old_path: Path, new_path: Path) -> bool:
         """
-        Move/rename a file in target folder.
+        Move/rename a file in target folder and every extra target.
         
         Args:
             old_path: Old path relative to target folder
@@ -257,6 +1822,13 @@ class FolderSync:
         Returns:
             True if successful, False otherwise
         """
+        ok = self._move_one(old_path, new_path)
+        for extra in self.extra_targets:
+            ok = extra.move_file(old_path, new_path) and ok
+        return ok
+    
+    def _move_one(self, old_path: Path, new_path: Path) -> bool:
+        """Move/rename a file in this target folder."""
         try:
             old_abs = self.target_folder / old_path
             new_abs = self.target_folder / new_path
@@ -266,7 +1838,15 @@ class FolderSync:
                 new_abs.parent.mkdir(parents=True, exist_ok=True)
                 
                 # Move file
-                shutil.move(str(old_abs), str(new_abs))
+                with scheduler.slot():
+                    shutil.move(str(old_abs), str(new_abs))
+                # Carry the synced state over, so the next sync neither re-copies nor deletes
+                manifest, dir_state = self.manifest, self.dir_state
+                with self._manifest_lock:
+                    manifest.move(str(old_path), str(new_path))
+                    dir_state.move(str(old_path), str(new_path))
+                change_feed.record(self.record_id, 'delete', old_abs)
+                change_feed.record(self.record_id, 'write', new_abs)
                 
                 # Remove empty directories
                 self._remove_empty_dirs(old_abs.parent)
@@ -275,5 +1855,6 @@ class FolderSync:
             return False
         except Exception as e:
             print(f"Error moving file from {old_path} to {new_path}: {e}")
+            metrics.ERRORS.inc(record=self.record_id, operation='move')
             return False
 
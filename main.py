@@ -1,15 +1,28 @@
 """Main entry point for StrmConvert application."""
+import os
 import sys
 import signal
 import atexit
-from app import app, config_manager, monitor
+import threading
+
+# Default number of WSGI worker threads
+DEFAULT_THREADS = 8
 
 
 def cleanup():
     """Cleanup function to stop all monitoring on exit."""
     try:
+        from app import monitor, sync_scheduler
+        import change_feed
         print("Stopping all monitoring...")
+        sync_scheduler.stop()
         monitor.stop_all()
+        # Flush the journal so events still debouncing are replayed on the next start
+        if monitor.journal is not None:
+            monitor.journal.close()
+        feed = change_feed.get()
+        if feed is not None:
+            feed.close()
         print("Cleanup complete.")
     except Exception as e:
         print(f"Error during cleanup: {e}")
@@ -23,8 +36,20 @@ def signal_handler(sig, frame):
     sys.exit(0)
 
 
-def main():
+def main(host: str = '0.0.0.0', port: int = 9115, threads: int = None):
     """Main entry point."""
+    # Import the web application only when serving, so the CLI stays light
+    from waitress import serve
+    from app import app, config_manager, monitor, sync_scheduler
+    from event_journal import EventJournal
+    from folder_sync import FolderSync
+    import change_feed
+    import scheduler
+    import throttle
+
+    if threads is None:
+        threads = int(os.environ.get('STRMCONVERT_THREADS', DEFAULT_THREADS))
+
     # Register cleanup handlers
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
@@ -37,13 +62,49 @@ def main():
     except Exception as e:
         print(f"Warning: Failed to load configuration: {e}")
         print("Starting with empty configuration.")
+        config = {'records': []}
+    throttle.configure(config)
+    scheduler.configure(config)
+    
+    # Record changed target paths for /api/changes and the change webhook
+    try:
+        change_feed.attach(change_feed.from_config(config_manager.changes_path(), config))
+    except OSError as e:
+        print(f"Warning: Failed to open change feed: {e}")
+    
+    # Re-apply events left unfinished by the previous run
+    monitor.attach_journal(EventJournal(config_manager.journal_path()))
+    for record in config.get('records', []):
+        try:
+            folder_sync = FolderSync.from_record(record, config_manager.state_dir(record['id']))
+            if monitor.replay_journal(record['id'], folder_sync):
+                folder_sync.save_state()
+        except Exception as e:
+            print(f"Warning: Failed to replay journal for record {record.get('id')}: {e}")
+    
+    # Resume monitoring of auto-start records in the background so the web
+    # server comes up right away; each then catches up on what changed while down
+    autostart = [record for record in config.get('records', []) if record.get('autostart')]
+    if autostart:
+        try:
+            stagger = config_manager.get_settings()['catch_up_stagger']
+        except Exception:
+            stagger = 0
+        state_dirs = {record['id']: config_manager.state_dir(record['id']) for record in autostart}
+        threading.Thread(target=monitor.start_records, args=(autostart, state_dirs, stagger),
+                         name='autostart', daemon=True).start()
+        print(f"Auto-starting monitoring for {len(autostart)} record(s)")
+    
+    # Periodic full syncs of records with a 'schedule'
+    sync_scheduler.configure(config.get('records', []))
+    sync_scheduler.start()
     
     # Start Flask application
-    print("Starting StrmConvert web server on http://0.0.0.0:9115")
+    print(f"Starting StrmConvert web server on http://{host}:{port} ({threads} threads)")
     print("Access the web UI to configure and control the application.")
     
     try:
-        app.run(host='0.0.0.0', port=9115, debug=False, use_reloader=False)
+        serve(app, host=host, port=port, threads=threads)
     except KeyboardInterrupt:
         pass
     finally:
@@ -0,0 +1,257 @@
+"""In-process metrics exported in the Prometheus text format."""
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Default histogram buckets (seconds) for per-file operations
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Buckets for event-to-write latency, which includes the debounce delay
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 0.75, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+# Buckets for time spent waiting for an I/O slot
+QUEUE_WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Buckets for full sync duration
+SYNC_BUCKETS = (0.1, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 7200.0)
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text exposition format."""
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """Base class for a metric family with optional labels."""
+
+    metric_type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def remove(self, **labels: str) -> None:
+        """Drop the series for the given label values (e.g. when a record is removed)."""
+        key = self._key(labels)
+        with self._lock:
+            self._values.pop(key, None)
+
+    def render(self) -> List[str]:
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.metric_type}',
+        ]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    metric_type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in items]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be computed at scrape time."""
+
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Compute an unlabelled gauge at scrape time."""
+        self._function = function
+
+    def _samples(self) -> List[str]:
+        if self._function is not None:
+            return [f'{self.name} {_format_value(self._function())}']
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in items]
+
+
+class Histogram(_Metric):
+    """Cumulative histogram of observed values."""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(state[-2])}')
+            lines.append(f'{self.name}_count{labels} {_format_value(state[-1])}')
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together for the /metrics endpoint."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# Watchdog event handling
+EVENTS_RECEIVED = REGISTRY.counter(
+    'strmconvert_events_received_total', 'File system events received', ('record', 'type'))
+EVENTS_COALESCED = REGISTRY.counter(
+    'strmconvert_events_coalesced_total', 'Events superseded by a newer event for the same path', ('record',))
+EVENTS_SUPPRESSED = REGISTRY.counter(
+    'strmconvert_events_suppressed_total', 'Events ignored without touching the target', ('record', 'reason'))
+EVENT_LATENCY = REGISTRY.histogram(
+    'strmconvert_event_to_write_seconds', 'Time from event receipt to target written', ('record',),
+    buckets=LATENCY_BUCKETS)
+QUEUE_DEPTH = REGISTRY.gauge(
+    'strmconvert_pending_events', 'Debounced events waiting to be processed', ('record',))
+ACTIVE_THREADS = REGISTRY.gauge(
+    'strmconvert_active_threads', 'Live Python threads in the process')
+ACTIVE_THREADS.set_function(threading.active_count)
+
+# File operations
+FILES_CONVERTED = REGISTRY.counter(
+    'strmconvert_files_converted_total', '.strm files converted and written', ('record',))
+FILES_COPIED = REGISTRY.counter(
+    'strmconvert_files_copied_total', 'Non-.strm files copied as-is', ('record',))
+FILES_DELETED = REGISTRY.counter(
+    'strmconvert_files_deleted_total', 'Files deleted from the target', ('record',))
+ERRORS = REGISTRY.counter(
+    'strmconvert_errors_total', 'Failed file operations', ('record', 'operation'))
+CONVERT_SECONDS = REGISTRY.histogram(
+    'strmconvert_convert_seconds', 'Time to read and convert one .strm file', ('record',))
+WRITE_SECONDS = REGISTRY.histogram(
+    'strmconvert_write_seconds', 'Time to write or copy one file to the target', ('record',))
+SYNC_DURATION = REGISTRY.histogram(
+    'strmconvert_full_sync_seconds', 'Duration of full syncs', ('record',), buckets=SYNC_BUCKETS)
+IO_QUEUE_WAIT = REGISTRY.histogram(
+    'strmconvert_io_queue_wait_seconds', 'Time a file operation waited for an I/O slot', ('priority',),
+    buckets=QUEUE_WAIT_BUCKETS)
+IO_WAITING = REGISTRY.gauge(
+    'strmconvert_io_waiting', 'File operations waiting for an I/O slot', ('priority',))
+THROTTLE_SECONDS = REGISTRY.counter(
+    'strmconvert_throttle_seconds_total', 'Time file operations waited for an I/O limit', ('record',))
+
+# Event journal
+JOURNAL_FLUSH_SECONDS = REGISTRY.histogram(
+    'strmconvert_journal_flush_seconds', 'Time to write one batch to the event journal')
+JOURNAL_REPLAYED = REGISTRY.counter(
+    'strmconvert_journal_replayed_total', 'Journaled paths re-applied after a restart', ('record',))
+
+# Scheduled syncs
+SCHEDULED_SYNCS = REGISTRY.counter(
+    'strmconvert_scheduled_syncs_total', 'Scheduled full syncs by result (ok, error, skipped)', ('record', 'result'))
+
+# Change feed
+WEBHOOK_POSTS = REGISTRY.counter(
+    'strmconvert_change_webhook_posts_total', 'Change feed webhook batches posted', ('result',))
@@ -0,0 +1,413 @@
+"""Compact interned path table for per-file state on very large trees.
+
+Directory paths are interned in a trie (one node per directory), leaf names
+are stored once as UTF-8 in a shared byte buffer, and per-file metadata lives
+in parallel ``array`` columns. Lookups go through an open-addressing hash table
+that is itself an ``array``. A tracked file costs a few tens of bytes instead
+of the several hundred a ``pathlib.Path`` or ``str`` key in a dict costs.
+
+File ids are stable for the lifetime of the index (including save/load):
+removed ids are reused by later inserts, so callers may keep ids as keys.
+"""
+import json
+import os
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Hash table slot markers
+_EMPTY = -1
+_DELETED = -2
+
+_MAGIC = b'STRMIDX1'
+
+DEFAULT_COLUMNS = {'size': 'q', 'mtime': 'q'}
+
+
+def _split(path: str) -> List[str]:
+    """Split a relative path into components, accepting either separator."""
+    if os.sep != '/':
+        path = path.replace(os.sep, '/')
+    return [part for part in path.split('/') if part and part != '.']
+
+
+class PathIndex:
+    """Table of relative file paths with per-file metadata columns."""
+
+    def __init__(self, columns: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            columns: Metadata columns as {name: array typecode}, all
+                     defaulting to 0 (default: size and mtime as int64)
+        """
+        self.column_types = dict(DEFAULT_COLUMNS if columns is None else columns)
+        # Free-form JSON-serialisable header data saved with the index
+        self.meta: Dict[str, Any] = {}
+        self.clear()
+
+    def clear(self) -> None:
+        """Remove all paths."""
+        # Directory trie; node 0 is the root
+        self._dir_parent = array('i', [-1])
+        self._dir_name = array('i', [-1])
+        self._dir_children: Dict[Tuple[int, int], int] = {}
+        self._dir_names: List[str] = []
+        self._dir_name_ids: Dict[str, int] = {}
+        # parent id -> child ids, built on first use of subdirs()
+        self._child_dirs: Optional[Dict[int, List[int]]] = None
+        # File rows; a row with dir -1 is free
+        self._file_dir = array('i')
+        self._name_off = array('I')
+        self._name_len = array('H')
+        self._blob = bytearray()
+        self._columns = {name: array(code) for name, code in self.column_types.items()}
+        self._free = array('i')
+        self._slots = array('i', [_EMPTY]) * 16
+        self._used_slots = 0
+        self._live = 0
+        self._garbage = 0
+
+    # -- directories -----------------------------------------------------
+
+    def _intern_dir_name(self, name: str) -> int:
+        name_id = self._dir_name_ids.get(name)
+        if name_id is None:
+            name_id = self._dir_name_ids[name] = len(self._dir_names)
+            self._dir_names.append(name)
+        return name_id
+
+    def _dir_id(self, parts: Iterable[str], create: bool) -> int:
+        dir_id = 0
+        for part in parts:
+            name_id = self._dir_name_ids.get(part)
+            if name_id is None:
+                if not create:
+                    return -1
+                name_id = self._intern_dir_name(part)
+            child = self._dir_children.get((dir_id, name_id))
+            if child is None:
+                if not create:
+                    return -1
+                child = len(self._dir_parent)
+                self._dir_parent.append(dir_id)
+                self._dir_name.append(name_id)
+                self._dir_children[(dir_id, name_id)] = child
+                if self._child_dirs is not None:
+                    self._child_dirs.setdefault(dir_id, []).append(child)
+            dir_id = child
+        return dir_id
+
+    def dir_path(self, dir_id: int) -> str:
+        """Relative path of a directory node ('' for the root)."""
+        parts = []
+        while dir_id > 0:
+            parts.append(self._dir_names[self._dir_name[dir_id]])
+            dir_id = self._dir_parent[dir_id]
+        return os.sep.join(reversed(parts))
+
+    def subdirs(self, rel_dir: str) -> List[str]:
+        """
+        Names of the directory nodes directly below rel_dir.
+        Nodes outlive their files, so a name may have no paths left below it.
+        """
+        dir_id = self._dir_id(_split(rel_dir), create=False)
+        if dir_id < 0:
+            return []
+        if self._child_dirs is None:
+            self._child_dirs = {}
+            for child in range(1, len(self._dir_parent)):
+                self._child_dirs.setdefault(self._dir_parent[child], []).append(child)
+        return [self._dir_names[self._dir_name[child]] for child in self._child_dirs.get(dir_id, ())]
+
+    def _subtree_dir_ids(self, roots: Iterable[int]) -> set:
+        """All directory ids at or below the given directories."""
+        result = set(roots)
+        # Parents always have lower ids than their children
+        for dir_id in range(1, len(self._dir_parent)):
+            if self._dir_parent[dir_id] in result:
+                result.add(dir_id)
+        return result
+
+    # -- hash table --------------------------------------------------------
+
+    def _name_matches(self, file_id: int, name: bytes) -> bool:
+        length = self._name_len[file_id]
+        if length != len(name):
+            return False
+        offset = self._name_off[file_id]
+        return self._blob[offset:offset + length] == name
+
+    def _probe(self, dir_id: int, name: bytes) -> Tuple[int, int]:
+        """
+        Returns:
+            (slot of the matching file or -1, slot to insert into)
+        """
+        slots = self._slots
+        mask = len(slots) - 1
+        i = hash((dir_id, name)) & mask
+        insert_at = -1
+        while True:
+            file_id = slots[i]
+            if file_id == _EMPTY:
+                return -1, (i if insert_at < 0 else insert_at)
+            if file_id == _DELETED:
+                if insert_at < 0:
+                    insert_at = i
+            elif self._file_dir[file_id] == dir_id and self._name_matches(file_id, name):
+                return i, i
+            i = (i + 1) & mask
+
+    def _rebuild_slots(self, capacity: int) -> None:
+        size = 16
+        while size < capacity * 2:
+            size *= 2
+        self._slots = array('i', [_EMPTY]) * size
+        mask = size - 1
+        for file_id in range(len(self._file_dir)):
+            dir_id = self._file_dir[file_id]
+            if dir_id < 0:
+                continue
+            offset = self._name_off[file_id]
+            name = bytes(self._blob[offset:offset + self._name_len[file_id]])
+            i = hash((dir_id, name)) & mask
+            while self._slots[i] != _EMPTY:
+                i = (i + 1) & mask
+            self._slots[i] = file_id
+        self._used_slots = self._live
+
+    # -- files ---------------------------------------------------------------
+
+    def _locate(self, path: str, create_dirs: bool) -> Tuple[int, bytes]:
+        parts = _split(path)
+        if not parts:
+            raise ValueError(f"Not a file path: {path!r}")
+        return self._dir_id(parts[:-1], create_dirs), parts[-1].encode('utf-8', 'surrogateescape')
+
+    def add(self, path: str, **values: int) -> int:
+        """
+        Insert a path or update its metadata.
+
+        Args:
+            path: Relative file path
+            **values: Column values to set
+
+        Returns:
+            The file id
+        """
+        dir_id, name = self._locate(path, create_dirs=True)
+        slot, insert_at = self._probe(dir_id, name)
+        if slot >= 0:
+            file_id = self._slots[slot]
+            for column, value in values.items():
+                self._columns[column][file_id] = value
+            return file_id
+
+        if self._free:
+            file_id = self._free.pop()
+            self._file_dir[file_id] = dir_id
+            self._name_off[file_id] = len(self._blob)
+            self._name_len[file_id] = len(name)
+            for column, data in self._columns.items():
+                data[file_id] = values.get(column, 0)
+        else:
+            file_id = len(self._file_dir)
+            self._file_dir.append(dir_id)
+            self._name_off.append(len(self._blob))
+            self._name_len.append(len(name))
+            for column, data in self._columns.items():
+                data.append(values.get(column, 0))
+        self._blob.extend(name)
+
+        if self._slots[insert_at] == _EMPTY:
+            self._used_slots += 1
+        self._slots[insert_at] = file_id
+        self._live += 1
+        if self._used_slots * 2 > len(self._slots):
+            self._rebuild_slots(self._live + 1)
+        return file_id
+
+    def find(self, path: str) -> int:
+        """Return the file id for a path, or -1 if it is not tracked."""
+        parts = _split(path)
+        if not parts:
+            return -1
+        dir_id = self._dir_id(parts[:-1], create=False)
+        if dir_id < 0:
+            return -1
+        slot, _ = self._probe(dir_id, parts[-1].encode('utf-8', 'surrogateescape'))
+        return self._slots[slot] if slot >= 0 else -1
+
+    def __contains__(self, path: str) -> bool:
+        return self.find(path) >= 0
+
+    def remove(self, path: str) -> int:
+        """Remove a path. Returns its former file id, or -1 if it was not tracked."""
+        parts = _split(path)
+        if not parts:
+            return -1
+        dir_id = self._dir_id(parts[:-1], create=False)
+        if dir_id < 0:
+            return -1
+        slot, _ = self._probe(dir_id, parts[-1].encode('utf-8', 'surrogateescape'))
+        if slot < 0:
+            return -1
+        file_id = self._slots[slot]
+        self._slots[slot] = _DELETED
+        self._release(file_id)
+        return file_id
+
+    def _release(self, file_id: int) -> None:
+        self._file_dir[file_id] = -1
+        self._garbage += self._name_len[file_id]
+        self._free.append(file_id)
+        self._live -= 1
+        if self._garbage > 65536 and self._garbage * 2 > len(self._blob):
+            self._compact_names()
+
+    def remove_trees(self, rel_dirs: Iterable[str]) -> int:
+        """Remove every path below the given directories. Returns the number removed."""
+        roots = [self._dir_id(_split(rel_dir), create=False) for rel_dir in rel_dirs]
+        roots = [dir_id for dir_id in roots if dir_id >= 0]
+        if not roots:
+            return 0
+        doomed = self._subtree_dir_ids(roots)
+        removed = 0
+        for file_id in range(len(self._file_dir)):
+            if self._file_dir[file_id] in doomed:
+                self._release(file_id)
+                removed += 1
+        if removed:
+            self._rebuild_slots(self._live + 1)
+        return removed
+
+    def move(self, old_path: str, new_path: str) -> int:
+        """
+        Rename a path, or every path below a directory, keeping their metadata.
+
+        Args:
+            old_path: Relative path of a file or directory
+            new_path: Its new relative path
+
+        Returns:
+            The number of paths moved
+        """
+        moved = []
+        file_id = self.find(old_path)
+        if file_id >= 0:
+            moved.append((new_path, {column: data[file_id] for column, data in self._columns.items()}))
+            self.remove(old_path)
+        root = self._dir_id(_split(old_path), create=False)
+        if root >= 0:
+            prefix_len = len(self.dir_path(root)) + 1
+            subtree = self._subtree_dir_ids([root])
+            for file_id in range(len(self._file_dir)):
+                if self._file_dir[file_id] in subtree:
+                    values = {column: data[file_id] for column, data in self._columns.items()}
+                    moved.append((os.path.join(new_path, self.path_of(file_id)[prefix_len:]), values))
+            self.remove_trees([old_path])
+        for path, values in moved:
+            self.add(path, **values)
+        return len(moved)
+
+    def _compact_names(self) -> None:
+        """Rewrite the name buffer without the names of removed rows (ids are kept)."""
+        blob = bytearray()
+        for file_id in range(len(self._file_dir)):
+            if self._file_dir[file_id] < 0:
+                self._name_len[file_id] = 0
+                self._name_off[file_id] = len(blob)
+                continue
+            offset = self._name_off[file_id]
+            length = self._name_len[file_id]
+            self._name_off[file_id] = len(blob)
+            blob.extend(self._blob[offset:offset + length])
+        self._blob = blob
+        self._garbage = 0
+
+    def name_of(self, file_id: int) -> str:
+        offset = self._name_off[file_id]
+        return self._blob[offset:offset + self._name_len[file_id]].decode('utf-8', 'surrogateescape')
+
+    def path_of(self, file_id: int) -> str:
+        """Relative path of a file id."""
+        dir_path = self.dir_path(self._file_dir[file_id])
+        name = self.name_of(file_id)
+        return os.path.join(dir_path, name) if dir_path else name
+
+    def get(self, file_id: int, column: str) -> int:
+        return self._columns[column][file_id]
+
+    def set(self, file_id: int, column: str, value: int) -> None:
+        self._columns[column][file_id] = value
+
+    def __len__(self) -> int:
+        return self._live
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterate over live file ids."""
+        file_dir = self._file_dir
+        return (file_id for file_id in range(len(file_dir)) if file_dir[file_id] >= 0)
+
+    def nbytes(self) -> int:
+        """Approximate memory used by the index, in bytes."""
+        total = len(self._blob)
+        for data in [self._file_dir, self._name_off, self._name_len, self._slots, self._free,
+                     self._dir_parent, self._dir_name] + list(self._columns.values()):
+            total += data.itemsize * len(data)
+        total += sys.getsizeof(self._dir_children) + sys.getsizeof(self._dir_name_ids)
+        total += sum(sys.getsizeof(name) for name in self._dir_names)
+        return total
+
+    # -- persistence -----------------------------------------------------------
+
+    def _arrays(self) -> List[array]:
+        return [self._dir_parent, self._dir_name, self._file_dir, self._name_off,
+                self._name_len, self._free] + [self._columns[name] for name in sorted(self._columns)]
+
+    def save(self, path: str) -> None:
+        """Write the index to a file atomically."""
+        header = json.dumps({
+            'columns': self.column_types,
+            'byteorder': sys.byteorder,
+            'dir_names': self._dir_names,
+            'lengths': [len(data) for data in self._arrays()],
+            'blob': len(self._blob),
+            'meta': self.meta,
+        }, ensure_ascii=False).encode('utf-8')
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_MAGIC)
+            f.write(len(header).to_bytes(4, 'little'))
+            f.write(header)
+            for data in self._arrays():
+                data.tofile(f)
+            f.write(self._blob)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'PathIndex':
+        """Read an index written by save()."""
+        with open(path, 'rb') as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"Not a path index file: {path}")
+            header = json.loads(f.read(int.from_bytes(f.read(4), 'little')).decode('utf-8'))
+            index = cls(header['columns'])
+            index.meta = header.get('meta', {})
+            arrays = index._arrays()
+            for data, length in zip(arrays, header['lengths']):
+                del data[:]
+                data.fromfile(f, length)
+                if header['byteorder'] != sys.byteorder:
+                    data.byteswap()
+            index._blob = bytearray(f.read(header['blob']))
+
+        index._dir_names = header['dir_names']
+        index._dir_name_ids = {name: i for i, name in enumerate(index._dir_names)}
+        index._dir_children = {
+            (index._dir_parent[dir_id], index._dir_name[dir_id]): dir_id
+            for dir_id in range(1, len(index._dir_parent))
+        }
+        index._live = sum(1 for dir_id in index._file_dir if dir_id >= 0)
+        index._garbage = sum(index._name_len[i] for i in index._free)
+        index._rebuild_slots(index._live + 1)
+        return index
@@ -0,0 +1,255 @@
+"""On-demand CPU (cProfile) and memory (tracemalloc) capture for a live process.
+
+cProfile only sees the thread it is enabled in, so worker code wraps its units
+of work in ``with profiling.profiled():``. While no capture is running this is
+a single global check; during a capture each participating thread gets its own
+profiler, and the results are merged when the capture ends. Units should be
+short (a file, a directory): a thread stops profiling when it leaves the
+block, or enters or leaves a nested one, after its capture has ended.
+"""
+import base64
+import cProfile
+import marshal
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Set
+
+# Upper bound for a single capture, in seconds
+MAX_CAPTURE_SECONDS = 300
+# Longest wait, after a capture, for threads to leave their profiled block
+_STOP_WAIT = 1.0
+
+CPU_SORT_KEYS = {
+    'cumulative': 3,
+    'tottime': 2,
+    'ncalls': 1,
+}
+
+
+class CaptureBusyError(Exception):
+    """Raised when a capture of the same kind is already running."""
+
+
+class _CpuCapture:
+    """Collects one cProfile.Profile per thread for the duration of a capture."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.profilers: Dict[int, cProfile.Profile] = {}
+        # Threads whose profiler is currently enabled
+        self.active: Set[int] = set()
+
+    def start(self) -> Optional[cProfile.Profile]:
+        """Enable the calling thread's profiler; None if another profiling tool is active."""
+        ident = threading.get_ident()
+        with self.lock:
+            profiler = self.profilers.get(ident)
+            if profiler is None:
+                profiler = self.profilers[ident] = cProfile.Profile()
+            self.active.add(ident)
+        try:
+            profiler.enable()
+        except ValueError:
+            with self.lock:
+                self.active.discard(ident)
+            return None
+        return profiler
+
+    def stop(self, profiler: cProfile.Profile) -> None:
+        profiler.disable()
+        with self.lock:
+            self.active.discard(threading.get_ident())
+
+
+_cpu_capture: Optional[_CpuCapture] = None
+_cpu_lock = threading.Lock()
+_memory_lock = threading.Lock()
+_local = threading.local()
+
+
+class _Profiled:
+    """Context manager that profiles the enclosed block while a CPU capture is active."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        depth = _local.depth = getattr(_local, 'depth', 0) + 1
+        if getattr(_local, 'profiler', None) is not None:
+            # An outer block is already profiling; stop if its capture has ended
+            _stop_if_ended()
+            return self
+        capture = _cpu_capture
+        if capture is not None:
+            profiler = capture.start()
+            if profiler is not None:
+                _local.profiler, _local.capture, _local.owner = profiler, capture, depth
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if getattr(_local, 'profiler', None) is not None:
+            if _local.owner == _local.depth:
+                _stop()
+            else:
+                _stop_if_ended()
+        _local.depth -= 1
+        return False
+
+
+def _stop() -> None:
+    """Disable the calling thread's profiler."""
+    _local.capture.stop(_local.profiler)
+    _local.profiler = _local.capture = None
+
+
+def _stop_if_ended() -> None:
+    if _local.capture is not _cpu_capture:
+        _stop()
+
+
+_PROFILED = _Profiled()
+
+
+def profiled() -> _Profiled:
+    """Wrap a unit of worker-thread work so CPU captures can see it."""
+    return _PROFILED
+
+
+def _function_label(key) -> Dict[str, Any]:
+    filename, line, name = key
+    return {'function': name, 'file': filename, 'line': line}
+
+
+def capture_cpu(seconds: float, top: int = 30, sort: str = 'cumulative',
+                dump: bool = False) -> Dict[str, Any]:
+    """
+    Profile all instrumented worker threads for the given number of seconds.
+
+    Args:
+        seconds: Capture duration
+        top: Number of functions to return
+        sort: 'cumulative', 'tottime' or 'ncalls'
+        dump: Also return the raw pstats data (base64 encoded marshal, as
+              written by pstats.Stats.dump_stats)
+
+    Returns:
+        Dictionary with the capture summary and the top functions
+    """
+    global _cpu_capture
+    if sort not in CPU_SORT_KEYS:
+        raise ValueError(f"Unknown sort key: {sort}")
+    seconds = max(0.1, min(float(seconds), MAX_CAPTURE_SECONDS))
+
+    if not _cpu_lock.acquire(blocking=False):
+        raise CaptureBusyError("A CPU capture is already running")
+    try:
+        capture = _CpuCapture()
+        _cpu_capture = capture
+        time.sleep(seconds)
+        _cpu_capture = None
+        # Give threads that are inside a profiled block a moment to leave it;
+        # profilers still running are left out rather than read while they change
+        deadline = time.monotonic() + _STOP_WAIT
+        while capture.active and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        with capture.lock:
+            profilers = [profiler for ident, profiler in capture.profilers.items()
+                         if ident not in capture.active]
+            busy = len(capture.active)
+        result: Dict[str, Any] = {
+            'seconds': seconds,
+            'threads': len(profilers),
+            'threads_busy': busy,
+            'total_calls': 0,
+            'total_time': 0.0,
+            'top': [],
+        }
+        if not profilers:
+            return result
+
+        stats = pstats.Stats(profilers[0])
+        for profiler in profilers[1:]:
+            stats.add(profiler)
+        result['total_calls'] = stats.total_calls
+        result['total_time'] = round(stats.total_tt, 6)
+
+        index = CPU_SORT_KEYS[sort]
+        entries = sorted(stats.stats.items(), key=lambda item: item[1][index], reverse=True)
+        top_entries: List[Dict[str, Any]] = []
+        for key, (primitive_calls, calls, tottime, cumtime, _callers) in entries[:top]:
+            entry = _function_label(key)
+            entry.update({
+                'ncalls': calls,
+                'primitive_calls': primitive_calls,
+                'tottime': round(tottime, 6),
+                'cumtime': round(cumtime, 6),
+            })
+            top_entries.append(entry)
+        result['top'] = top_entries
+        if dump:
+            result['pstats'] = base64.b64encode(marshal.dumps(stats.stats)).decode('ascii')
+        return result
+    finally:
+        _cpu_capture = None
+        _cpu_lock.release()
+
+
+def capture_memory(seconds: float, top: int = 30, group_by: str = 'lineno',
+                   frames: int = 10) -> Dict[str, Any]:
+    """
+    Take two tracemalloc snapshots the given number of seconds apart and
+    return the allocation sites that grew the most in between.
+
+    Args:
+        seconds: Time between the snapshots
+        top: Number of allocation sites to return
+        group_by: 'lineno', 'filename' or 'traceback'
+        frames: Traceback depth to record
+
+    Returns:
+        Dictionary with the capture summary and the top differences
+    """
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        raise ValueError(f"Unknown group_by: {group_by}")
+    seconds = max(0.0, min(float(seconds), MAX_CAPTURE_SECONDS))
+
+    if not _memory_lock.acquire(blocking=False):
+        raise CaptureBusyError("A memory capture is already running")
+    started_here = False
+    try:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            started_here = True
+        before = tracemalloc.take_snapshot()
+        time.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+
+        differences = after.compare_to(before, group_by)
+        top_entries = []
+        for diff in differences[:top]:
+            frame = diff.traceback[0]
+            entry = {
+                'file': frame.filename,
+                'line': frame.lineno,
+                'size': diff.size,
+                'size_diff': diff.size_diff,
+                'count': diff.count,
+                'count_diff': diff.count_diff,
+            }
+            if group_by == 'traceback':
+                entry['traceback'] = diff.traceback.format()
+            top_entries.append(entry)
+
+        return {
+            'seconds': seconds,
+            'traced_current': current,
+            'traced_peak': peak,
+            'top': top_entries,
+        }
+    finally:
+        if started_here:
+            tracemalloc.stop()
+        _memory_lock.release()
@@ -0,0 +1,192 @@
+"""Priority scheduling of file operations shared by all records.
+
+Every file operation a FolderSync performs (convert, copy, delete, move)
+takes one of a fixed number of I/O slots. Waiting operations are served by
+class: live work first (watcher events and explicit path syncs), then
+catch-up syncs, then bulk full syncs, and a lower class does not start while
+higher-class work is running or waiting, so a new episode is written between
+two files of a long full sync instead of after it. An operation that has
+waited ``starvation_after`` seconds is served next regardless of its class.
+
+The class is a property of the calling thread: threads are live unless
+inside ``work_class()``. Nested operations (a downstream record fed from
+inside an upstream write) run in the slot their thread already holds.
+An operation that has to wait on something other than I/O (a throttle
+sleep) gives its slot up with ``released()`` meanwhile.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import metrics
+
+# Priority classes, highest first
+PRIORITIES = ('live', 'catch_up', 'bulk')
+
+# Defaults for the 'settings' keys that configure the scheduler
+DEFAULT_SLOTS = 4
+DEFAULT_STARVATION_AFTER = 10.0
+
+# Longest wait between re-checks, so starving operations are noticed
+_MAX_WAIT = 0.5
+
+_local = threading.local()
+
+
+class _Waiter:
+    __slots__ = ('priority', 'enqueued')
+
+    def __init__(self, priority: int):
+        self.priority = priority
+        self.enqueued = time.monotonic()
+
+
+class IOScheduler:
+    """A pool of I/O slots handed out by priority class, oldest first within a class."""
+
+    def __init__(self, slots: int = DEFAULT_SLOTS, starvation_after: float = DEFAULT_STARVATION_AFTER):
+        self.slots = slots
+        self.starvation_after = starvation_after
+        self._cond = threading.Condition()
+        self._running = [0] * len(PRIORITIES)
+        self._waiting: List[_Waiter] = []  # In arrival order
+
+    def configure(self, slots: int, starvation_after: float) -> None:
+        """Change the number of slots and the starvation limit; waiters re-check at once."""
+        with self._cond:
+            self.slots = max(1, int(slots))
+            self.starvation_after = starvation_after
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold an I/O slot, at the calling thread's class, for the duration of one operation."""
+        if getattr(_local, 'held', None) is not None:
+            yield
+            return
+        priority = PRIORITIES.index(current_class())
+        self._acquire(priority)
+        _local.held = priority
+        try:
+            yield
+        finally:
+            _local.held = None
+            self._release(priority)
+
+    @contextmanager
+    def released(self) -> Iterator[None]:
+        """
+        Give up the calling thread's slot, if it holds one, for the block,
+        and queue for it again at the same class afterwards.
+        """
+        priority = getattr(_local, 'held', None)
+        if priority is None:
+            yield
+            return
+        self._release(priority)
+        _local.held = None
+        try:
+            yield
+        finally:
+            self._acquire(priority)
+            _local.held = priority
+
+    def _release(self, priority: int) -> None:
+        with self._cond:
+            self._running[priority] -= 1
+            self._cond.notify_all()
+
+    def _acquire(self, priority: int) -> None:
+        waiter = _Waiter(priority)
+        label = PRIORITIES[priority]
+        with self._cond:
+            self._waiting.append(waiter)
+            metrics.IO_WAITING.inc(priority=label)
+            try:
+                while not self._may_start(waiter):
+                    self._cond.wait(_MAX_WAIT)
+            finally:
+                self._waiting.remove(waiter)
+                metrics.IO_WAITING.dec(priority=label)
+            self._running[priority] += 1
+        metrics.IO_QUEUE_WAIT.observe(time.monotonic() - waiter.enqueued, priority=label)
+
+    def _may_start(self, waiter: _Waiter) -> bool:
+        """Whether waiter is next in line and a slot is free. Call with the lock held."""
+        if sum(self._running) >= self.slots:
+            return False
+        starving_after = time.monotonic() - self.starvation_after
+        # The oldest starving waiter goes first, whatever its class
+        starving = next((w for w in self._waiting if w.enqueued <= starving_after), None)
+        if starving is not None:
+            return starving is waiter
+        if any(self._running[:waiter.priority]):
+            return False
+        for other in self._waiting:
+            if other.priority < waiter.priority:
+                return False
+            if other.priority == waiter.priority:
+                return other is waiter
+        return False
+
+    def status(self) -> Dict[str, Any]:
+        """Slots and the number of running and waiting operations per class."""
+        with self._cond:
+            waiting = [0] * len(PRIORITIES)
+            for waiter in self._waiting:
+                waiting[waiter.priority] += 1
+            return {
+                'slots': self.slots,
+                'running': dict(zip(PRIORITIES, self._running)),
+                'waiting': dict(zip(PRIORITIES, waiting)),
+            }
+
+
+SCHEDULER = IOScheduler()
+
+
+def current_class() -> str:
+    """Priority class of the calling thread."""
+    return getattr(_local, 'work_class', None) or 'live'
+
+
+def set_class(name: Optional[str]) -> None:
+    """Set the calling thread's class for good (e.g. as a pool initializer)."""
+    _local.work_class = name
+
+
+@contextmanager
+def work_class(name: str, override: bool = True) -> Iterator[None]:
+    """
+    Run the block's file operations at the given class.
+
+    Args:
+        name: One of PRIORITIES
+        override: Replace a class the thread already has; False keeps it
+                  (a full sync started by a catch-up stays catch-up)
+    """
+    previous = getattr(_local, 'work_class', None)
+    if override or previous is None:
+        _local.work_class = name
+    try:
+        yield
+    finally:
+        _local.work_class = previous
+
+
+def slot():
+    """Hold a slot of the shared scheduler for one file operation."""
+    return SCHEDULER.slot()
+
+
+def released():
+    """Give up the calling thread's slot of the shared scheduler, if any, for the block."""
+    return SCHEDULER.released()
+
+
+def configure(config: Dict[str, Any]) -> None:
+    """Apply settings.io_slots and settings.io_starvation_seconds."""
+    settings = config.get('settings') or {}
+    SCHEDULER.configure(settings.get('io_slots', DEFAULT_SLOTS),
+                        settings.get('io_starvation_seconds', DEFAULT_STARVATION_AFTER))
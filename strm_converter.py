@@ -19,31 +19,62 @@ class StrmConverter:
         Returns:
             Converted file content as string
         """
+        return StrmConverter.convert_text(
+            StrmConverter.read_file(source_path),
+            search_string,
+            replacement_string
+        )
+    
+    @staticmethod
+    def read_file(source_path: Path) -> str:
+        """
+        Read the content of a source .strm file.
+        
+        Args:
+            source_path: Path to source .strm file
+            
+        Returns:
+            File content as string
+        """
         try:
             # Read source file with UTF-8 encoding
             with open(source_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Replace first occurrence only (skip if search_string is empty for sync without conversion)
-            if search_string and search_string in content:
-                content = content.replace(search_string, replacement_string, 1)
-            
-            return content
+                return f.read()
         except Exception as e:
             raise ValueError(f"Failed to convert file {source_path}: {e}")
     
     @staticmethod
-    def write_converted_file(target_path: Path, content: str) -> None:
+    def convert_text(content: str, search_string: str, replacement_string: str) -> str:
+        """
+        Replace the first occurrence of search_string in .strm content.
+        
+        Args:
+            content: Original file content
+            search_string: String to search for
+            replacement_string: String to replace with
+            
+        Returns:
+            Converted content
+        """
+        # Replace first occurrence only (skip if search_string is empty for sync without conversion)
+        if search_string and search_string in content:
+            content = content.replace(search_string, replacement_string, 1)
+        return content
+    
+    @staticmethod
+    def write_converted_file(target_path: Path, content: str, create_parents: bool = True) -> None:
         """
         Write converted content to target .strm file.
         
         Args:
             target_path: Path to target .strm file
             content: Content to write
+            create_parents: Create missing parent directories first
         """
         try:
             # Create parent directories if they don't exist
-            target_path.parent.mkdir(parents=True, exist_ok=True)
+            if create_parents:
+                target_path.parent.mkdir(parents=True, exist_ok=True)
             
             # Write content with UTF-8 encoding
             with open(target_path, 'w', encoding='utf-8') as f:
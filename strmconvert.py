@@ -0,0 +1,270 @@
+"""Command line interface for StrmConvert.
+
+Usage:
+    python -m strmconvert sync [--sweep] [--restart] [--order name|recent] [--record ID ...]
+    python -m strmconvert plan [--operations N] [--record ID ...]
+    python -m strmconvert verify [--repair] [--record ID ...]
+    python -m strmconvert watch [--record ID ...]
+    python -m strmconvert serve [--host HOST] [--port PORT] [--threads N]
+
+Each subcommand imports only the modules it needs: ``sync``, ``plan`` and
+``verify`` never load Flask, watchdog or the dashboard template, so they are cheap
+enough to run from cron or a systemd timer. Their stdout holds only the JSON
+result; progress and error messages go to stderr.
+"""
+import argparse
+import contextlib
+import json
+import sys
+from typing import Any, Dict, List, Optional
+
+# Exit codes
+EXIT_OK = 0
+EXIT_SYNC_ERRORS = 1
+EXIT_USAGE = 2
+
+
+class RecordNotFoundError(Exception):
+    """Raised when a record id given on the command line is not configured."""
+
+
+def _load_records(config_path: str, record_ids: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """Load the configured records, optionally restricted to the given ids."""
+    from config_manager import ConfigManager
+
+    config_manager = ConfigManager(config_path)
+    config_manager.load()
+    records = config_manager.get_records()
+    if not record_ids:
+        return records
+
+    selected = []
+    for record_id in record_ids:
+        record = config_manager.get_record_by_id(record_id)
+        if record is None:
+            raise RecordNotFoundError(record_id)
+        selected.append(record)
+    return selected
+
+
+def _state_dir(config_path: str, record: Dict[str, Any]) -> str:
+    """Persisted sync state directory for a record."""
+    from config_manager import ConfigManager
+
+    return ConfigManager(config_path).state_dir(record['id'])
+
+
+def _make_folder_sync(config_path: str, record: Dict[str, Any]):
+    """Create a FolderSync instance for a record."""
+    from folder_sync import FolderSync
+
+    return FolderSync.from_record(record, _state_dir(config_path, record))
+
+
+def _configure_io(config_path: str) -> None:
+    """Apply the I/O limits and scheduler settings of the configuration to this process."""
+    import scheduler
+    import throttle
+    from config_manager import ConfigManager
+
+    config = ConfigManager(config_path).load()
+    throttle.configure(config)
+    scheduler.configure(config)
+
+
+# Stream the JSON result is written to; progress and error messages go to stderr
+_result_stream = sys.stdout
+
+
+def _print_json(data: Dict[str, Any]) -> None:
+    print(json.dumps(data, ensure_ascii=False, indent=2), file=_result_stream)
+
+
+def cmd_sync(args: argparse.Namespace) -> int:
+    """Run a full sync for the selected records and print the stats as JSON."""
+    import signal
+
+    records = _load_records(args.config, args.record)
+    _configure_io(args.config)
+    results = []
+    total_errors = 0
+    cancelled = False
+    current = None
+
+    # SIGINT/SIGTERM stop the running sync at a directory boundary and keep
+    # its checkpoint, so the next run continues from there
+    def handle_signal(sig, frame):
+        nonlocal cancelled
+        cancelled = True
+        if current is not None:
+            current.cancel()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    for record in records:
+        if cancelled:
+            break
+        current = _make_folder_sync(args.config, record)
+        stats = current.sync_all(sweep=args.sweep, resume=not args.restart, order=args.order)
+        total_errors += stats.get('errors', 0)
+        results.append({'id': record.get('id'), 'stats': stats})
+
+    ok = total_errors == 0 and not cancelled
+    _print_json({'success': ok, 'records': results})
+    return EXIT_OK if ok else EXIT_SYNC_ERRORS
+
+
+def cmd_plan(args: argparse.Namespace) -> int:
+    """Print what a full sync would do for the selected records, without writing."""
+    records = _load_records(args.config, args.record)
+    results = [
+        {'id': record.get('id'),
+         'plan': _make_folder_sync(args.config, record).plan(max_operations=args.operations)}
+        for record in records
+    ]
+    _print_json({'success': True, 'records': results})
+    return EXIT_OK
+
+
+def cmd_verify(args: argparse.Namespace) -> int:
+    """Compare source and target digests for the selected records, optionally repairing."""
+    records = _load_records(args.config, args.record)
+    results = []
+    ok = True
+    for record in records:
+        report = _make_folder_sync(args.config, record).verify(repair=args.repair)
+        if report.get('errors', 0) or (not report['in_sync'] and not args.repair):
+            ok = False
+        results.append({'id': record.get('id'), 'report': report})
+
+    _print_json({'success': ok, 'records': results})
+    return EXIT_OK if ok else EXIT_SYNC_ERRORS
+
+
+def cmd_watch(args: argparse.Namespace) -> int:
+    """Monitor the selected records until interrupted, without the web server."""
+    import signal
+    import threading
+    from config_manager import ConfigManager
+    from event_journal import EventJournal
+    from watchdog_monitor import WatchdogMonitor
+    import change_feed
+
+    records = _load_records(args.config, args.record)
+    _configure_io(args.config)
+    config_manager = ConfigManager(args.config)
+    monitor = WatchdogMonitor()
+    # Events left unfinished by a previous run are replayed as each record starts
+    journal = EventJournal(config_manager.journal_path())
+    monitor.attach_journal(journal)
+    # Only long-running processes feed the change log; one-shot syncs do not
+    feed = change_feed.from_config(config_manager.changes_path(), config_manager.load())
+    change_feed.attach(feed)
+    stop_event = threading.Event()
+
+    def handle_signal(sig, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    # Records start concurrently; each catches up in the background per its 'catch_up' setting
+    started = len(monitor.start_records(
+        records,
+        {record['id']: _state_dir(args.config, record) for record in records},
+        stagger=config_manager.get_settings()['catch_up_stagger']
+    ))
+
+    print(f"Monitoring {started}/{len(records)} record(s). Press Ctrl+C to stop.")
+    if started == 0:
+        journal.close()
+        feed.close()
+        return EXIT_SYNC_ERRORS
+
+    try:
+        while not stop_event.wait(1):
+            pass
+    finally:
+        monitor.stop_all()
+        journal.close()
+        feed.close()
+    return EXIT_OK
+
+
+def cmd_serve(args: argparse.Namespace) -> int:
+    """Start the web UI and API server."""
+    import main
+
+    main.main(host=args.host, port=args.port, threads=args.threads)
+    return EXIT_OK
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for all subcommands."""
+    parser = argparse.ArgumentParser(
+        prog='strmconvert',
+        description='Convert .strm file paths and keep target folders in sync.'
+    )
+    parser.add_argument('--config', default='config/config.yaml',
+                        help='Path to the YAML configuration file (default: %(default)s)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for name, func, help_text in (
+        ('sync', cmd_sync, 'Run a one-shot full sync and print stats as JSON'),
+        ('plan', cmd_plan, 'Show what a full sync would change, without writing'),
+        ('verify', cmd_verify, 'Check that targets match their sources, without writing'),
+        ('watch', cmd_watch, 'Monitor source folders without the web server'),
+    ):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('--record', action='append', metavar='ID',
+                         help='Record id to process (repeatable, default: all records)')
+        if name == 'sync':
+            sub.add_argument('--sweep', action='store_true',
+                             help='List every directory, even those whose mtime is unchanged')
+            sub.add_argument('--restart', action='store_true',
+                             help='Discard the checkpoint of an interrupted sync and start over')
+            sub.add_argument('--order', choices=('name', 'recent'), default=None,
+                             help="Directory order: by name, or newest subtrees first "
+                                  "(default: the record's sync_order)")
+        if name == 'plan':
+            sub.add_argument('--operations', type=int, default=0, metavar='N',
+                             help='Also list the first N planned operations in execution order')
+        if name == 'verify':
+            sub.add_argument('--repair', action='store_true',
+                             help='Re-sync the directories that diverged')
+        sub.set_defaults(func=func, json_output=name != 'watch')
+
+    serve = subparsers.add_parser('serve', help='Start the web UI and API server')
+    serve.add_argument('--host', default='0.0.0.0')
+    serve.add_argument('--port', type=int, default=9115)
+    serve.add_argument('--threads', type=int, default=None,
+                       help='WSGI worker threads (default: $STRMCONVERT_THREADS or 8)')
+    serve.set_defaults(func=cmd_serve)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """CLI entry point. Returns the process exit code."""
+    global _result_stream
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        if not getattr(args, 'json_output', False):
+            return args.func(args)
+        # Sync summaries and error messages are printed by the modules doing
+        # the work; keep stdout for the JSON result so it can be parsed
+        _result_stream = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            return args.func(args)
+    except RecordNotFoundError as e:
+        print(f"Unknown record id: {e.args[0]}", file=sys.stderr)
+        return EXIT_USAGE
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""Built-in periodic full syncs.
+
+A record with a 'schedule' is fully synced every ``interval`` seconds or at
+the times of a five-field ``cron`` expression (minute hour day month
+weekday, local time), replacing an external cron job hitting /api/sync:
+
+    schedule:
+      interval: 3600      # or: cron: "0 * * * *"
+      jitter: 300         # optional, default a tenth of the period, at most 300
+      sweep: false        # optional, list every directory
+
+Start times are spread so records sharing a schedule do not all start at
+once: interval schedules are offset within the interval by a fixed amount
+derived from the record id, and every run is delayed by a random amount up
+to ``jitter`` seconds. The default jitter is capped at five minutes, so a
+weekly or monthly cron run still starts close to its time; set ``jitter``
+explicitly for a wider spread. A run that comes due while the record is
+still syncing (from the schedule or otherwise) is skipped.
+"""
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+
+# Default jitter, as a fraction of the schedule's period, and its upper bound in seconds
+DEFAULT_JITTER_FRACTION = 0.1
+MAX_DEFAULT_JITTER = 300.0
+
+# Longest sleep between checks, so clock changes are noticed
+_MAX_WAIT = 60.0
+
+# Cron fields: (name, lowest, highest)
+_CRON_FIELDS = (
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day', 1, 31),
+    ('month', 1, 12),
+    ('weekday', 0, 7),
+)
+
+
+class CronExpression:
+    """A five-field cron expression: numbers, '*', ranges 'a-b', steps '/n' and lists."""
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != len(_CRON_FIELDS):
+            raise ValueError(f"cron expression must have 5 fields, got {len(fields)}")
+        values = [self._parse_field(field, name, low, high)
+                  for field, (name, low, high) in zip(fields, _CRON_FIELDS)]
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = values
+        # 0 and 7 are both Sunday
+        self.weekdays = {day % 7 for day in weekdays}
+        # Standard cron: when both day fields are restricted, either may match
+        self._any_day = fields[2] == '*' or fields[4] == '*'
+
+    @staticmethod
+    def _parse_field(field: str, name: str, low: int, high: int) -> set:
+        values = set()
+        for part in field.split(','):
+            spec, _, step = part.partition('/')
+            try:
+                step = int(step) if step else 1
+                if spec == '*':
+                    start, end = low, high
+                elif '-' in spec:
+                    start, end = (int(value) for value in spec.split('-', 1))
+                else:
+                    start = int(spec)
+                    end = high if step > 1 else start
+            except ValueError:
+                raise ValueError(f"invalid cron {name} field '{field}'")
+            if step < 1 or not low <= start <= end <= high:
+                raise ValueError(f"cron {name} field '{field}' out of range {low}-{high}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day = dt.day in self.days
+        # datetime counts Monday as 0, cron counts Sunday as 0
+        weekday = (dt.weekday() + 1) % 7 in self.weekdays
+        return day and weekday if self._any_day else day or weekday
+
+    def next_after(self, timestamp: float) -> float:
+        """First matching minute strictly after timestamp."""
+        dt = datetime.fromtimestamp(timestamp).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Four years covers every valid day/month combination, Feb 29 included
+        limit = dt + timedelta(days=4 * 366)
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(dt):
+                dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+            elif dt.hour not in self.hours:
+                dt = (dt + timedelta(hours=1)).replace(minute=0)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt.timestamp()
+        raise ValueError(f"cron expression '{self.expression}' never matches")
+
+
+def schedule_error(schedule: Any, name: str) -> Optional[str]:
+    """Validation error of a record's schedule section, or None if it is valid."""
+    if not isinstance(schedule, dict):
+        return f"{name} must be a mapping"
+    interval, cron = schedule.get('interval'), schedule.get('cron')
+    if (interval is None) == (cron is None):
+        return f"{name} must have either 'interval' or 'cron'"
+    if interval is not None and (isinstance(interval, bool) or not isinstance(interval, (int, float)) or interval < 60):
+        return f"{name} field 'interval' must be a number of seconds, at least 60"
+    if cron is not None:
+        if not isinstance(cron, str):
+            return f"{name} field 'cron' must be a string"
+        try:
+            CronExpression(cron).next_after(time.time())
+        except ValueError as e:
+            return f"{name} field 'cron': {e}"
+    jitter = schedule.get('jitter')
+    if jitter is not None and (isinstance(jitter, bool) or not isinstance(jitter, (int, float)) or jitter < 0):
+        return f"{name} field 'jitter' must be a non-negative number"
+    if not isinstance(schedule.get('sweep', False), bool):
+        return f"{name} field 'sweep' must be true or false"
+    return None
+
+
+class _Entry:
+    """Schedule and run history of one record."""
+
+    def __init__(self, record: Dict[str, Any]):
+        self.record = record
+        self.next_run: Optional[float] = None
+        self.last_run: Optional[float] = None
+        self.last_result: Optional[str] = None
+        self.last_duration: Optional[float] = None
+        self.running = False
+        self.set_schedule(record['schedule'])
+
+    def set_schedule(self, schedule: Dict[str, Any]) -> None:
+        """Replace the schedule and plan the next run under it."""
+        self.schedule = dict(schedule)
+        self.cron = CronExpression(self.schedule['cron']) if self.schedule.get('cron') else None
+        self.plan_next(time.time())
+
+    def plan_next(self, now: float) -> None:
+        """Set next_run to the first slot after now, plus jitter."""
+        if self.cron is not None:
+            slot = self.cron.next_after(now)
+            period = self.cron.next_after(slot) - slot
+        else:
+            period = float(self.schedule['interval'])
+            # Fixed per-record offset, so records with the same interval take turns
+            phase = zlib.crc32(self.record['id'].encode('utf-8')) / 2 ** 32 * period
+            slot = phase + ((now - phase) // period + 1) * period
+        jitter = self.schedule.get('jitter')
+        if jitter is None:
+            jitter = min(period * DEFAULT_JITTER_FRACTION, MAX_DEFAULT_JITTER)
+        self.next_run = slot + random.uniform(0, jitter)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'schedule': self.schedule,
+            'next_run': self.next_run,
+            'last_run': self.last_run,
+            'last_result': self.last_result,
+            'last_duration': self.last_duration,
+            'running': self.running,
+        }
+
+
+class SyncScheduler:
+    """Starts the scheduled full syncs of records in background threads."""
+
+    def __init__(self, run: Callable[[Dict[str, Any], bool], Optional[Dict[str, Any]]],
+                 is_syncing: Callable[[str], bool]):
+        """
+        Args:
+            run: Runs a full sync of a record (record, sweep) and returns its stats
+            is_syncing: Whether a record has a full sync in progress
+        """
+        self._sync = run
+        self._is_syncing = is_syncing
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def configure(self, records: List[Dict[str, Any]]) -> None:
+        """Schedule the records that have a 'schedule'; unchanged schedules keep their next run."""
+        with self._lock:
+            entries = {}
+            for record in records:
+                if not record.get('id') or not record.get('schedule'):
+                    continue
+                entry = self._entries.get(record['id'])
+                if entry is None:
+                    entry = _Entry(record)
+                else:
+                    entry.record = record
+                    if entry.schedule != record['schedule']:
+                        entry.set_schedule(record['schedule'])
+                entries[record['id']] = entry
+            if entries.keys() != self._entries.keys():
+                print(f"Scheduled syncs: {len(entries)} record(s)")
+            self._entries = entries
+        self._wake.set()
+
+    def start(self) -> None:
+        """Start the background thread that starts due syncs."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='sync-schedule', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop starting syncs; syncs already running are left to finish."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            now = time.time()
+            with self._lock:
+                due = [entry for entry in self._entries.values() if entry.next_run <= now]
+                for entry in due:
+                    entry.plan_next(now)
+                wait = min((entry.next_run for entry in self._entries.values()), default=now + _MAX_WAIT) - now
+            for entry in due:
+                self._start(entry)
+            self._wake.wait(min(max(wait, 0), _MAX_WAIT))
+            self._wake.clear()
+
+    def _start(self, entry: _Entry) -> None:
+        """Start a due sync in its own thread, or skip it if the record is still syncing."""
+        record_id = entry.record['id']
+        syncing = self._is_syncing(record_id)
+        with self._lock:
+            skip = entry.running or syncing
+            if skip:
+                entry.last_result = 'skipped'
+            else:
+                entry.running = True
+        if skip:
+            print(f"Skipping scheduled sync of record {record_id}: a sync is still in progress")
+            metrics.SCHEDULED_SYNCS.inc(record=record_id, result='skipped')
+            return
+        threading.Thread(target=self._execute, args=(entry,),
+                         name=f'scheduled-sync-{record_id}', daemon=True).start()
+
+    def _execute(self, entry: _Entry) -> None:
+        record_id = entry.record['id']
+        start = time.time()
+        with self._lock:
+            entry.last_run = start
+        print(f"Starting scheduled sync of record {record_id}")
+        result = 'error'
+        try:
+            stats = self._sync(entry.record, bool(entry.schedule.get('sweep')))
+            if stats is not None and not stats.get('errors'):
+                result = 'ok'
+        except Exception as e:
+            print(f"Error in scheduled sync of record {record_id}: {e}")
+        with self._lock:
+            entry.running = False
+            entry.last_result = result
+            entry.last_duration = round(time.time() - start, 3)
+        metrics.SCHEDULED_SYNCS.inc(record=record_id, result=result)
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Schedule, next and last run (Unix times), last result and whether running, per record."""
+        with self._lock:
+            return {record_id: entry.status() for record_id, entry in self._entries.items()}
@@ -0,0 +1,98 @@
+"""Per-phase timing and throughput accounting for sync runs."""
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+# Phases of a full sync, in the order they normally run
+PHASES = ('source_scan', 'target_scan', 'mkdir', 'convert', 'copy', 'delete', 'orphan_cleanup')
+
+
+class SyncTimer:
+    """Accumulates wall time and item counts per phase of one sync run."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    @contextmanager
+    def phase(self, name: str, items: int = 0) -> Iterator[None]:
+        """Time a block of work and attribute it to the named phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, items)
+
+    def add(self, name: str, seconds: float, items: int = 0) -> None:
+        """Add time and items to the named phase."""
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = {'seconds': 0.0, 'items': 0}
+        phase['seconds'] += seconds
+        phase['items'] += items
+
+    def add_items(self, name: str, items: int) -> None:
+        self.add(name, 0.0, items)
+
+    def finish(self, stats: Dict[str, Any]) -> Dict[str, Any]:
+        """Store the timing breakdown in stats and return it."""
+        duration = time.perf_counter() - self.start
+        files = stats.get('created', 0) + stats.get('updated', 0) + stats.get('deleted', 0)
+        stats['duration'] = round(duration, 4)
+        stats['files_per_sec'] = round(files / duration, 1) if duration > 0 else 0.0
+        stats['bytes_read'] = self.bytes_read
+        stats['bytes_written'] = self.bytes_written
+        stats['phases'] = {
+            name: {'seconds': round(phase['seconds'], 4), 'items': int(phase['items'])}
+            for name, phase in sorted(self.phases.items(), key=lambda kv: _phase_order(kv[0]))
+        }
+        return stats
+
+
+def _phase_order(name: str) -> int:
+    return PHASES.index(name) if name in PHASES else len(PHASES)
+
+
+def _format_bytes(count: int) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if count < 1024 or unit == 'GB':
+            return f"{count:.0f}{unit}" if unit == 'B' else f"{count:.1f}{unit}"
+        count /= 1024
+    return f"{count}B"
+
+
+def format_summary(record_id: str, stats: Dict[str, Any]) -> str:
+    """
+    Format a one-line summary of a sync run, e.g.
+    [sync abc] 12.3s c=10 u=0 s=980 d=2 e=0 41.2 files/s r=1.2MB w=1.1MB | source_scan 0.8s/1234 ...
+    """
+    head = (
+        f"[sync {record_id or '-'}] {stats.get('duration', 0):.2f}s "
+        f"c={stats.get('created', 0)} u={stats.get('updated', 0)} s={stats.get('unchanged', 0)} "
+        f"d={stats.get('deleted', 0)} e={stats.get('errors', 0)} "
+        f"{stats.get('files_per_sec', 0)} files/s "
+        f"r={_format_bytes(stats.get('bytes_read', 0))} w={_format_bytes(stats.get('bytes_written', 0))}"
+    )
+    phases = ' '.join(
+        f"{name} {phase['seconds']:.2f}s/{phase['items']}"
+        for name, phase in stats.get('phases', {}).items()
+    )
+    return f"{head} | {phases}" if phases else head
+
+
+def merge_stats(total: Dict[str, Any], stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the counters and phase breakdown of one sync run into a running total."""
+    for key in ('created', 'updated', 'unchanged', 'deleted', 'errors', 'dirs_pruned',
+                'bytes_read', 'bytes_written'):
+        total[key] = total.get(key, 0) + stats.get(key, 0)
+    total['duration'] = round(total.get('duration', 0) + stats.get('duration', 0), 4)
+    files = total.get('created', 0) + total.get('updated', 0) + total.get('deleted', 0)
+    total['files_per_sec'] = round(files / total['duration'], 1) if total['duration'] > 0 else 0.0
+    phases = total.setdefault('phases', {})
+    for name, phase in stats.get('phases', {}).items():
+        merged = phases.setdefault(name, {'seconds': 0.0, 'items': 0})
+        merged['seconds'] = round(merged['seconds'] + phase['seconds'], 4)
+        merged['items'] += phase['items']
+    return total
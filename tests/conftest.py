@@ -0,0 +1,71 @@
+"""Shared fixtures: a small source library and a config file describing it."""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+import yaml
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def library(tmp_path):
+    """Source folder with a few .strm and plain files, and an empty target path."""
+    source = tmp_path / 'source'
+    for rel_path, content in (
+        ('Show/S01/E01.strm', 'http://old/Show/S01/E01.mkv'),
+        ('Show/S01/E02.strm', 'http://old/Show/S01/E02.mkv'),
+        ('Show/S01/poster.jpg', 'jpg'),
+        ('Movie/Movie.strm', 'http://old/Movie/Movie.mkv'),
+    ):
+        path = source / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+    return source, tmp_path / 'target'
+
+
+@pytest.fixture
+def make_record(library):
+    """Build a record for the library, with extra fields overriding the defaults."""
+    source, target = library
+
+    def make(**fields):
+        record = {
+            'id': 'rec-1',
+            'source_folder': str(source),
+            'target_folder': str(target),
+            'search_string': 'http://old',
+            'replacement_string': 'http://new',
+        }
+        record.update(fields)
+        return record
+    return make
+
+
+@pytest.fixture
+def config_file(tmp_path, make_record):
+    """A config.yaml holding one record for the library."""
+    path = tmp_path / 'config' / 'config.yaml'
+    path.parent.mkdir(parents=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump({'records': [make_record()]}, f)
+    return path
+
+
+def relative_files(folder: Path):
+    """Sorted relative paths of the files under folder."""
+    return sorted(os.path.relpath(os.path.join(root, name), folder)
+                  for root, _, names in os.walk(folder) for name in names)
+
+
+@pytest.fixture
+def web(config_file, monkeypatch):
+    """Flask test client of the app, using config_file; stops its monitors afterwards."""
+    import app as web_app
+    monkeypatch.setattr(web_app.config_manager, 'config_path', config_file)
+    web_app.config_manager.load()
+    yield web_app, web_app.app.test_client()
+    web_app.monitor.stop_all()
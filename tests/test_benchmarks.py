@@ -0,0 +1,20 @@
+"""Smoke test of the event replay benchmark: every synthetic storm runs and leaves a correct target."""
+import json
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+
+@pytest.mark.parametrize('storm', ['season_pack', 'folder_move', 'rename_chain'])
+def test_event_replay_storm(storm, tmp_path):
+    result = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.event_replay', '--storm', storm, '--files', '20',
+         '--debounce', '0.05', '--workdir', str(tmp_path)],
+        cwd=ROOT, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    data = json.loads(result.stdout)
+    assert data['target']['correct']
+    assert data['events'] > 0
@@ -0,0 +1,36 @@
+"""The JSON subcommands print nothing but their JSON result on stdout."""
+import json
+import subprocess
+import sys
+
+from conftest import ROOT
+
+
+def run_cli(config_file, *args):
+    result = subprocess.run(
+        [sys.executable, '-m', 'strmconvert', '--config', str(config_file), *args],
+        cwd=ROOT, capture_output=True, text=True, timeout=60)
+    return result.returncode, json.loads(result.stdout), result.stderr
+
+
+def test_sync_stdout_is_json(config_file, library):
+    code, data, stderr = run_cli(config_file, 'sync')
+    assert code == 0
+    assert data['success'] is True
+    assert data['records'][0]['stats']['created'] == 4
+    # The per-sync summary still reaches the log, on stderr
+    assert '[sync rec-1]' in stderr
+    _, target = library
+    assert (target / 'Movie' / 'Movie.strm').read_text() == 'http://new/Movie/Movie.mkv'
+
+
+def test_plan_and_verify_stdout_is_json(config_file):
+    code, data, _ = run_cli(config_file, 'plan')
+    assert code == 0
+    assert data['records'][0]['plan']['create'] == 4
+
+    run_cli(config_file, 'sync')
+    code, data, stderr = run_cli(config_file, 'verify')
+    assert code == 0
+    assert data['records'][0]['report']['in_sync'] is True
+    assert '[verify rec-1]' in stderr
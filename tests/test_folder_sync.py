@@ -0,0 +1,119 @@
+"""Full syncs after incremental changes to the target, and verify repairs."""
+import os
+import threading
+import time
+from pathlib import Path
+
+import scheduler
+import throttle
+from folder_sync import FolderSync
+
+
+def test_move_then_sync_copies_nothing(make_record, library, tmp_path):
+    source, target = library
+    fs = FolderSync.from_record(make_record(), str(tmp_path / 'state'))
+    assert fs.sync_all()['created'] == 4
+
+    # A directory and a file moved in the source, mirrored by the monitor
+    os.rename(source / 'Show', source / 'Series')
+    assert fs.move_file(Path('Show'), Path('Series'))
+    os.rename(source / 'Movie' / 'Movie.strm', source / 'Movie' / 'Film.strm')
+    assert fs.move_file(Path('Movie') / 'Movie.strm', Path('Movie') / 'Film.strm')
+
+    stats = fs.sync_all(sweep=True)
+    assert (stats['created'], stats['updated'], stats['deleted'], stats['errors']) == (0, 0, 0, 0)
+    assert stats['unchanged'] == 4
+    assert (target / 'Series' / 'S01' / 'E01.strm').read_text() == 'http://new/Show/S01/E01.mkv'
+    assert not (target / 'Show').exists()
+
+
+def test_repair_waits_for_full_sync_and_runs_as_bulk(make_record, library, tmp_path, monkeypatch):
+    source, target = library
+    fs = FolderSync.from_record(make_record(), str(tmp_path / 'state'))
+    fs.sync_all()
+    (target / 'Movie' / 'Movie.strm').write_text('stale')
+
+    seen = []
+    apply_diff = fs._apply_diff
+
+    def recording_apply_diff(*args):
+        seen.append((scheduler.current_class(), getattr(throttle._local, 'background', False)))
+        return apply_diff(*args)
+    monkeypatch.setattr(fs, '_apply_diff', recording_apply_diff)
+
+    reports = []
+    with fs._sync_lock:
+        thread = threading.Thread(target=lambda: reports.append(fs.verify(repair=True)))
+        thread.start()
+        thread.join(0.3)
+        # Held off while a full sync of the record is running
+        assert thread.is_alive() and not seen
+    thread.join(5)
+
+    assert reports[0]['repaired'] and reports[0]['updated'] == 1
+    assert seen == [('bulk', True)]
+    assert (target / 'Movie' / 'Movie.strm').read_text() == 'http://new/Movie/Movie.mkv'
+
+
+def test_cancelled_repair_does_not_cancel_next_sync(make_record, library, tmp_path, monkeypatch):
+    source, target = library
+    fs = FolderSync.from_record(make_record(), str(tmp_path / 'state'))
+    fs.sync_all()
+    (target / 'Movie' / 'Movie.strm').write_text('stale')
+    (target / 'Show' / 'S01' / 'E01.strm').write_text('stale')
+
+    apply_diff = fs._apply_diff
+    cancels = []
+
+    def cancelling_apply_diff(*args):
+        cancels.append(fs.cancel())
+        return apply_diff(*args)
+    monkeypatch.setattr(fs, '_apply_diff', cancelling_apply_diff)
+
+    report = fs.verify(repair=True)
+    # Stopped after the first diverged directory
+    assert cancels == [True]
+    assert report['cancelled'] and not report['in_sync']
+    assert not fs._cancel.is_set()
+
+    monkeypatch.setattr(fs, '_apply_diff', apply_diff)
+    stats = fs.sync_all(sweep=True)
+    assert not stats.get('cancelled') and stats['unchanged'] == 4
+    # The next repair finishes the rest
+    assert not fs.verify(repair=True).get('cancelled')
+    assert fs.verify()['in_sync']
+
+
+def test_rule_change_does_not_wait_for_running_sync(make_record, library, tmp_path, monkeypatch):
+    source, target = library
+    fs = FolderSync.from_record(make_record(), str(tmp_path / 'state'))
+    fs.sync_all()
+
+    seen = []
+    reconvert = fs._reconvert
+
+    def recording_reconvert(*args):
+        seen.append((scheduler.current_class(), getattr(throttle._local, 'background', False)))
+        return reconvert(*args)
+    monkeypatch.setattr(fs, '_reconvert', recording_reconvert)
+
+    with fs._sync_lock:
+        # As if a full sync were running: it is cancelled, the swap does not wait for it
+        changer = threading.Thread(target=fs.update_rules, args=(str(target), 'http://old', 'http://newer'))
+        changer.start()
+        changer.join(1)
+        assert not changer.is_alive()
+        assert fs.search_string == 'http://old' and fs.replacement_string == 'http://newer'
+        assert not seen
+
+    movie = target / 'Movie' / 'Movie.strm'
+    deadline = time.monotonic() + 5
+    while movie.read_text() != 'http://newer/Movie/Movie.mkv' and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert movie.read_text() == 'http://newer/Movie/Movie.mkv'
+    assert seen == [('bulk', True)]
+    # The cancel meant for the sync is not left behind for the next one
+    with fs._sync_lock:
+        pass
+    assert not fs._cancel.is_set()
+    assert not fs.sync_all().get('cancelled')
@@ -0,0 +1,81 @@
+"""WatchdogMonitor: live FolderSync settings and removal of the source folder."""
+import shutil
+import threading
+import time
+
+import pytest
+import yaml
+
+from watchdog_monitor import WatchdogMonitor
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return condition()
+
+
+@pytest.fixture
+def monitor():
+    threads = threading.active_count()
+    monitor = WatchdogMonitor()
+    yield monitor
+    monitor.stop_all()
+    # Let debounced event threads finish, so they do not run into later tests
+    wait_for(lambda: threading.active_count() <= threads)
+
+
+@pytest.fixture
+def thread_errors(monkeypatch):
+    """Exceptions raised in background threads (e.g. the observer's)."""
+    errors = []
+    monkeypatch.setattr(threading, 'excepthook', lambda args: errors.append(args.exc_value))
+    return errors
+
+
+def test_deleting_source_root_stops_record(monitor, make_record, library, tmp_path, thread_errors):
+    source, target = library
+    record = make_record(catch_up='none')
+    assert monitor.start_records([record], {record['id']: str(tmp_path / 'state')}) == [record['id']]
+
+    shutil.rmtree(source)
+
+    assert wait_for(lambda: not monitor.is_monitoring(record['id']))
+    time.sleep(0.2)
+    assert thread_errors == []
+
+
+SETTINGS = {'sync_order': 'recent', 'stat_sweep_interval': 0, 'seed_workers': 0, 'checkpoint_interval': 5}
+
+
+def assert_settings(folder_sync, settings):
+    assert folder_sync.sync_order == settings['sync_order']
+    assert folder_sync.sweep_interval == settings['stat_sweep_interval']
+    assert folder_sync.seed_workers == settings['seed_workers']
+    assert folder_sync.checkpoint_interval == settings['checkpoint_interval']
+
+
+def test_monitored_record_keeps_its_settings(monitor, make_record, tmp_path):
+    record = make_record(catch_up='none', **SETTINGS)
+    assert monitor.start_records([record], {record['id']: str(tmp_path / 'state')}) == [record['id']]
+    assert_settings(monitor.folder_syncs[record['id']], SETTINGS)
+
+    # Kept by a config change: the new settings are applied in place
+    changed = dict(SETTINGS, sync_order='name', checkpoint_interval=30)
+    result = monitor.apply_config([dict(record, **changed)])
+    assert result['kept'] == [record['id']]
+    assert_settings(monitor.folder_syncs[record['id']], changed)
+
+
+def test_watch_start_api_keeps_settings(web, make_record, config_file):
+    web_app, client = web
+    record = make_record(**SETTINGS)
+    with open(config_file, 'w', encoding='utf-8') as f:
+        yaml.safe_dump({'records': [record]}, f)
+    web_app.config_manager.load()
+
+    assert client.post('/api/watch/start', json={'record_id': record['id']}).get_json()['success']
+    assert_settings(web_app.monitor.folder_syncs[record['id']], SETTINGS)
@@ -0,0 +1,53 @@
+"""CPU captures stop profiling worker threads when the capture window ends."""
+import threading
+import time
+
+import profiling
+
+
+def _busy(stop, after_capture, still_profiled):
+    """A long outer profiled block doing short nested units, like a full sync."""
+    with profiling.profiled():
+        while not stop.is_set():
+            with profiling.profiled():
+                sum(range(1000))
+            if after_capture.is_set():
+                still_profiled.append(getattr(profiling._local, 'profiler', None) is not None)
+            time.sleep(0.005)
+
+
+def test_capture_ends_while_block_is_running():
+    stop, after_capture, still_profiled = threading.Event(), threading.Event(), []
+    thread = threading.Thread(target=_busy, args=(stop, after_capture, still_profiled))
+    try:
+        # The capture starts before the long block, so the outer block owns the profiler
+        result = {}
+        capture = threading.Thread(target=lambda: result.update(profiling.capture_cpu(0.3)))
+        capture.start()
+        time.sleep(0.05)
+        thread.start()
+        capture.join()
+        after_capture.set()
+        time.sleep(0.1)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert result['threads'] == 1
+    assert result['threads_busy'] == 0
+    assert result['total_calls'] > 0
+    assert still_profiled and not any(still_profiled)
+
+
+def test_block_entered_after_capture_started_is_profiled():
+    stop, after_capture, still_profiled = threading.Event(), threading.Event(), []
+    # The long block starts first, so nested units pick up the capture
+    thread = threading.Thread(target=_busy, args=(stop, after_capture, still_profiled))
+    thread.start()
+    try:
+        result = profiling.capture_cpu(0.2)
+    finally:
+        stop.set()
+        thread.join()
+    assert result['threads'] == 1
+    assert result['total_calls'] > 0
@@ -0,0 +1,19 @@
+"""/api/sync runs monitored records through their monitored FolderSync."""
+import pytest
+
+
+def test_sync_all_uses_monitored_instance(web, monkeypatch):
+    web_app, client = web
+    record = web_app.config_manager.load()['records'][0]
+    assert client.post('/api/watch/start', json={'record_id': record['id']}).get_json()['success']
+
+    monitored = web_app.monitor.folder_syncs[record['id']]
+    calls = []
+    sync_all = monitored.sync_all
+    monkeypatch.setattr(monitored, 'sync_all', lambda **kwargs: calls.append(kwargs) or sync_all(**kwargs))
+    monkeypatch.setattr(web_app, '_run_sync', lambda *args, **kwargs: pytest.fail('temporary FolderSync'))
+
+    data = client.post('/api/sync', json={'sweep': True}).get_json()
+    assert data['success'], data
+    assert data['stats']['created'] == 4
+    assert calls == [{'sweep': True, 'resume': True, 'order': None}]
@@ -0,0 +1,124 @@
+"""Cron parsing, run planning and skipping of scheduled full syncs."""
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+import sync_schedule
+from sync_schedule import CronExpression, SyncScheduler, schedule_error
+
+
+def ts(*args):
+    return datetime(*args).timestamp()
+
+
+def test_cron_steps_ranges_and_lists():
+    assert CronExpression('*/15 * * * *').minutes == {0, 15, 30, 45}
+    assert CronExpression('5-20/5 * * * *').minutes == {5, 10, 15, 20}
+    # A start with a step runs to the end of the range
+    assert CronExpression('10/20 * * * *').minutes == {10, 30, 50}
+    assert CronExpression('0 1,13 * * *').hours == {1, 13}
+    # Sunday is 0 or 7
+    assert CronExpression('0 0 * * 7').weekdays == {0}
+    assert CronExpression('*/15 * * * *').next_after(ts(2026, 10, 19, 10, 7)) == ts(2026, 10, 19, 10, 15)
+    # Strictly after: a matching minute moves on to the next one
+    assert CronExpression('*/15 * * * *').next_after(ts(2026, 10, 19, 10, 15)) == ts(2026, 10, 19, 10, 30)
+
+
+def test_cron_day_of_month_or_day_of_week():
+    monday = ts(2026, 10, 19, 12, 0)
+    # Both restricted: the 20th (a Tuesday) or any Friday, whichever comes first
+    assert CronExpression('0 0 20 * 5').next_after(monday) == ts(2026, 10, 20)
+    assert CronExpression('0 0 30 * 5').next_after(monday) == ts(2026, 10, 23)
+    # Only one restricted: that one alone decides
+    assert CronExpression('0 0 30 * *').next_after(monday) == ts(2026, 10, 30)
+    assert CronExpression('0 0 * * 5').next_after(monday) == ts(2026, 10, 23)
+
+
+def test_cron_never_matching_and_invalid():
+    with pytest.raises(ValueError, match='never matches'):
+        CronExpression('0 0 31 2 *').next_after(time.time())
+    for expression in ('* * * *', '60 * * * *', '0 0 0 * *', '*/0 * * * *', 'a * * * *'):
+        with pytest.raises(ValueError):
+            CronExpression(expression)
+    assert 'never matches' in schedule_error({'cron': '0 0 31 2 *'}, 'schedule')
+    assert schedule_error({'interval': 30}, 'schedule') is not None
+    assert schedule_error({'interval': 60, 'cron': '* * * * *'}, 'schedule') is not None
+    assert schedule_error({'cron': '0 3 * * 0', 'jitter': 0}, 'schedule') is None
+
+
+def test_interval_phase_within_period():
+    period = 3600
+    now = ts(2026, 10, 19, 12, 0)
+    phases = set()
+    for i in range(50):
+        entry = sync_schedule._Entry({'id': f'rec-{i}', 'schedule': {'interval': period, 'jitter': 0}})
+        entry.plan_next(now)
+        assert now < entry.next_run <= now + period
+        phase = entry.next_run % period
+        assert 0 <= phase < period
+        # Fixed per record
+        entry.plan_next(entry.next_run)
+        assert entry.next_run % period == pytest.approx(phase)
+        phases.add(round(phase))
+    # Records with the same interval are spread out
+    assert len(phases) > 40
+
+
+def test_default_jitter_is_capped(monkeypatch):
+    monkeypatch.setattr(sync_schedule.random, 'uniform', lambda low, high: high)
+    saturday = ts(2026, 10, 24, 12, 0)
+    weekly = sync_schedule._Entry({'id': 'rec-1', 'schedule': {'cron': '0 3 * * 0'}})
+    weekly.plan_next(saturday)
+    assert weekly.next_run == ts(2026, 10, 25, 3, 0) + sync_schedule.MAX_DEFAULT_JITTER
+    # Short periods keep a tenth of the period; an explicit jitter is used as is
+    half_hourly = sync_schedule._Entry({'id': 'rec-1', 'schedule': {'cron': '*/30 * * * *'}})
+    half_hourly.plan_next(saturday)
+    assert half_hourly.next_run == ts(2026, 10, 24, 12, 30) + 180
+    wide = sync_schedule._Entry({'id': 'rec-1', 'schedule': {'cron': '0 3 * * 0', 'jitter': 7200}})
+    wide.plan_next(saturday)
+    assert wide.next_run == ts(2026, 10, 25, 3, 0) + 7200
+
+
+def test_due_run_skipped_while_syncing():
+    runs, syncing = [], {'rec-1': True}
+    done = threading.Event()
+
+    def run(record, sweep):
+        runs.append((record['id'], sweep))
+        done.set()
+        return {'errors': 0}
+
+    scheduler = SyncScheduler(run, lambda record_id: syncing[record_id])
+    scheduler.configure([{'id': 'rec-1', 'schedule': {'interval': 60, 'sweep': True}}])
+    entry = scheduler._entries['rec-1']
+
+    scheduler._start(entry)
+    assert runs == []
+    assert scheduler.status()['rec-1']['last_result'] == 'skipped'
+
+    syncing['rec-1'] = False
+    before = time.time()
+    scheduler._start(entry)
+    assert done.wait(5)
+    assert runs == [('rec-1', True)]
+    deadline = time.monotonic() + 5
+    while scheduler.status()['rec-1']['running'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    status = scheduler.status()['rec-1']
+    assert status['last_result'] == 'ok' and not status['running']
+    assert status['last_run'] >= before and status['next_run'] > before
+
+
+def test_status_api_lists_schedule(web):
+    web_app, client = web
+    record = dict(web_app.config_manager.load()['records'][0], schedule={'interval': 3600})
+    web_app.sync_scheduler.configure([record])
+    try:
+        schedule = client.get('/api/status').get_json()['schedule']
+    finally:
+        web_app.sync_scheduler.configure([])
+    status = schedule[record['id']]
+    assert status['schedule'] == {'interval': 3600}
+    assert status['next_run'] > time.time() and status['last_run'] is None
@@ -0,0 +1,45 @@
+"""Throttled background copies do not hold an I/O slot while they sleep."""
+import threading
+import time
+
+import pytest
+
+import scheduler
+import throttle
+
+
+@pytest.fixture
+def one_slot_throttled(monkeypatch):
+    """One I/O slot and a global limit of 256 KiB/s, copied in 64 KiB chunks."""
+    monkeypatch.setattr(throttle, 'COPY_CHUNK_SIZE', 64 * 1024)
+    scheduler.SCHEDULER.configure(1, scheduler.DEFAULT_STARVATION_AFTER)
+    throttle.GLOBAL.configure({'bytes_per_sec': 256 * 1024})
+    yield
+    throttle.GLOBAL.configure({})
+    scheduler.SCHEDULER.configure(scheduler.DEFAULT_SLOTS, scheduler.DEFAULT_STARVATION_AFTER)
+
+
+def test_live_slot_not_blocked_by_throttled_bulk_copy(one_slot_throttled, tmp_path):
+    source, target = tmp_path / 'big.mkv', tmp_path / 'copy.mkv'
+    source.write_bytes(b'x' * 256 * 1024)
+
+    def bulk_copy():
+        with throttle.background(), scheduler.work_class('bulk'), scheduler.slot():
+            throttle.copy_file('rec-1', source, target)
+
+    copier = threading.Thread(target=bulk_copy)
+    start = time.monotonic()
+    copier.start()
+    time.sleep(0.2)
+    try:
+        waited = time.monotonic()
+        with scheduler.slot():
+            waited = time.monotonic() - waited
+    finally:
+        copier.join()
+
+    # The copy is throttled to about a second; the live operation got in meanwhile
+    assert time.monotonic() - start > 0.8
+    assert waited < 0.3
+    assert target.read_bytes() == source.read_bytes()
+    assert scheduler.SCHEDULER.status()['running'] == {'live': 0, 'catch_up': 0, 'bulk': 0}
@@ -0,0 +1,45 @@
+"""Event traces can only be written inside the traces directory."""
+import pytest
+
+ADMIN = {'X-Admin-Token': 'secret'}
+
+
+@pytest.fixture
+def admin(web, monkeypatch):
+    monkeypatch.setenv('STRMCONVERT_ADMIN_TOKEN', 'secret')
+    web_app, client = web
+    assert client.post('/api/watch/start', json={'record_id': 'rec-1'}).status_code == 200
+    return web_app, client
+
+
+def test_trace_defaults_to_traces_dir(admin, config_file):
+    _, client = admin
+    response = client.post('/api/admin/trace/start', headers=ADMIN,
+                           json={'record_id': 'rec-1', 'path': str(config_file)})
+    assert response.status_code == 200
+    assert response.get_json()['path'] == str(config_file.parent / 'traces' / 'rec-1.jsonl')
+    # A client-supplied path is not honoured
+    assert 'records' in config_file.read_text()
+    assert client.post('/api/admin/trace/stop', headers=ADMIN, json={'record_id': 'rec-1'}).status_code == 200
+
+
+@pytest.mark.parametrize('name', ['../config.yaml', '/etc/passwd', '..', 'a/b.jsonl', 'a\\b.jsonl'])
+def test_trace_name_outside_traces_dir_is_rejected(admin, config_file, name):
+    _, client = admin
+    response = client.post('/api/admin/trace/start', headers=ADMIN, json={'record_id': 'rec-1', 'name': name})
+    assert response.status_code == 400
+    assert 'records' in config_file.read_text()
+
+
+def test_trace_named_file(admin, config_file):
+    _, client = admin
+    response = client.post('/api/admin/trace/start', headers=ADMIN, json={'record_id': 'rec-1', 'name': 'storm.jsonl'})
+    assert response.get_json()['path'] == str(config_file.parent / 'traces' / 'storm.jsonl')
+    client.post('/api/admin/trace/stop', headers=ADMIN, json={'record_id': 'rec-1'})
+
+
+@pytest.mark.parametrize('record_id', [None, '../../config', 'unknown'])
+def test_trace_unknown_record_is_rejected(admin, record_id):
+    _, client = admin
+    response = client.post('/api/admin/trace/start', headers=ADMIN, json={'record_id': record_id})
+    assert response.status_code == 400
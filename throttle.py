@@ -0,0 +1,223 @@
+"""Token-bucket throttling of target I/O for background syncs.
+
+Full syncs and catch-up jobs can saturate a NAS. Every file operation a
+FolderSync performs (read, write, copy, unlink) is charged to the global
+limits and to those of its record; once a bucket is in debt the charging
+thread sleeps until it has refilled, without its I/O slot (see scheduler),
+so live work is not queued behind a throttled transfer. Limits of 0 mean
+unlimited.
+
+Only threads inside ``background()`` (sync_all and its seeding workers) are
+throttled, unless ``live`` is set, in which case watcher events are too.
+Limits come from the configuration (``settings.throttle`` and each record's
+``throttle``) and can be changed at runtime; running syncs pick them up on
+their next operation.
+"""
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+import metrics
+import scheduler
+
+# Chunk size of throttled copies; each chunk is charged before it is written
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Limit fields of a throttle section, per second
+LIMIT_FIELDS = ('bytes_per_sec', 'ops_per_sec')
+
+# Longest single sleep, so a raised or removed limit takes effect quickly
+_MAX_SLEEP = 1.0
+
+
+class TokenBucket:
+    """Token bucket allowing rate units per second, with one second of burst."""
+
+    def __init__(self, rate: float = 0):
+        self._lock = threading.Lock()
+        self.rate = 0.0
+        self._tokens = 0.0
+        self._last = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate: float) -> None:
+        """Change the rate (0 = unlimited); accrued debt is forgiven."""
+        rate = float(rate or 0)
+        with self._lock:
+            if rate == self.rate:
+                return
+            self.rate = rate
+            self._tokens = self.rate
+            self._last = time.monotonic()
+
+    def consume(self, amount: float) -> float:
+        """
+        Take amount tokens, sleeping while the bucket is in debt.
+
+        Returns:
+            Seconds slept
+        """
+        self.take(amount)
+        return self.wait()
+
+    def take(self, amount: float) -> bool:
+        """Take amount tokens without sleeping; returns whether the bucket is now in debt."""
+        if amount <= 0 or self.rate <= 0:
+            return False
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return self._tokens < 0
+
+    def wait(self) -> float:
+        """
+        Sleep while the bucket is in debt.
+
+        Returns:
+            Seconds slept
+        """
+        slept = 0.0
+        while True:
+            with self._lock:
+                if self.rate <= 0:
+                    return slept
+                self._refill()
+                wait = -self._tokens / self.rate
+            if wait <= 0:
+                return slept
+            wait = min(wait, _MAX_SLEEP)
+            time.sleep(wait)
+            slept += wait
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+
+class Throttle:
+    """A pair of byte and operation buckets."""
+
+    def __init__(self):
+        self.bytes = TokenBucket()
+        self.ops = TokenBucket()
+
+    def configure(self, limits: Optional[Dict[str, Any]]) -> None:
+        """Set the limits from a throttle section; missing fields are unlimited."""
+        limits = limits or {}
+        self.bytes.set_rate(limits.get('bytes_per_sec') or 0)
+        self.ops.set_rate(limits.get('ops_per_sec') or 0)
+
+    @property
+    def limited(self) -> bool:
+        return self.bytes.rate > 0 or self.ops.rate > 0
+
+    def limits(self) -> Dict[str, float]:
+        return {'bytes_per_sec': self.bytes.rate, 'ops_per_sec': self.ops.rate}
+
+
+GLOBAL = Throttle()
+_records: Dict[str, Throttle] = {}
+_records_lock = threading.Lock()
+# Whether watcher events are throttled as well
+_live = False
+_local = threading.local()
+
+
+@contextmanager
+def background() -> Iterator[None]:
+    """Mark the current thread's file operations as background work."""
+    previous = getattr(_local, 'background', False)
+    _local.background = True
+    try:
+        yield
+    finally:
+        _local.background = previous
+
+
+def mark_background() -> None:
+    """Mark the current thread's operations as background work for good (pool initializer)."""
+    _local.background = True
+
+
+def _throttles(record_id: str):
+    """The throttles that apply to the current thread's operations for a record."""
+    if not (_live or getattr(_local, 'background', False)):
+        return ()
+    record = _records.get(record_id)
+    return (GLOBAL, record) if record is not None else (GLOBAL,)
+
+
+def limited(record_id: str) -> bool:
+    """Whether the current thread's operations for a record are limited."""
+    return any(throttle.limited for throttle in _throttles(record_id))
+
+
+def charge(record_id: str, ops: int = 0, nbytes: int = 0) -> None:
+    """Charge file operations and bytes, sleeping while over a limit."""
+    in_debt = []
+    for throttle in _throttles(record_id):
+        for bucket, amount in ((throttle.ops, ops), (throttle.bytes, nbytes)):
+            if bucket.take(amount):
+                in_debt.append(bucket)
+    if not in_debt:
+        return
+    slept = 0.0
+    # Not holding an I/O slot while asleep; queued for it again at the same class
+    with scheduler.released():
+        for bucket in in_debt:
+            slept += bucket.wait()
+    if slept:
+        metrics.THROTTLE_SECONDS.inc(slept, record=record_id)
+
+
+def copy_file(record_id: str, source_file: Path, target_file: Path) -> int:
+    """
+    Copy a file with its metadata (like shutil.copy2), charging each chunk
+    as it goes so large files are spread out instead of charged at the end.
+
+    Returns:
+        Number of bytes copied
+    """
+    copied = 0
+    charge(record_id, ops=1)
+    with open(source_file, 'rb') as src, open(target_file, 'wb') as dst:
+        while True:
+            chunk = src.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            # Read and written
+            charge(record_id, nbytes=2 * len(chunk))
+            dst.write(chunk)
+            copied += len(chunk)
+    shutil.copystat(source_file, target_file)
+    return copied
+
+
+def configure(config: Dict[str, Any]) -> None:
+    """Apply the limits of a configuration: settings.throttle and each record's throttle."""
+    global _live
+    settings = (config.get('settings') or {}).get('throttle') or {}
+    GLOBAL.configure(settings)
+    _live = bool(settings.get('live'))
+    with _records_lock:
+        wanted = {record['id']: record['throttle'] for record in config.get('records', [])
+                  if record.get('id') and record.get('throttle')}
+        for record_id in list(_records):
+            if record_id not in wanted:
+                del _records[record_id]
+        for record_id, limits in wanted.items():
+            throttle = _records.get(record_id)
+            if throttle is None:
+                throttle = _records[record_id] = Throttle()
+            throttle.configure(limits)
+
+
+def status() -> Dict[str, Any]:
+    """Current limits: global, whether live events are included, and per record."""
+    with _records_lock:
+        records = {record_id: throttle.limits() for record_id, throttle in _records.items()}
+    return {'global': GLOBAL.limits(), 'live': _live, 'records': records}
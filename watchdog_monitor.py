@@ -1,12 +1,18 @@
 """File system monitoring using watchdog."""
 import time
 import threading
-import shutil
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler, FileSystemEvent
+from config_manager import DEFAULT_CATCH_UP
 from folder_sync import FolderSync
+from event_trace import EventRecorder
+from event_journal import EventJournal, replay
+from path_index import PathIndex
+import metrics
+import profiling
+import scheduler
 
 
 class StrmFileHandler(FileSystemEventHandler):
@@ -16,8 +22,31 @@ class StrmFileHandler(FileSystemEventHandler):
         super().__init__()
         self.folder_sync = folder_sync
         self.source_folder = source_folder
-        self.pending_events: Dict[str, float] = {}  # path -> timestamp
+        # Pending paths are interned once; pending_events maps their ids to timestamps
+        self._pending_paths = PathIndex(columns={})
+        self._pending_lock = threading.Lock()
+        self.pending_events: Dict[int, float] = {}  # path id -> timestamp
         self.debounce_time = 0.5  # seconds
+        self.record_id = folder_sync.record_id
+        self.recorder: Optional[EventRecorder] = None
+        self.journal: Optional[EventJournal] = None
+        # Called (from the observer thread) when the source folder itself is removed
+        self.on_source_lost: Optional[Callable[[], None]] = None
+    
+    def _journal_append(self, kind: str, rel_path: Path, is_dir: bool = False) -> Optional[int]:
+        """Journal an accepted event; returns its entry id, or None without a journal."""
+        journal = self.journal
+        if journal is None:
+            return None
+        return journal.append(self.record_id, kind, str(rel_path), is_dir)
+    
+    def _journal_complete(self, *entry_ids: Optional[int]) -> None:
+        journal = self.journal
+        if journal is None:
+            return
+        for entry_id in entry_ids:
+            if entry_id is not None:
+                journal.complete(entry_id)
     
     def _get_relative_path(self, path: Path) -> Path:
         """Get path relative to source folder."""
@@ -26,24 +55,49 @@ class StrmFileHandler(FileSystemEventHandler):
         except ValueError:
             return path
     
-    def _process_event(self, event_path: Path, is_dir: bool = False):
+    def _upstream_write(self, event_path: Path) -> bool:
+        """Whether a file event was caused by a chained upstream record, which has already synced it."""
+        if self.folder_sync.is_upstream_write(event_path):
+            metrics.EVENTS_SUPPRESSED.inc(record=self.record_id, reason='chained')
+            return True
+        return False
+    
+    def _process_event(self, event_path: Path, is_dir: bool = False, kind: str = 'modified'):
         """Process file system event with debouncing."""
+        if not is_dir and self._upstream_write(event_path):
+            return
         rel_path = self._get_relative_path(event_path)
         current_time = time.time()
+        entry_id = self._journal_append(kind, rel_path, is_dir)
         
         # Debounce: wait a bit before processing to handle rapid events
-        self.pending_events[str(rel_path)] = current_time
+        with self._pending_lock:
+            path_id = self._pending_paths.add(str(rel_path))
+            self.pending_events[path_id] = current_time
+            depth = len(self.pending_events)
+        metrics.QUEUE_DEPTH.set(depth, record=self.record_id)
         
         def process_after_delay():
             time.sleep(self.debounce_time)
-            if str(rel_path) in self.pending_events:
-                timestamp = self.pending_events.pop(str(rel_path))
-                # Only process if this is still the latest event for this path
-                if timestamp == current_time:
-                    if is_dir:
-                        self._handle_directory_event(event_path)
-                    else:
-                        self._handle_file_event(event_path)
+            # Only process if this is still the latest event for this path;
+            # a newer event leaves its own timestamp and will be handled by its own thread
+            with self._pending_lock:
+                if self.pending_events.get(path_id) != current_time:
+                    metrics.EVENTS_COALESCED.inc(record=self.record_id)
+                    # The newer event's own entry covers this path
+                    self._journal_complete(entry_id)
+                    return
+                del self.pending_events[path_id]
+                self._pending_paths.remove(str(rel_path))
+                depth = len(self.pending_events)
+            metrics.QUEUE_DEPTH.set(depth, record=self.record_id)
+            with profiling.profiled():
+                if is_dir:
+                    self._handle_directory_event(event_path)
+                else:
+                    self._handle_file_event(event_path)
+            self._journal_complete(entry_id)
+            metrics.EVENT_LATENCY.observe(time.time() - current_time, record=self.record_id)
         
         thread = threading.Thread(target=process_after_delay, daemon=True)
         thread.start()
@@ -52,11 +106,14 @@ class StrmFileHandler(FileSystemEventHandler):
         """Handle a file event for any file type."""
         # Skip directories
         if event_path.is_dir():
+            metrics.EVENTS_SUPPRESSED.inc(record=self.record_id, reason='directory')
             return
         
         if event_path.exists():
-            # File created or modified - sync it (converts .strm, copies others)
-            self.folder_sync.sync_file(event_path)
+            # File created or modified - sync it (converts .strm, copies others),
+            # unless an upstream record wrote it and synced it meanwhile
+            if not self._upstream_write(event_path):
+                self.folder_sync.sync_file(event_path)
         else:
             # File deleted
             rel_path = self._get_relative_path(event_path)
@@ -65,42 +122,87 @@ class StrmFileHandler(FileSystemEventHandler):
     def _handle_directory_event(self, event_path: Path):
         """Handle a directory event."""
         rel_path = self._get_relative_path(event_path)
-        target_dir = self.folder_sync.target_folder / rel_path
         
         if not event_path.exists():
-            # Directory deleted from source - remove corresponding directory from target
-            if target_dir.exists():
-                try:
-                    # Use shutil.rmtree to remove the entire directory tree
-                    # This handles subfolders and files recursively
-                    shutil.rmtree(target_dir, ignore_errors=True)
-                    # Note: We don't remove parent directories here
-                    # They will be handled by sync_all if needed
-                except Exception as e:
-                    print(f"Error handling directory deletion {event_path}: {e}")
+            # Directory deleted from source - remove corresponding directory from
+            # every target; delete_file removes the entire directory tree and its
+            # manifest entries, and does nothing where it is already gone
+            # Note: We don't remove parent directories here
+            # They will be handled by sync_all if needed
+            self.folder_sync.delete_file(rel_path)
+    
+    def _source_root_event(self, event: FileSystemEvent) -> bool:
+        """
+        Handle an event on the source folder itself, which has no path
+        relative to it and so cannot be synced, journaled or debounced.
+        
+        Returns:
+            True if the event was on the source folder
+        """
+        paths = [event.src_path]
+        if event.event_type == 'moved':
+            paths.append(event.dest_path)
+        if not any(Path(path) == self.source_folder for path in paths):
+            return False
+        metrics.EVENTS_SUPPRESSED.inc(record=self.record_id, reason='source_root')
+        if event.event_type in ('deleted', 'moved') and not self.source_folder.exists():
+            # The watch is gone with the folder. The target is left alone: the
+            # folder may only be unmounted, and a full sync would empty the target
+            print(f"Source folder {self.source_folder} of record {self.record_id} was removed; "
+                  f"stopping its monitoring")
+            if self.on_source_lost is not None:
+                self.on_source_lost()
+        return True
+    
+    def dispatch(self, event: FileSystemEvent):
+        """Count every event before dispatching it to the on_* handlers."""
+        metrics.EVENTS_RECEIVED.inc(record=self.record_id, type=event.event_type)
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record(event)
+        if self._source_root_event(event):
+            return
+        super().dispatch(event)
     
     def on_created(self, event: FileSystemEvent):
         """Handle file creation event."""
-        self._process_event(Path(event.src_path), is_dir=event.is_directory)
+        self._process_event(Path(event.src_path), is_dir=event.is_directory, kind='created')
     
     def on_modified(self, event: FileSystemEvent):
         """Handle file modification event."""
         if not event.is_directory:
             self._process_event(Path(event.src_path))
+        else:
+            metrics.EVENTS_SUPPRESSED.inc(record=self.record_id, reason='directory_modified')
     
     def on_deleted(self, event: FileSystemEvent):
         """Handle file/directory deletion event."""
         event_path = Path(event.src_path)
         if event.is_directory:
             # Handle directory deletion
-            self._process_event(event_path, is_dir=True)
+            self._process_event(event_path, is_dir=True, kind='deleted')
         else:
             # Handle file deletion
+            received = time.time()
             rel_path = self._get_relative_path(event_path)
-            self.folder_sync.delete_file(rel_path)
+            entry_id = self._journal_append('deleted', rel_path)
+            with profiling.profiled():
+                self.folder_sync.delete_file(rel_path)
+            self._journal_complete(entry_id)
+            metrics.EVENT_LATENCY.observe(time.time() - received, record=self.record_id)
     
     def on_moved(self, event: FileSystemEvent):
         """Handle file/directory move/rename event."""
+        received = time.time()
+        old_id = self._journal_append('moved', self._get_relative_path(Path(event.src_path)), event.is_directory)
+        new_id = self._journal_append('moved', self._get_relative_path(Path(event.dest_path)), event.is_directory)
+        with profiling.profiled():
+            self._handle_move(event)
+        self._journal_complete(old_id, new_id)
+        metrics.EVENT_LATENCY.observe(time.time() - received, record=self.record_id)
+    
+    def _handle_move(self, event: FileSystemEvent):
+        """Apply a file/directory move/rename to the target."""
         old_path = Path(event.src_path)
         new_path = Path(event.dest_path)
         
@@ -115,26 +217,11 @@ class StrmFileHandler(FileSystemEventHandler):
                     if file.is_file():
                         self.folder_sync.sync_file(file)
                 
-                # Delete old directory structure if it exists
-                old_target_dir = self.folder_sync.target_folder / old_rel
-                if old_target_dir.exists():
-                    # Use shutil.rmtree to remove the entire directory tree
-                    try:
-                        shutil.rmtree(old_target_dir, ignore_errors=True)
-                        self.folder_sync._remove_empty_dirs(old_target_dir.parent)
-                    except Exception:
-                        pass
+                # Delete old directory structure, with its manifest entries, from every target
+                self.folder_sync.delete_file(old_rel, prune_parents=True)
             else:
-                # Directory was moved out - delete from target
-                old_rel = self._get_relative_path(old_path)
-                old_target_dir = self.folder_sync.target_folder / old_rel
-                if old_target_dir.exists():
-                    # Use shutil.rmtree to remove the entire directory tree
-                    try:
-                        shutil.rmtree(old_target_dir, ignore_errors=True)
-                        self.folder_sync._remove_empty_dirs(old_target_dir.parent)
-                    except Exception:
-                        pass
+                # Directory was moved out - delete from every target
+                self.folder_sync.delete_file(old_rel, prune_parents=True)
         else:
             # Handle file move/rename
             old_rel = self._get_relative_path(old_path)
@@ -157,49 +244,112 @@ class WatchdogMonitor:
     def __init__(self):
         self.observers: Dict[str, Observer] = {}
         self.folder_syncs: Dict[str, FolderSync] = {}
+        self.handlers: Dict[str, StrmFileHandler] = {}
         self.lock = threading.Lock()
         self.running = False
+        # Journal of accepted events, shared by all records; see attach_journal()
+        self.journal: Optional[EventJournal] = None
+        # Records whose observer is being set up outside the lock
+        self._starting: Set[str] = set()
+        # record_id -> 'pending' | 'running' | 'done' for the background catch-up
+        self.catch_up_state: Dict[str, str] = {}
+        # record_id -> ids of the monitored records it feeds directly; see _link_chains()
+        self.chains: Dict[str, List[str]] = {}
     
-    def start_monitoring(self, record_id: str, source_folder: str, target_folder: str,
-                        search_string: str, replacement_string: str) -> bool:
+    def attach_journal(self, journal: EventJournal) -> None:
+        """Journal the events of every record monitored from now on."""
+        self.journal = journal
+    
+    def replay_journal(self, record_id: str, folder_sync: Optional[FolderSync] = None,
+                       up_to: Optional[int] = None) -> int:
         """
-        Start monitoring a source folder.
+        Re-apply a record's events left unfinished by a previous run.
         
         Args:
-            record_id: Unique identifier (UUID) for this monitoring record
-            source_folder: Path to source folder
-            target_folder: Path to target folder
-            search_string: Search string for replacement
-            replacement_string: Replacement string
+            record_id: Record to replay
+            folder_sync: FolderSync to apply them with (default: the monitored one)
+            up_to: Only replay entries with ids up to this one
+            
+        Returns:
+            Number of paths re-applied
+        """
+        if self.journal is None:
+            return 0
+        if folder_sync is None:
+            folder_sync = self.folder_syncs.get(record_id)
+            if folder_sync is None:
+                return 0
+        return replay(self.journal, record_id, folder_sync, up_to)
+    
+    def start_monitoring(self, record: Dict[str, Any], state_dir: Optional[str] = None) -> bool:
+        """
+        Start monitoring a record's source folder.
+        
+        Args:
+            record: Configuration record; its FolderSync takes all of the
+                    record's options (extra targets, sweep, checkpoint,
+                    seeding and order)
+            state_dir: Directory for this record's persisted sync state
             
         Returns:
             True if started successfully, False otherwise
         """
+        record_id = record['id']
         with self.lock:
-            if record_id in self.observers:
+            if record_id in self.observers or record_id in self._starting:
                 return False  # Already monitoring
-            
-            source_path = Path(source_folder)
+            self._starting.add(record_id)
+        
+        # Loading state and setting up the recursive watch can take a while on
+        # large trees, so they run outside the lock and records start concurrently
+        try:
+            source_path = Path(record['source_folder'])
             if not source_path.exists():
                 return False
             
             # Create folder sync instance
-            folder_sync = FolderSync(source_folder, target_folder, 
-                                   search_string, replacement_string)
-            self.folder_syncs[record_id] = folder_sync
+            folder_sync = FolderSync.from_record(record, state_dir)
             
             # Create event handler
             event_handler = StrmFileHandler(folder_sync, source_path)
+            event_handler.journal = self.journal
+            event_handler.on_source_lost = lambda: self._source_lost(record_id, event_handler)
+            
+            # Entries after this one belong to the new handler
+            replay_up_to = self.journal.last_id() if self.journal is not None else 0
             
             # Create and start observer
             observer = Observer()
             observer.schedule(event_handler, str(source_path), recursive=True)
             observer.start()
             
-            self.observers[record_id] = observer
-            self.running = True
-            
-            return True
+            with self.lock:
+                self.folder_syncs[record_id] = folder_sync
+                self.observers[record_id] = observer
+                self.handlers[record_id] = event_handler
+                self.running = True
+                self._link_chains()
+        finally:
+            with self.lock:
+                self._starting.discard(record_id)
+        
+        # Events already on disk are caught up after the observer is running,
+        # so nothing that happens meanwhile is missed
+        try:
+            self.replay_journal(record_id, folder_sync, up_to=replay_up_to)
+        except Exception as e:
+            print(f"Error replaying journal for record {record_id}: {e}")
+        return True
+    
+    def _source_lost(self, record_id: str, handler: StrmFileHandler) -> None:
+        """Stop a record whose source folder was removed, unless it has been restarted since."""
+        def stop():
+            with self.lock:
+                if self.handlers.get(record_id) is not handler:
+                    return
+            self.stop_monitoring(record_id)
+        # Not from the observer thread, which stop_monitoring joins
+        threading.Thread(target=stop, name=f'stop-{record_id}', daemon=True).start()
     
     def stop_monitoring(self, record_id: str) -> bool:
         """
@@ -219,11 +369,20 @@ class WatchdogMonitor:
             observer = self.observers[record_id]
             # Remove from dict before stopping to avoid lock issues
             del self.observers[record_id]
-            if record_id in self.folder_syncs:
-                del self.folder_syncs[record_id]
+            folder_sync = self.folder_syncs.pop(record_id, None)
+            handler = self.handlers.pop(record_id, None)
+            if handler is not None and handler.recorder is not None:
+                handler.recorder.close()
+            self.catch_up_state.pop(record_id, None)
+            self._link_chains()
             
             if not self.observers:
                 self.running = False
+        metrics.QUEUE_DEPTH.remove(record=record_id)
+        if folder_sync is not None:
+            for target in folder_sync._targets():
+                target.downstream = []
+            folder_sync.save_state()
         
         # Stop and join outside the lock to avoid deadlock
         if observer is not None:
@@ -247,8 +406,22 @@ class WatchdogMonitor:
             # Get all observers and clear the dict
             observers_to_stop = list(self.observers.items())
             self.observers.clear()
+            folder_syncs = list(self.folder_syncs.values())
             self.folder_syncs.clear()
+            for handler in self.handlers.values():
+                if handler.recorder is not None:
+                    handler.recorder.close()
+            self.handlers.clear()
+            self.catch_up_state.clear()
+            self._link_chains()
             self.running = False
+        for folder_sync in folder_syncs:
+            for target in folder_sync._targets():
+                target.downstream = []
+        for record_id, _ in observers_to_stop:
+            metrics.QUEUE_DEPTH.remove(record=record_id)
+        for folder_sync in folder_syncs:
+            folder_sync.save_state()
         
         # Stop all observers outside the lock
         for record_id, observer in observers_to_stop:
@@ -261,29 +434,259 @@ class WatchdogMonitor:
             except Exception as e:
                 print(f"Error stopping observer {record_id}: {e}")
     
+    def apply_config(self, records: List[Dict[str, Any]],
+                     state_dirs: Optional[Dict[str, str]] = None) -> Dict[str, List[str]]:
+        """
+        Bring the running monitors in line with a new configuration, by
+        record id. Records whose source folder is unchanged keep their
+        observer (re-registering the watches of a large tree is slow); new
+        target/replacement rules, extra targets and sync options are
+        swapped into the live FolderSync.
+        Only records whose source folder changed are restarted, and
+        records no longer configured are stopped. Records that are not
+        monitored are left alone.
+        
+        Args:
+            records: The new configuration records
+            state_dirs: record_id -> directory for its persisted sync state,
+                        used for restarted records
+            
+        Returns:
+            Record ids by outcome: 'kept', 'updated', 'restarted', 'stopped'
+            and 'failed' (restart failed; the record is no longer monitored)
+        """
+        state_dirs = state_dirs or {}
+        by_id = {record['id']: record for record in records}
+        result: Dict[str, List[str]] = {
+            'kept': [], 'updated': [], 'restarted': [], 'stopped': [], 'failed': []
+        }
+        with self.lock:
+            running = dict(self.folder_syncs)
+        
+        for record_id, folder_sync in running.items():
+            record = by_id.get(record_id)
+            if record is None:
+                self.stop_monitoring(record_id)
+                result['stopped'].append(record_id)
+            elif Path(record['source_folder']) != folder_sync.source_folder:
+                self.stop_monitoring(record_id)
+                if self.start_monitoring(record, state_dirs.get(record_id)):
+                    result['restarted'].append(record_id)
+                else:
+                    result['failed'].append(record_id)
+            else:
+                rules_changed = folder_sync.update_rules(record['target_folder'], record['search_string'],
+                                                         record['replacement_string'])
+                targets_changed = folder_sync.update_targets(record.get('targets') or [])
+                folder_sync.update_settings(record)
+                result['updated' if rules_changed or targets_changed else 'kept'].append(record_id)
+        
+        # Target folders may have moved
+        with self.lock:
+            self._link_chains()
+        
+        changed = {key: ids for key, ids in result.items() if ids and key != 'kept'}
+        if changed:
+            print(f"Applied configuration: {changed}")
+        return result
+    
+    def _link_chains(self) -> None:
+        """
+        Detect monitored records chained through the file system (one
+        record's target folder is, or is inside, another's source folder)
+        and link them, so the upstream record hands each file it writes
+        straight to the downstream one: the downstream rules are applied to
+        the content in memory, the intermediate file is not read back, and
+        the downstream watcher drops the events the write causes. Links
+        that would close a cycle are left out. Call with self.lock held.
+        """
+        ids = sorted(self.folder_syncs)
+        edges: Dict[str, List[str]] = {record_id: [] for record_id in ids}
+        
+        def reaches(start: str, goal: str) -> bool:
+            seen, stack = set(), [start]
+            while stack:
+                node = stack.pop()
+                if node == goal:
+                    return True
+                if node not in seen:
+                    seen.add(node)
+                    stack.extend(edges[node])
+            return False
+        
+        for record_id in ids:
+            for target in self.folder_syncs[record_id]._targets():
+                downstream = []
+                for other_id in ids:
+                    other = self.folder_syncs[other_id]
+                    if other_id == record_id:
+                        continue
+                    if (other.source_folder != target.target_folder
+                            and other.source_folder not in target.target_folder.parents):
+                        continue
+                    if other_id not in edges[record_id] and reaches(other_id, record_id):
+                        print(f"Not chaining record {record_id} into {other_id}: it would form a cycle")
+                        continue
+                    downstream.append(other)
+                    if other_id not in edges[record_id]:
+                        edges[record_id].append(other_id)
+                target.downstream = downstream
+        
+        chains = {record_id: targets for record_id, targets in edges.items() if targets}
+        if chains != self.chains:
+            print(f"Chained records: {chains or 'none'}")
+        self.chains = chains
+    
     def is_monitoring(self, record_id: str) -> bool:
         """Check if a record is being monitored."""
         with self.lock:
             return record_id in self.observers
     
+    def is_syncing(self, record_id: str) -> bool:
+        """Check if a monitored record has a full sync in progress."""
+        with self.lock:
+            folder_sync = self.folder_syncs.get(record_id)
+        return folder_sync is not None and folder_sync.is_syncing()
+    
     def get_status(self) -> Dict[str, bool]:
         """Get monitoring status for all records."""
         with self.lock:
             return {record_id: True for record_id in self.observers.keys()}
     
-    def sync_record(self, record_id: str) -> Optional[Dict[str, int]]:
+    def start_recording(self, record_id: str, trace_path: str) -> bool:
+        """
+        Start recording the events of a monitored record to a trace file.
+        
+        Args:
+            record_id: UUID identifier of the monitored record
+            trace_path: JSON-lines file to write events to (overwritten)
+            
+        Returns:
+            True if recording started, False if the record is not monitored
+            or already recording
+        """
+        with self.lock:
+            handler = self.handlers.get(record_id)
+            if handler is None or handler.recorder is not None:
+                return False
+            handler.recorder = EventRecorder(trace_path, handler.source_folder)
+            return True
+    
+    def stop_recording(self, record_id: str) -> Optional[int]:
+        """
+        Stop recording events for a record.
+        
+        Returns:
+            Number of events recorded, or None if the record was not recording
+        """
+        with self.lock:
+            handler = self.handlers.get(record_id)
+            if handler is None or handler.recorder is None:
+                return None
+            recorder = handler.recorder
+            handler.recorder = None
+        return recorder.close()
+    
+    def sync_record(self, record_id: str, sweep: bool = False, resume: bool = True,
+                    order: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         Perform full sync for a specific record.
         
         Args:
             record_id: UUID identifier of the record to sync
+            sweep: List every directory, even those whose mtime is unchanged
+            resume: Continue an interrupted sync from its checkpoint
+            order: Directory order, 'name' or 'recent' (default: the record's)
             
         Returns:
             Sync statistics or None if record not found
         """
         with self.lock:
-            if record_id not in self.folder_syncs:
-                return None
+            folder_sync = self.folder_syncs.get(record_id)
+        if folder_sync is None:
+            return None
+        
+        # Sync outside the lock so other records can be started, stopped and
+        # synced meanwhile; FolderSync serializes its own full syncs
+        return folder_sync.sync_all(sweep=sweep, resume=resume, order=order)
+    
+    def start_records(self, records: List[Dict[str, Any]], state_dirs: Dict[str, str],
+                      stagger: float = 0) -> List[str]:
+        """
+        Start monitoring several records concurrently, then catch them up in
+        the background.
+        
+        Each record's 'catch_up' setting picks what the catch-up does:
+        'incremental' (default) syncs only directories changed while
+        monitoring was stopped, 'full' lists every directory, 'none' skips it.
+        Catch-ups run one record at a time, stagger seconds apart, so they
+        do not all hit the disks at once.
+        
+        Args:
+            records: Configuration records to start
+            state_dirs: record_id -> directory for its persisted sync state
+            stagger: Seconds to wait between two records' catch-ups
             
-            return self.folder_syncs[record_id].sync_all()
+        Returns:
+            Ids of the records that were started
+        """
+        started: List[str] = []
+        started_lock = threading.Lock()
+        
+        def start(record: Dict[str, Any]) -> None:
+            try:
+                ok = self.start_monitoring(record, state_dirs.get(record['id']))
+            except Exception as e:
+                print(f"Error starting monitoring for record {record['id']}: {e}")
+                return
+            if ok:
+                with started_lock:
+                    started.append(record['id'])
+            else:
+                print(f"Could not start monitoring for record {record['id']}")
+        
+        threads = [threading.Thread(target=start, args=(record,), name=f"start-{record['id']}", daemon=True)
+                   for record in records]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        # Keep the configured order for the catch-up
+        catch_up = [(record['id'], record.get('catch_up', DEFAULT_CATCH_UP))
+                    for record in records if record['id'] in started]
+        catch_up = [(record_id, mode) for record_id, mode in catch_up if mode != 'none']
+        if catch_up:
+            with self.lock:
+                for record_id, _ in catch_up:
+                    self.catch_up_state[record_id] = 'pending'
+            threading.Thread(target=self._run_catch_up, args=(catch_up, stagger),
+                             name='catch-up', daemon=True).start()
+        return [record['id'] for record in records if record['id'] in started]
+    
+    def _run_catch_up(self, catch_up: List[Tuple[str, str]], stagger: float) -> None:
+        """Sync started records one after another, stagger seconds apart."""
+        for i, (record_id, mode) in enumerate(catch_up):
+            if i and stagger:
+                time.sleep(stagger)
+            if not self.is_monitoring(record_id):
+                with self.lock:
+                    self.catch_up_state.pop(record_id, None)
+                continue
+            with self.lock:
+                self.catch_up_state[record_id] = 'running'
+            print(f"Catching up record {record_id} ({mode})")
+            try:
+                # Runs after live events but ahead of bulk full syncs
+                with scheduler.work_class('catch_up'):
+                    self.sync_record(record_id, sweep=(mode == 'full'))
+            except Exception as e:
+                print(f"Error catching up record {record_id}: {e}")
+            with self.lock:
+                self.catch_up_state[record_id] = 'done'
+    
+    def get_catch_up_status(self) -> Dict[str, str]:
+        """Get the background catch-up state of auto-started records."""
+        with self.lock:
+            return dict(self.catch_up_state)
 